@@ -8,16 +8,26 @@ CONFIG_FILE="src/config.py"
 DEFAULT_IP="127.0.0.1"
 # Default key path
 DEFAULT_KEY_PATH="src/devices/symmetric.key"
+# Default server processes and threads per process
+DEFAULT_WORKERS=1
+DEFAULT_THREADS=8
 
 # Parse command line arguments
-while getopts ":i:k:h" opt; do
+while getopts ":i:k:w:t:s:h" opt; do
   case $opt in
     i) IP="$OPTARG" ;;
     k) KEY_PATH="$OPTARG" ;;
+    w) WORKERS="$OPTARG" ;;
+    t) THREADS="$OPTARG" ;;
+    s) SERVER="$OPTARG" ;;
     h) 
-       echo "Usage: $0 [-i IP_ADDRESS] [-k KEY_PATH] [-h]"
+       echo "Usage: $0 [-i IP_ADDRESS] [-k KEY_PATH] [-w WORKERS] [-t THREADS] [-s SERVER] [-h]"
        echo "  -i IP_ADDRESS    IP address to bind (default: 127.0.0.1)"
        echo "  -k KEY_PATH      Path to the symmetric key file (default: src/devices/symmetric.key)"
+       echo "  -w WORKERS       Server processes, each writing its own output file (default: 1)"
+       echo "  -t THREADS       Request threads per process (default: 8)"
+       echo "  -s SERVER        werkzeug, waitress or gunicorn (default: WSGI_SERVER from config.py,"
+       echo "                   or gunicorn with more than one worker)"
        echo "  -h               Show this help message"
        exit 0
        ;;
@@ -29,6 +39,16 @@ done
 # Set defaults if not specified
 IP="${IP:-$DEFAULT_IP}"
 KEY_PATH="${KEY_PATH:-$DEFAULT_KEY_PATH}"
+WORKERS="${WORKERS:-$DEFAULT_WORKERS}"
+THREADS="${THREADS:-$DEFAULT_THREADS}"
+
+# Several workers need gunicorn; otherwise use the configured server unless one was asked for
+SERVER_FLAG=""
+if [[ -n $SERVER ]]; then
+    SERVER_FLAG="--server $SERVER"
+elif [[ $WORKERS -gt 1 ]]; then
+    SERVER_FLAG="--server gunicorn"
+fi
 
 # Check if key file exists
 if [[ ! -f $KEY_PATH ]]; then
@@ -47,5 +67,5 @@ if [[ ! -f $GROUND_CONTROL_SCRIPT ]]; then
 fi
 
 # Run the ground control server
-echo "Starting Ground Control on $IP:$GROUND_CONTROL_PORT..."
-python3 $GROUND_CONTROL_SCRIPT --ip $IP --key-path "$KEY_PATH"
+echo "Starting Ground Control on $IP:$GROUND_CONTROL_PORT ($WORKERS workers x $THREADS threads)..."
+python3 $GROUND_CONTROL_SCRIPT --ip $IP --key-path "$KEY_PATH" $SERVER_FLAG --workers $WORKERS --threads $THREADS
@@ -4,6 +4,7 @@
 
 # Python script and config file locations
 SATELLITE_SCRIPT="src/devices/satellite.py"
+CONSTELLATION_SCRIPT="src/devices/constellation.py"
 CONFIG_FILE="src/config.py"
 
 # File to store PIDs and ports of running satellites
@@ -11,16 +12,23 @@ PID_FILE="satellite_pids.txt"
 
 # Default IP address
 DEFAULT_IP=""  # Empty means use the value from config.py
+# Default request threads per satellite
+DEFAULT_THREADS=8
 
 # Parse command line arguments
-while getopts ":i:n:h" opt; do
+while getopts ":i:n:t:p:h" opt; do
   case $opt in
     i) CUSTOM_IP="$OPTARG" ;;
     n) CUSTOM_NUM_SATELLITES="$OPTARG" ;;
+    t) THREADS="$OPTARG" ;;
+    p) PROCESSES="$OPTARG" ;;
     h) 
-       echo "Usage: $0 [-i IP_ADDRESS] [-n NUM_SATELLITES] [-h]"
+       echo "Usage: $0 [-i IP_ADDRESS] [-n NUM_SATELLITES] [-t THREADS] [-p PROCESSES] [-h]"
        echo "  -i IP_ADDRESS     IP address to bind satellites (default: value from config.py)"
        echo "  -n NUM_SATELLITES Number of satellites to launch (default: value from config.py)"
+       echo "  -t THREADS        Request threads per satellite (default: 8)"
+       echo "  -p PROCESSES      Host the satellites in this many constellation processes"
+       echo "                    instead of one process per satellite (e.g. one per core)"
        echo "  -h                Show this help message"
        exit 0
        ;;
@@ -43,25 +51,44 @@ fi
 # Read configuration from config.py
 START_PORT=$(python3 -c "import sys; sys.path.append('$(dirname $CONFIG_FILE)'); import config; print(config.START_PORT)")
 NUM_SATELLITES=${CUSTOM_NUM_SATELLITES:-$(python3 -c "import sys; sys.path.append('$(dirname $CONFIG_FILE)'); import config; print(config.NUM_SATELLITES)")}
+THREADS=${THREADS:-$DEFAULT_THREADS}
 SATELLITE_IP=${CUSTOM_IP:-$(python3 -c "import sys; sys.path.append('$(dirname $CONFIG_FILE)'); import config; print(config.SATELLITE_IP)")}
 
 echo "Launching $NUM_SATELLITES satellites..."
 
-# Launch satellites on consecutive ports
-for ((i = 0; i < NUM_SATELLITES; i++)); do
-    PORT=$((START_PORT + i))
-    echo "Starting satellite on $SATELLITE_IP:$PORT..."
-    python3 $SATELLITE_SCRIPT --ip $SATELLITE_IP --port $PORT &
-    PID=$!
-    
-    # Check if satellite process is running
+# Record a launched process, or report that it died on startup
+record_launch() {
+    local PID=$1 PORTS=$2
     if ps -p $PID > /dev/null; then
-        echo "$PID $PORT" >> "$PID_FILE"  # Save PID and port to the file
-        echo "Satellite on port $PORT started successfully with PID $PID."
+        echo "$PID $PORTS" >> "$PID_FILE"  # Save PID and ports to the file
+        echo "Satellites on port $PORTS started successfully with PID $PID."
     else
-        echo "Error: Failed to start satellite on port $PORT!"
+        echo "Error: Failed to start satellites on port $PORTS!"
     fi
-done
+}
+
+if [[ -n $PROCESSES ]]; then
+    # Split consecutive ports evenly between constellation processes
+    for ((p = 0; p < PROCESSES; p++)); do
+        FIRST=$((START_PORT + p * NUM_SATELLITES / PROCESSES))
+        LAST=$((START_PORT + (p + 1) * NUM_SATELLITES / PROCESSES - 1))
+        if ((LAST < FIRST)); then
+            continue
+        fi
+        COUNT=$((LAST - FIRST + 1))
+        echo "Starting constellation on $SATELLITE_IP:$FIRST-$LAST..."
+        python3 $CONSTELLATION_SCRIPT --ip $SATELLITE_IP --ports $FIRST-$LAST --threads $((THREADS * COUNT)) &
+        record_launch $! "$FIRST-$LAST"
+    done
+else
+    # Launch satellites on consecutive ports
+    for ((i = 0; i < NUM_SATELLITES; i++)); do
+        PORT=$((START_PORT + i))
+        echo "Starting satellite on $SATELLITE_IP:$PORT..."
+        python3 $SATELLITE_SCRIPT --ip $SATELLITE_IP --port $PORT --threads $THREADS &
+        record_launch $! $PORT
+    done
+fi
 
 echo "All satellites launched successfully!"
 echo "To stop satellites: ./stop_satellites.sh"
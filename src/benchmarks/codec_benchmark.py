@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Import shared modules from src
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from cryptography.fernet import Fernet
+
+from codec import CODECS, Keyring, CodecError, tamper
+from envelope import calculate_checksum
+
+# Share of packets the ship corrupts for the demonstration
+CORRUPTION_RATE = 0.2
+
+
+def make_payloads(count):
+    """Telemetry payloads shaped like Ship.read_sensors output."""
+    return [{
+        "caught_fish": random.randint(0, 100),
+        "wind_levels": round(random.uniform(5.0, 20.0), 1),
+        "water_temperature": round(random.uniform(10.0, 15.0), 1),
+        "water_depth": round(random.uniform(50.0, 200.0), 1),
+    } for _ in range(count)]
+
+
+def md5_fernet_send(fernet, payloads):
+    """The original pipeline: Fernet, MD5, and decrypt/re-encrypt to corrupt."""
+    packets = []
+    for payload in payloads:
+        payload_str = json.dumps(payload)
+        token = fernet.encrypt(payload_str.encode())
+        checksum = calculate_checksum(payload_str)
+        if random.random() < CORRUPTION_RATE:
+            corrupted = json.loads(fernet.decrypt(token).decode())
+            corrupted["caught_fish"] = "CORRUPTED"
+            token = fernet.encrypt(json.dumps(corrupted).encode())
+        packets.append((token, checksum))
+    return packets
+
+
+def md5_fernet_receive(fernet, packets):
+    """The original ground control checks: Fernet decrypt, then MD5 of the plaintext."""
+    accepted = 0
+    for token, checksum in packets:
+        plaintext = fernet.decrypt(token).decode()
+        if calculate_checksum(plaintext) == checksum:
+            json.loads(plaintext)
+            accepted += 1
+    return accepted
+
+
+def codec_send(codec, payloads):
+    """Encrypt with a codec and corrupt by tampering with the ciphertext."""
+    tokens = codec.encrypt_many([json.dumps(payload).encode() for payload in payloads])
+    return [tamper(token) if random.random() < CORRUPTION_RATE else token for token in tokens]
+
+
+def codec_receive(codec, tokens):
+    """Authenticate and decode one token at a time, as verify_packet does."""
+    accepted = 0
+    for token in tokens:
+        try:
+            json.loads(codec.decrypt(token))
+        except CodecError:
+            continue
+        accepted += 1
+    return accepted
+
+
+def codec_receive_batch(codec, tokens):
+    """Authenticate every token in one decrypt_many call, as /batch does."""
+    accepted = 0
+    for plaintext in codec.decrypt_many(tokens):
+        if plaintext is not None:
+            json.loads(plaintext)
+            accepted += 1
+    return accepted
+
+
+def cpu_time(func, *args, repeat=3):
+    """Return (best process CPU time in seconds, result) over several runs."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = func(*args)
+        best = min(best, time.process_time() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message payload crypto cost.")
+    parser.add_argument("--messages", type=int, default=20000,
+                        help="Messages encrypted and verified per run (default: 20000).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    payloads = make_payloads(args.messages)
+    key = Fernet.generate_key()
+    keyring = Keyring(key)
+
+    rows = []
+    fernet = Fernet(key)
+    send, packets = cpu_time(md5_fernet_send, fernet, payloads)
+    receive, accepted = cpu_time(md5_fernet_receive, fernet, packets)
+    rows.append(("md5+fernet (before)", send, receive, None, accepted))
+
+    for name in CODECS:
+        codec = keyring.codec(name)
+        send, tokens = cpu_time(codec_send, codec, payloads)
+        receive, accepted = cpu_time(codec_receive, codec, tokens)
+        batch, _ = cpu_time(codec_receive_batch, codec, tokens)
+        rows.append((name, send, receive, batch, accepted))
+
+    print(f"{'pipeline':>20} {'ship us/msg':>12} {'ground us/msg':>14} {'batch us/msg':>13} {'accepted':>9}")
+    for name, send, receive, batch, accepted in rows:
+        per_message = lambda seconds: f"{seconds / args.messages * 1e6:.2f}" if seconds is not None else "-"
+        print(f"{name:>20} {per_message(send):>12} {per_message(receive):>14} {per_message(batch):>13} {accepted:>9}")
+
+
+if __name__ == "__main__":
+    main()
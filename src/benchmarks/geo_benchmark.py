@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Import shared modules from src
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from config import COMMUNICATION_RANGE_KM
+from geo import haversine, adjacency_matrix, neighbour_pairs, np
+
+# Area the satellites move in
+LAT_MIN, LAT_MAX = 48.5, 52.5
+LON_MIN, LON_MAX = -11.5, -5.83
+
+
+def scalar_edges(lats, lons, range_km):
+    """The original double loop from calculate_network_edges."""
+    edges = []
+    for i in range(len(lats)):
+        for j in range(i + 1, len(lats)):
+            if haversine(lats[i], lons[i], lats[j], lons[j]) <= range_km:
+                edges.append((i, j))
+    return edges
+
+
+def matrix_edges(lats, lons, range_km):
+    """Edges from the full vectorized adjacency matrix."""
+    adjacency = adjacency_matrix(lats, lons, range_km)
+    rows, cols = np.triu(adjacency).nonzero()
+    return list(zip(rows.tolist(), cols.tolist()))
+
+
+def grid_edges(lats, lons, range_km):
+    """Edges from the grid index with vectorized blocks."""
+    return [(i, j) for i, j, _ in neighbour_pairs(lats, lons, range_km)]
+
+
+def time_call(func, *args, repeat=3):
+    """Return (best time in seconds, result) over several runs."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scalar vs vectorized edge discovery.")
+    parser.add_argument("--sizes", type=str, default="10,100,1000,10000",
+                        help="Comma-separated node counts (default: 10,100,1000,10000).")
+    parser.add_argument("--range-km", type=float, default=COMMUNICATION_RANGE_KM,
+                        help="Communication range in kilometres.")
+    parser.add_argument("--scalar-limit", type=int, default=2000,
+                        help="Skip the scalar loop above this many nodes (default: 2000).")
+    parser.add_argument("--spread", type=float, default=1.0,
+                        help="Scale the satellite area by this factor to model sparser constellations.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lat_mid, lon_mid = (LAT_MIN + LAT_MAX) / 2, (LON_MIN + LON_MAX) / 2
+    lat_half = (LAT_MAX - LAT_MIN) / 2 * args.spread
+    lon_half = (LON_MAX - LON_MIN) / 2 * args.spread
+    print(f"{'N':>7} {'edges':>10} {'scalar (s)':>12} {'matrix (s)':>12} {'grid (s)':>12} {'speedup':>9}")
+    for n in [int(size) for size in args.sizes.split(",")]:
+        lats = [rng.uniform(lat_mid - lat_half, lat_mid + lat_half) for _ in range(n)]
+        lons = [rng.uniform(lon_mid - lon_half, lon_mid + lon_half) for _ in range(n)]
+
+        grid_time, edges = time_call(grid_edges, lats, lons, args.range_km)
+        expected = sorted(edges)
+
+        # The dense matrix needs N^2 memory, so skip it when that gets silly
+        matrix_time = None
+        if np is not None and n <= 20000:
+            matrix_time, result = time_call(matrix_edges, lats, lons, args.range_km, repeat=1)
+            assert sorted(result) == expected, "matrix and grid edges differ"
+
+        scalar_time = None
+        if n <= args.scalar_limit:
+            scalar_time, result = time_call(scalar_edges, lats, lons, args.range_km, repeat=1)
+            assert sorted(result) == expected, "scalar and grid edges differ"
+
+        def fmt(value):
+            return f"{value:12.4f}" if value is not None else f"{'skipped':>12}"
+
+        fastest = min(t for t in (matrix_time, grid_time) if t is not None)
+        speedup = f"{scalar_time / fastest:8.1f}x" if scalar_time else f"{'-':>9}"
+        print(f"{n:>7} {len(edges):>10} {fmt(scalar_time)} {fmt(matrix_time)} {fmt(grid_time)} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
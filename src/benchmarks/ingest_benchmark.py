@@ -0,0 +1,106 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Import shared modules from src
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from cryptography.fernet import Fernet
+
+from codec import Keyring
+from envelope import pack_batch
+from devices import ground_control
+from devices.ship import Ship
+
+
+def make_envelopes(ships, count, readings, codec):
+    """count batch envelopes of readings each, from ships taking turns."""
+    senders = [Ship(ship_id=f"{i:03d}", cipher_suite=codec) for i in range(ships)]
+    envelopes = []
+    for i in range(count):
+        ship = senders[i % ships]
+        batch = [ship.create_reading(time.time()) for _ in range(readings)]
+        envelopes.append(json.dumps(pack_batch(batch, codec, ship.ship_id, time.time())).encode())
+    return envelopes
+
+
+def run(app, bodies, senders):
+    """
+    Post every body from senders concurrent clients.
+
+    Returns:
+        tuple: (ack latencies in seconds, seconds until every reading was written)
+    """
+    def post(body):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post("/", data=body, content_type="application/json")
+        if response.status_code not in (200, 202):
+            raise RuntimeError(f"Ground control answered {response.status_code}: {response.get_json()}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=senders) as pool:
+        latencies = list(pool.map(post, bodies))
+    while (ground_control.ingest is not None and ground_control.ingest.pending()) or ground_control.writer.pending():
+        time.sleep(0.01)
+    if ground_control.ingest is not None:
+        ground_control.ingest.close()
+    ground_control.writer.close()
+    return latencies, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ground control ack latency with and without shards.")
+    parser.add_argument("--messages", type=int, default=1000,
+                        help="Batch envelopes posted per run (default: 1000).")
+    parser.add_argument("--readings", type=int, default=50, help="Readings per envelope (default: 50).")
+    parser.add_argument("--senders", type=str, default="1,8,32",
+                        help="Comma-separated concurrent senders (default: 1,8,32).")
+    parser.add_argument("--shards", type=int, default=4, help="Shard processes compared (default: 4).")
+    parser.add_argument("--codec", type=str, default="fernet", help="Payload codec (default: fernet).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp()
+    key_path = os.path.join(workdir, "symmetric.key")
+    with open(key_path, "wb") as key_file:
+        key_file.write(Fernet.generate_key())
+    with open(key_path, "rb") as key_file:
+        codec = Keyring(key_file.read()).codec(args.codec)
+    ground_control.TRACE_FILE = os.path.join(workdir, "traces.jsonl")
+    ground_control.STORE_FILE = os.path.join(workdir, "telemetry.db")
+
+    print(f"{'senders':>8} {'shards':>7} {'ack p50 ms':>11} {'ack p99 ms':>11} {'readings/s':>11}")
+    for senders in [int(value) for value in args.senders.split(",")]:
+        bodies = make_envelopes(max(senders, 1), args.messages, args.readings, codec)
+        for shards in (0, args.shards):
+            ground_control.OUTPUT_FILE = os.path.join(workdir, f"output_{senders}_{shards}.csv")
+            app = ground_control.create_app(key_path, "csv", shards)
+            if shards:
+                # Start the shard processes before timing
+                run(app, bodies[:shards * 4], shards * 4)
+                app = ground_control.create_app(key_path, "csv", shards)
+            latencies, elapsed = run(app, bodies, senders)
+            ground_control.ingest = None
+            rate = args.messages * args.readings / elapsed
+            print(f"{senders:>8} {shards:>7} {percentile(latencies, 0.5) * 1e3:>11.2f} "
+                  f"{percentile(latencies, 0.99) * 1e3:>11.2f} {rate:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+# Import shared modules from src
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from cryptography.fernet import Fernet
+from flask import Flask, request, jsonify
+
+from codec import Keyring
+from config import PAYLOAD_CODEC, START_PORT, GROUND_CONTROL_COORDS, EARTH_DEVICE_IP, GROUND_CONTROL_PORT
+from envelope import pack_batch, calculate_checksum
+from geo import haversine
+from metrics import instrument_flask
+from store_forward import PRIORITY_HEADER
+from tracing import TRACE_HEADER, append_hop
+from wire import encode_packet, BINARY_CONTENT_TYPE, JSON_CONTENT_TYPE
+from devices import satellite as relay
+from devices.ship import Ship
+
+
+class StubResponse:
+    status_code = 200
+    text = '{"status": "Acknowledged"}'
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    def json(self):
+        return {"status": "Acknowledged"}
+
+
+class StubTransport:
+    """Stands in for the connection pool, encoding bodies the way requests does."""
+
+    def __init__(self):
+        self.sent_bytes = 0
+
+    def post(self, url, **kwargs):
+        data = kwargs.get("data")
+        if "json" in kwargs:
+            data = json.dumps(kwargs["json"]).encode()
+        self.sent_bytes += len(data)
+        return StubResponse()
+
+
+def parsing_app():
+    """
+    A relay that parses each message and re-encodes it, as receive_message
+    did before the fast path (trimmed to the direct ground control hop).
+    """
+    app = Flask(__name__)
+    instrument_flask(app)
+
+    @app.route("/", methods=["POST"])
+    def receive_message():
+        arrival = time.time()
+        data = request.get_json()
+        if not data:
+            return jsonify({"status": "No data received"}), 400
+        time.sleep(0)
+        queued = time.time() - arrival
+        headers = {
+            "X-Group-ID": "10",
+            "X-Destination-IP": EARTH_DEVICE_IP,
+            "X-Destination-Port": str(GROUND_CONTROL_PORT)
+        }
+        trace = request.headers.get(TRACE_HEADER)
+        request.headers.get(PRIORITY_HEADER, 0, type=int)
+        forward = time.time() - arrival - queued
+        headers[TRACE_HEADER] = append_hop(trace, relay.satellite.id, arrival, queued, forward, 0)
+        haversine(relay.satellite.latitude, relay.satellite.longitude, *GROUND_CONTROL_COORDS)
+        response = relay.transport.post(
+            f"http://{EARTH_DEVICE_IP}:{GROUND_CONTROL_PORT}/", json=data, headers=headers, timeout=5
+        )
+        return jsonify({"status": "Message forwarded to ground control", "response": response.json()})
+
+    return app
+
+
+def make_messages(count, readings, codec):
+    """Ship packets, or batch envelopes of readings each when readings > 1."""
+    ship = Ship(ship_id="01", cipher_suite=codec)
+    if readings <= 1:
+        return [ship.create_data_packet() for _ in range(count)]
+    messages = []
+    for _ in range(count):
+        batch = []
+        for _ in range(readings):
+            payload = ship.read_sensors()
+            batch.append({"timestamp": time.time(), "payload": payload,
+                          "checksum": calculate_checksum(json.dumps(payload))})
+        messages.append(pack_batch(batch, codec, ship.ship_id, time.time()))
+    return messages
+
+
+def throughput(app, bodies, content_type, headers, repeat=3):
+    """Return messages relayed per second through app's request handling, best of several runs."""
+    client = app.test_client()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in bodies:
+            response = client.post("/", data=body, content_type=content_type, headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError(f"Relay answered {response.status_code}: {response.get_json()}")
+        best = min(best, time.perf_counter() - start)
+    return len(bodies) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark messages relayed per second by one satellite.")
+    parser.add_argument("--messages", type=int, default=5000,
+                        help="Messages relayed per run (default: 5000).")
+    parser.add_argument("--readings", type=str, default="1,50,500",
+                        help="Comma-separated readings per message; above 1 sends batch envelopes (default: 1,50,500).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+    codec = Keyring(Fernet.generate_key()).codec(PAYLOAD_CODEC)
+
+    # Put the satellite over ground control, with no simulated delay
+    satellite = relay.Satellite(START_PORT, [START_PORT])
+    satellite.latitude, satellite.longitude = GROUND_CONTROL_COORDS
+    relay.satellite = satellite
+    relay.random.uniform = lambda a, b: 0
+    relay.log_communication = lambda source, target: None
+    relay.transport = StubTransport()
+    baseline = parsing_app()
+    headers = Ship(ship_id="01").forwarding_headers()
+
+    print(f"{'readings':>9} {'relay':>20} {'msgs/s':>10} {'bytes/msg':>10}")
+    for readings in [int(value) for value in args.readings.split(",")]:
+        messages = make_messages(args.messages, readings, codec)
+        json_bodies = [json.dumps(message).encode() for message in messages]
+        binary_bodies = [encode_packet(message) for message in messages]
+        runs = [
+            ("parse + re-encode", baseline, json_bodies, JSON_CONTENT_TYPE),
+            ("fast path, JSON", relay.app, json_bodies, JSON_CONTENT_TYPE),
+            ("fast path, binary", relay.app, binary_bodies, BINARY_CONTENT_TYPE),
+        ]
+        for name, app, bodies, content_type in runs:
+            rate = throughput(app, bodies, content_type, headers)
+            size = sum(len(body) for body in bodies) / len(bodies)
+            print(f"{readings:>9} {name:>20} {rate:>10.0f} {size:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import logging
+import time
+from collections import deque
+from itertools import count
+from threading import Lock, Thread
+
+import requests
+
+from config import (
+    COMMUNICATION_DISPLAY_TIME, COMMUNICATION_LOG_SIZE, COMMUNICATION_FLUSH_INTERVAL
+)
+
+logger = logging.getLogger('comms')
+
+
+class CommunicationLog:
+    """
+    Bounded, time-ordered buffer of communication events for the visualiser.
+
+    Events are appended in arrival order, so expired ones are always at the
+    left and are dropped with popleft. The deque's maxlen caps memory even
+    if nobody reads the log.
+    """
+
+    def __init__(self, display_time=COMMUNICATION_DISPLAY_TIME, maxlen=COMMUNICATION_LOG_SIZE):
+        self.display_time = display_time
+        self._events = deque(maxlen=maxlen)
+        self._ids = count(1)
+        self._lock = Lock()
+
+    def add(self, source, target):
+        """Record one communication and return its event ID."""
+        return self.add_many([(source, target)])[0]
+
+    def add_many(self, events):
+        """
+        Record several communications at once.
+
+        Args:
+            events: Iterable of (source, target) coordinate dicts
+
+        Returns:
+            list: Event IDs in the same order
+        """
+        timestamp = time.time()
+        ids = []
+        with self._lock:
+            for source, target in events:
+                event_id = next(self._ids)
+                self._events.append({
+                    "id": event_id,
+                    "source": source,
+                    "target": target,
+                    "timestamp": timestamp,
+                })
+                ids.append(event_id)
+        return ids
+
+    def active(self):
+        """Return every event still within the display time, oldest first."""
+        with self._lock:
+            self._expire()
+            return list(self._events)
+
+    def since(self, event_id):
+        """Return active events newer than event_id."""
+        return [event for event in self.active() if event["id"] > event_id]
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._events)
+
+    def _expire(self):
+        cutoff = time.time() - self.display_time
+        while self._events and self._events[0]["timestamp"] < cutoff:
+            self._events.popleft()
+
+
+class CommunicationReporter:
+    """
+    Send communication events to the visualiser in batches.
+
+    report() only appends to a local buffer; a background thread posts
+    everything buffered as one {"events": [...]} request every
+    flush_interval seconds, so relaying a message never waits on the
+    visualiser and busy relays make one call per interval instead of one
+    per hop.
+    """
+
+    def __init__(self, url, transport, flush_interval=COMMUNICATION_FLUSH_INTERVAL, max_pending=1000):
+        self.url = url
+        self.transport = transport
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = Lock()
+        self._thread = None
+
+    def report(self, source, target):
+        """Queue a communication from source to target ([lat, lon] pairs)."""
+        event = {
+            "source": {"latitude": source[0], "longitude": source[1]},
+            "target": {"latitude": target[0], "longitude": target[1]},
+        }
+        with self._lock:
+            # Visualisation is best effort, so drop the oldest events if the
+            # visualiser is unreachable for a long time
+            if len(self._pending) >= self.max_pending:
+                del self._pending[0]
+            self._pending.append(event)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Post every queued event now."""
+        with self._lock:
+            events, self._pending = self._pending, []
+        if not events:
+            return
+        try:
+            self.transport.post(self.url, json={"events": events}, timeout=2)
+        except requests.RequestException:
+            logger.debug("Failed to log communication")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
@@ -25,3 +25,74 @@ SIMULATION_DURATION = 60  # Total simulation time in seconds
 
 # Visualization settings
 COMMUNICATION_DISPLAY_TIME = 1  # Time to display communication lines (seconds)
+
+# Neighbour discovery settings
+NEIGHBOUR_DISCOVERY = "gossip"  # "gossip" (UDP multicast push) or "poll" (HTTP /get-position)
+GOSSIP_GROUP = '239.255.10.10'
+GOSSIP_PORT = 33099
+POSITION_TTL = 3 * TIME_STEP  # Seconds before a gossiped position is considered stale
+PROBE_DEADLINE = 0.5 * TIME_STEP  # Seconds a "poll" neighbour scan waits for every peer at once
+PROBE_WORKERS = 16  # Threads probing peers in parallel
+
+# Routing settings
+ROUTING_METRIC = "distance"  # Link cost: "distance" (haversine km) or "hops"
+ROUTE_MAX_AGE = 5 * TIME_STEP  # Seconds before routes are recomputed even if links are unchanged
+
+# Relay settings
+RELAY_MAX_IN_FLIGHT = 5000  # Messages an async relay holds before answering 503
+RELAY_DESTINATIONS = [(EARTH_DEVICE_IP, GROUND_CONTROL_PORT)]  # (ip, port) final hops a packet may name; others go to ground control
+
+# HTTP transport settings
+HTTP_POOL_SIZE = 10  # Keep-alive connections held per peer
+HTTP_TIMEOUT = 5  # Default request timeout in seconds
+PEER_BACKOFF_BASE = 2  # Seconds an unreachable peer is skipped after its first failure
+PEER_BACKOFF_MAX = 30  # Upper bound for the doubling backoff
+
+# Ground control ingest settings
+INGEST_BATCH_SIZE = 500  # Records buffered before a flush
+INGEST_FLUSH_INTERVAL = 1.0  # Maximum seconds a record waits in the buffer
+INGEST_MAX_BUFFER = 50000  # Records held before new ones are rejected with 503
+INGEST_SHARDS = 0  # Processes verifying packets after they are acknowledged; 0 verifies before acknowledging
+INGEST_SHARD_QUEUE = 10000  # Packets waiting per shard before new ones are rejected with 503
+INGEST_SHARD_BATCH = 256  # Most packets handed to a shard process at once
+DEDUP_MAX_ENTRIES = 200000  # Message IDs remembered to drop duplicate deliveries
+DEDUP_WINDOW = 3600  # Seconds a message ID is remembered
+TELEMETRY_STORE = True  # Keep readings in an indexed SQLite database served at /readings
+QUERY_MAX_ROWS = 10000  # Most readings one /readings query returns
+QUERY_MAX_BUCKETS = 1000  # Most time buckets one /readings/series query returns
+
+# Visualisation collection settings
+VISUALISER_CACHE_TTL = 0.5  # Seconds a collected snapshot is shared between clients
+VISUALISER_FETCH_WORKERS = 16  # Threads used to fetch positions in parallel
+VISUALISER_STREAM_INTERVAL = 1  # Seconds between deltas pushed on /stream
+VISUALISER_MAX_STREAMS = 4  # Open /stream dashboards; more are answered 503 and poll instead
+COMMUNICATION_LOG_SIZE = 10000  # Most communication events the visualiser keeps
+COMMUNICATION_FLUSH_INTERVAL = 0.25  # Seconds devices batch communication events for
+
+# Fleet settings
+FLEET_SEND_WORKERS = 32  # Threads sending telemetry for a multi-ship fleet
+
+# Store-and-forward settings
+STORE_FORWARD_MAX_PACKETS = 1000  # Packets a satellite holds while it has no route
+STORE_FORWARD_TTL = 300  # Seconds a held packet stays deliverable
+STORE_FORWARD_DRAIN_BATCH = 100  # Packets forwarded per request when a route appears
+STORE_FORWARD_PERSIST = False  # Mirror held packets to src/data/spool so they survive restarts
+
+# Ship outbound buffer settings
+SHIP_BUFFER_MAX_READINGS = 10000  # Readings a ship holds while out of coverage
+SHIP_BUFFER_TTL = 24 * 3600  # Seconds a buffered reading stays worth sending
+SHIP_UPLINK_BATCH = 50  # Readings packed into one envelope
+SHIP_UPLINK_INTERVAL = 0  # Seconds a reading may wait for its batch to fill, counted in its delay; 0 sends at once
+SHIP_BUFFER_PERSIST = False  # Mirror buffered readings to src/data/outbox so they survive restarts
+
+# Payload codec settings
+PAYLOAD_CODEC = "fernet"  # "fernet" (always used in --interoperable mode), "aesgcm" or "chacha20"
+
+# Wire format settings
+WIRE_FORMAT = "json"  # "json" or "binary" (compact frames relayed unparsed); --interoperable always uses JSON
+
+# Server settings
+WSGI_SERVER = "werkzeug"  # "werkzeug", "waitress" or "gunicorn"; gunicorn falls back to waitress, then werkzeug, if not installed
+SERVER_THREADS = 8  # Request threads per server process
+SERVER_KEEPALIVE = 5  # Seconds an idle keep-alive connection is held open
+SERVER_TIMEOUT = 30  # Seconds a request may run before its worker is restarted
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from config import DEDUP_MAX_ENTRIES, DEDUP_WINDOW
+from metrics import counter, gauge
+
+# Duplicate suppression metrics, served at /metrics
+duplicate_readings = counter("ingest_duplicates", "Readings dropped because their message ID was already seen")
+index_size = gauge("ingest_dedup_index_size", "Message IDs remembered for duplicate suppression")
+
+
+def message_id(record):
+    """Return a record's (ship_id, seq) message ID, or None if its sender didn't number it."""
+    seq = record.get("seq")
+    return None if seq is None else (record.get("ship_id"), seq)
+
+
+class DedupIndex:
+    """
+    Remember recently written message IDs to drop replays before they are written.
+
+    This is a fast path in one process: the telemetry store's unique
+    (ship_id, seq) index is what keeps a replay handled by another worker
+    from being stored twice, and the CSV output is only free of duplicates
+    while ground control runs a single worker. Within a process, filter()
+    reserves the IDs it keeps under the same lock that checks them, so a
+    replay racing its original is dropped. The caller then either add()s
+    them once written or release()s them if the write failed, so a reading
+    whose write failed is never answered as a duplicate.
+
+    IDs are kept in arrival order and forgotten once there are more than
+    max_entries or they are older than window seconds, so memory stays
+    bounded and both checking and forgetting an ID are O(1). A replay
+    arriving after its ID was forgotten is not detected here.
+    """
+
+    def __init__(self, max_entries=DEDUP_MAX_ENTRIES, window=DEDUP_WINDOW, clock=time.time):
+        self.max_entries = max_entries
+        self.window = window
+        self.clock = clock
+        self.duplicates = 0
+        self._seen = OrderedDict()
+        self._lock = Lock()
+        index_size.set_function(lambda: len(self._seen))
+
+    def filter(self, records):
+        """
+        Return the records whose IDs haven't been seen, counting the rest.
+
+        The IDs of the records returned are reserved until they are add()ed
+        or release()d; unnumbered records are always kept.
+        """
+        kept = []
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            for record in records:
+                key = message_id(record)
+                if key is not None:
+                    if key in self._seen:
+                        self.duplicates += 1
+                        duplicate_readings.inc()
+                        continue
+                    self._seen[key] = now
+                kept.append(record)
+            self._trim()
+        return kept
+
+    def add(self, records):
+        """Remember the IDs of records that were handed to the writer."""
+        now = self.clock()
+        with self._lock:
+            for record in records:
+                key = message_id(record)
+                if key is None:
+                    continue
+                self._seen[key] = now
+                self._seen.move_to_end(key)
+            self._trim()
+
+    def release(self, records):
+        """Forget the IDs reserved for records the writer couldn't take, so a resend is kept."""
+        with self._lock:
+            for record in records:
+                key = message_id(record)
+                if key is not None:
+                    self._seen.pop(key, None)
+
+    def stats(self):
+        """Return the number of remembered IDs and duplicates dropped."""
+        with self._lock:
+            return {"remembered": len(self._seen), "duplicates": self.duplicates,
+                    "max_entries": self.max_entries, "window": self.window}
+
+    def __len__(self):
+        return len(self._seen)
+
+    def _trim(self):
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if seen_at >= cutoff:
+                return
+            self._seen.popitem(last=False)
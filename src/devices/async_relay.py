@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+import aiohttp
+from aiohttp import web
+
+from config import (
+    TIME_STEP, GROUND_CONTROL_COORDS, RELAY_MAX_IN_FLIGHT, RELAY_DESTINATIONS
+)
+from routing import GROUND_CONTROL
+from tracing import TRACE_HEADER, append_hop
+from metrics import REGISTRY, CONTENT_TYPE, counter, gauge
+from store_forward import PRIORITY_HEADER
+from wire import unframe, relay_headers, destination_url, WireError
+
+logger = logging.getLogger('satellite')
+
+# Shared with the Flask relay, so both modes export the same series
+forwarded_messages = counter(
+    "relay_forwards", "Messages forwarded, by next hop type and result", ("target", "result")
+)
+forward_retries = counter("relay_retries", "Forward attempts that failed and were retried")
+relay_in_flight = gauge("relay_in_flight", "Messages currently held by the async relay")
+rejected_messages = counter("relay_rejected", "Messages rejected with 503 because the relay was full")
+
+# Keys for state shared through the aiohttp application
+SATELLITE_KEY = web.AppKey("satellite", object)
+SESSION_KEY = web.AppKey("session", aiohttp.ClientSession)
+IN_FLIGHT_KEY = web.AppKey("in_flight", dict)
+
+
+async def reply_body(response):
+    """Return a next hop's reply as JSON, or as text if it isn't JSON (e.g. a proxy's error page)."""
+    text = await response.text()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def create_async_app(satellite, hop_url, log_communication, max_in_flight=RELAY_MAX_IN_FLIGHT,
+                     hold=None):
+    """
+    Build an asyncio relay for a satellite.
+
+    Like the Flask relay, it forwards message bodies as received, routing
+    the final hop from the X-Destination-IP/X-Destination-Port headers.
+
+    Messages wait out their simulated delay and retry backoff with
+    asyncio.sleep instead of holding a thread, so one process can keep
+    thousands of messages in flight. Once max_in_flight messages are being
+    relayed, new ones are rejected with 503 so upstream hops back off.
+
+    Args:
+        satellite: Satellite whose position and routing table are used
+        hop_url: Function mapping a next hop to its URL
+        log_communication: Function queueing a (source, target) hop for the visualiser
+        max_in_flight: Maximum number of messages relayed concurrently
+        hold: Function queueing an undeliverable packet for store-and-forward,
+            returning False if it wasn't kept (None to report the failure)
+
+    Returns:
+        web.Application
+    """
+    app = web.Application()
+    app[SATELLITE_KEY] = satellite
+    app[IN_FLIGHT_KEY] = {"count": 0, "max": max_in_flight}
+    relay_in_flight.set_function(lambda: app[IN_FLIGHT_KEY]["count"])
+
+    async def receive_message(request):
+        """Handle incoming messages and route them toward ground control."""
+        in_flight = request.app[IN_FLIGHT_KEY]
+        if in_flight["count"] >= in_flight["max"]:
+            rejected_messages.inc()
+            logger.warning("Relay queue full, rejecting message")
+            return web.json_response(
+                {"status": "Relay busy"}, status=503, headers={"Retry-After": "1"}
+            )
+
+        in_flight["count"] += 1
+        try:
+            return await relay(request)
+        finally:
+            in_flight["count"] -= 1
+
+    async def relay(request):
+        arrival = time.time()
+        # The body is forwarded as received, never parsed
+        body = await request.read()
+        if not body:
+            logger.warning("Received empty message")
+            return web.json_response({"status": "No data received"}, status=400)
+
+        # Add realistic network delay without blocking the event loop
+        await asyncio.sleep(random.uniform(0.1, 1.0))
+        queued = time.time() - arrival
+        routing_headers = relay_headers(request.headers)
+        trace = request.headers.get(TRACE_HEADER)
+        try:
+            priority = int(request.headers.get(PRIORITY_HEADER, 0))
+        except ValueError:
+            priority = 0
+
+        def held_or(response):
+            """Answer 202 if the packet was queued for later, else response."""
+            if hold is None:
+                return response
+            try:
+                packet = unframe(request.content_type, body)
+            except WireError as e:
+                logger.warning(f"Not holding unreadable message: {e}")
+                return response
+            if hold(packet, priority):
+                return web.json_response({"status": "Queued for later delivery"}, status=202)
+            return response
+
+        session = request.app[SESSION_KEY]
+        next_hop = satellite.next_hop()
+        if next_hop is None:
+            forwarded_messages.labels("none", "no_route").inc()
+            logger.warning("No neighbors available to forward message")
+            return held_or(web.json_response({"status": "No route to ground control"}, status=404))
+
+        # Ground control gets a single attempt, other satellites are retried
+        max_retries = 1 if next_hop == GROUND_CONTROL else 3
+        for attempt in range(max_retries):
+            try:
+                forward = time.time() - arrival - queued
+                headers = {
+                    **routing_headers,
+                    TRACE_HEADER: append_hop(trace, satellite.id, arrival, queued, forward, attempt)
+                }
+                url = hop_url(next_hop)
+                if next_hop == GROUND_CONTROL:
+                    url = destination_url(request.headers, RELAY_DESTINATIONS) or url
+                async with session.post(url, data=body, headers=headers) as response:
+                    if next_hop == GROUND_CONTROL:
+                        # Busy means ground control couldn't take it yet, so keep it rather than drop it
+                        if response.status == 503:
+                            forwarded_messages.labels(GROUND_CONTROL, "busy").inc()
+                            logger.warning("Ground control busy")
+                            return held_or(web.json_response(
+                                {"status": "Ground control busy", "response": await reply_body(response)}, status=503
+                            ))
+                        result = "success" if response.status < 400 else "failure"
+                        forwarded_messages.labels(GROUND_CONTROL, result).inc()
+                        report_hop(satellite, next_hop, log_communication)
+                        logger.info(f"Message sent to Ground Control ({response.status})")
+                        return web.json_response(
+                            {"status": "Message forwarded to ground control", "response": await reply_body(response)},
+                            status=response.status
+                        )
+                    # 202 means the next satellite queued it for later delivery
+                    if response.status in (200, 202):
+                        forwarded_messages.labels(hop_type(next_hop), "success").inc()
+                        report_hop(satellite, next_hop, log_communication)
+                        logger.info(f"Message forwarded to {next_hop}")
+                        return web.json_response(
+                            {"status": "Message forwarded", "response": await reply_body(response)},
+                            status=response.status
+                        )
+            except asyncio.TimeoutError:
+                logger.warning(f"Attempt {attempt+1}/{max_retries} to {next_hop} timed out")
+                if next_hop == GROUND_CONTROL:
+                    forwarded_messages.labels(GROUND_CONTROL, "timeout").inc()
+                    return held_or(web.json_response({"status": "Timeout connecting to ground control"}, status=504))
+            except (aiohttp.ClientError, ValueError) as e:
+                logger.warning(f"Attempt {attempt+1}/{max_retries} failed: {e}")
+
+            if attempt + 1 < max_retries:
+                # Wait before retry with exponential backoff
+                forward_retries.inc()
+                await asyncio.sleep(0.5 * (2 ** attempt))
+                next_hop = satellite.next_hop() or next_hop
+
+        forwarded_messages.labels(hop_type(next_hop), "failure").inc()
+        return held_or(web.json_response({"status": "Message could not be forwarded after retries"}, status=500))
+
+    async def receive_batch(request):
+        """Queue packets drained in bulk from another satellite's store."""
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        packets = data.get("packets") if isinstance(data, dict) else None
+        if hold is None or not isinstance(packets, list) or not packets:
+            return web.json_response({"status": "No data received"}, status=400)
+        priorities = data.get("priorities")
+        if not isinstance(priorities, list) or len(priorities) != len(packets):
+            priorities = [0] * len(packets)
+
+        accepted = sum(1 for packet, priority in zip(packets, priorities) if hold(packet, priority))
+        if not accepted:
+            return web.json_response({"status": "Queue full"}, status=503)
+        return web.json_response(
+            {"status": "Queued", "accepted": accepted, "rejected": len(packets) - accepted}, status=202
+        )
+
+    async def get_position(request):
+        """Return current satellite position."""
+        return web.json_response({
+            "latitude": satellite.latitude,
+            "longitude": satellite.longitude
+        })
+
+    async def get_routes(request):
+        """Return this satellite's routing table, including route ages."""
+        return web.json_response({
+            "id": satellite.id,
+            "next_hop": satellite.router.next_hop(satellite.id),
+            "routes": satellite.router.snapshot(),
+            "in_flight": request.app[IN_FLIGHT_KEY]["count"],
+        })
+
+    async def get_metrics(request):
+        """Return this process's metrics in the Prometheus text format."""
+        return web.Response(text=REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def background(app):
+        connector = aiohttp.TCPConnector(limit=max_in_flight)
+        timeout = aiohttp.ClientTimeout(total=5)
+        app[SESSION_KEY] = aiohttp.ClientSession(
+            connector=connector, timeout=timeout, trust_env=False
+        )
+        updater = asyncio.create_task(position_updater(satellite))
+        yield
+        updater.cancel()
+        await app[SESSION_KEY].close()
+
+    app.router.add_post("/", receive_message)
+    app.router.add_post("/batch", receive_batch)
+    app.router.add_get("/get-position", get_position)
+    app.router.add_get("/routes", get_routes)
+    app.router.add_get("/metrics", get_metrics)
+    app.cleanup_ctx.append(background)
+    return app
+
+
+async def position_updater(satellite):
+    """Periodic task to update satellite position off the event loop."""
+    while True:
+        try:
+            await asyncio.to_thread(satellite.move)
+        except Exception as e:
+            logger.error(f"Error updating position: {e}")
+        await asyncio.sleep(TIME_STEP)
+
+
+def hop_type(next_hop):
+    """Return the relay_forwards target label for a next hop."""
+    return GROUND_CONTROL if next_hop == GROUND_CONTROL else "satellite"
+
+
+def report_hop(satellite, next_hop, log_communication):
+    """Queue a hop for the visualiser; reporting happens off the event loop."""
+    if next_hop == GROUND_CONTROL:
+        target = GROUND_CONTROL_COORDS
+    else:
+        target = satellite.router.position(next_hop)
+    if target:
+        log_communication([satellite.latitude, satellite.longitude], target)
+
+
+def run_async_relay(satellite, hop_url, log_communication, host, port,
+                    max_in_flight=RELAY_MAX_IN_FLIGHT, hold=None):
+    """Serve the asyncio relay until interrupted."""
+    app = create_async_app(satellite, hop_url, log_communication, max_in_flight, hold)
+    logger.info(f"Starting async relay for satellite {satellite.id} on {host}:{port}")
+    web.run_app(app, host=host, port=port, print=None, access_log=None)
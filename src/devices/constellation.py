@@ -0,0 +1,132 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from threading import Thread
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('constellation')
+
+# Import configuration
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+from config import (
+    SATELLITE_PORTS, SATELLITE_IP, START_PORT, NUM_SATELLITES, TIME_STEP,
+    NEIGHBOUR_DISCOVERY, SERVER_THREADS
+)
+from gossip import NeighbourTable, PositionGossip, get_prober
+from routing import RoutingTable
+from serving import serve, add_server_arguments
+from devices import satellite as relay
+from devices.satellite import Satellite, create_store
+
+# The hosted satellites, created by create_app
+constellation = None
+
+
+class Constellation:
+    """
+    Many satellites hosted by one process.
+
+    Every satellite keeps its own port, position and store-and-forward
+    queue; requests are routed to a satellite by the port they arrive on.
+    The satellites share one position table, one routing table and the
+    process-wide connection pool, and a single thread moves them all once
+    per TIME_STEP. Satellites hosted by other processes are learned from
+    gossip, or probed in one scan per tick when polling.
+    """
+
+    def __init__(self, ports, all_ports=SATELLITE_PORTS, gossip=None):
+        self.gossip = gossip
+        self.positions = gossip.table if gossip else NeighbourTable()
+        self.router = RoutingTable()
+        self.remote_ports = [port for port in all_ports if port not in ports]
+        self.satellites = {
+            port: Satellite(
+                port, all_ports, positions=self.positions, router=self.router, store=create_store(port)
+            )
+            for port in ports
+        }
+
+    def tick(self):
+        """Move every hosted satellite, announce the new positions and refresh the shared routes."""
+        for port, satellite in self.satellites.items():
+            satellite.move()
+            self.positions.update(port, satellite.latitude, satellite.longitude)
+            if self.gossip:
+                self.gossip.publish(satellite.latitude, satellite.longitude, node_id=port)
+        if not self.gossip and self.remote_ports:
+            get_prober().probe(self.positions, SATELLITE_IP, self.remote_ports)
+        self.router.update(self.positions.positions())
+
+    def run(self):
+        """Tick forever, keeping to TIME_STEP as closely as possible."""
+        while True:
+            started = time.time()
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in constellation tick: {e}")
+            time.sleep(max(TIME_STEP - (time.time() - started), 0))
+
+    def queued(self):
+        """Return the packets waiting in every hosted satellite's store."""
+        return sum(len(satellite.store) for satellite in self.satellites.values())
+
+
+def parse_ports(spec):
+    """Parse a port list such as "33007-33011,33014" into a list of ports."""
+    ports = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        ports.extend(range(int(first), int(last or first) + 1))
+    return ports
+
+
+def create_app(ports, ip="127.0.0.1", worker_index=0):
+    """Start satellites on every port in ports and return the relay app. Serve it from a single worker process."""
+    global constellation
+
+    if worker_index:
+        raise RuntimeError("A constellation must be served by a single worker process")
+
+    # One gossip socket listens for remote satellites and announces every hosted one
+    gossip = None
+    if NEIGHBOUR_DISCOVERY == "gossip":
+        gossip = PositionGossip(NeighbourTable(), interface_ip=ip).start()
+
+    constellation = Constellation(ports, gossip=gossip)
+    relay.satellites.update(constellation.satellites)
+    relay.satellite = constellation.satellites[ports[0]]
+    relay.neighbour_table_size.set_function(lambda: len(constellation.positions))
+    relay.store_depth.set_function(constellation.queued)
+    Thread(target=relay.store_drainer, daemon=True).start()
+    Thread(target=constellation.run, daemon=True).start()
+    return relay.app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many satellites in one process.")
+    parser.add_argument("--ports", type=str, default=f"{START_PORT}-{START_PORT + NUM_SATELLITES - 1}",
+                        help="Ports of the hosted satellites, e.g. 33007-33011,33014 "
+                             "(default: the NUM_SATELLITES ports from START_PORT).")
+    parser.add_argument("--ip", type=str, default="127.0.0.1",
+                        help="IP address to bind the satellites (default: 127.0.0.1).")
+    add_server_arguments(parser)
+    parser.set_defaults(threads=None)
+    args = parser.parse_args()
+
+    try:
+        ports = parse_ports(args.ports)
+    except ValueError:
+        parser.error(f"Invalid port list: {args.ports}")
+    # Each satellite gets as many request threads as it would have on its own
+    threads = args.threads or SERVER_THREADS * len(ports)
+
+    logger.info(f"Starting constellation of {len(ports)} satellites on {args.ip}")
+    serve(lambda worker_index: create_app(ports, args.ip, worker_index), args.ip, ports,
+          server=args.server, threads=threads)
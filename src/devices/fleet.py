@@ -0,0 +1,251 @@
+import argparse
+import heapq
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+
+from flask import Flask, jsonify, request
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('fleet')
+
+# Import configuration
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+from config import (
+    SHIP_PORT, TIME_STEP, NEIGHBOUR_DISCOVERY, FLEET_SEND_WORKERS, PAYLOAD_CODEC,
+    WIRE_FORMAT
+)
+from codec import load_keyring
+from gossip import NeighbourTable, PositionGossip
+from routing import RoutingTable
+from devices.ship import Ship, LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, transport
+from metrics import instrument_flask, counter, gauge
+from serving import serve, add_server_arguments
+
+app = Flask(__name__)
+instrument_flask(app)
+
+# Scheduler metrics; per-packet results are counted by Ship.send_data
+skipped_sends = counter("fleet_sends_skipped", "Sends skipped because too many were in flight")
+sends_in_flight = gauge("fleet_sends_in_flight", "Sends waiting for or running on the send pool")
+neighbour_table_size = gauge("neighbour_table_size", "Peers in the neighbour table")
+
+# The simulated ships, created by create_app
+fleet = None
+
+
+class Fleet:
+    """
+    Many simulated ships driven from one process.
+
+    All ships share one satellite position table, one routing table and the
+    process-wide connection pool. A single scheduler thread moves every ship
+    once per TIME_STEP and hands ships whose send is due to a bounded thread
+    pool, so slow relays never hold up movement.
+    """
+
+    def __init__(self, count, id_prefix="F", send_interval=TIME_STEP * 5, send_jitter=0,
+                 cipher_suite=None, interoperable=False, gossip=None,
+                 send_workers=FLEET_SEND_WORKERS, wire_format=WIRE_FORMAT):
+        self.gossip = gossip
+        self.positions = gossip.table if gossip else NeighbourTable()
+        self.router = RoutingTable()
+        self.ships = []
+        width = max(len(str(count - 1)), 2)
+        for i in range(count):
+            ship = Ship(
+                ship_id=f"{id_prefix}{i:0{width}d}",
+                positions=self.positions,
+                router=self.router,
+                cipher_suite=cipher_suite,
+                interoperable=interoperable,
+                wire_format=wire_format,
+                send_interval=send_interval,
+                send_jitter=send_jitter,
+            )
+            # Spread ships over the sea and stagger their first sends
+            ship.latitude = random.uniform(LAT_MIN, LAT_MAX)
+            ship.longitude = random.uniform(LON_MIN, LON_MAX)
+            ship.direction = random.choice([1, -1])
+            ship.next_send_time = time.time() + random.uniform(0, send_interval)
+            self.ships.append(ship)
+        self.by_id = {ship.ship_id: ship for ship in self.ships}
+
+        # Heap of (next send time, index) so a tick only touches due ships
+        self.schedule = [(ship.next_send_time, i) for i, ship in enumerate(self.ships)]
+        heapq.heapify(self.schedule)
+        self.send_pool = ThreadPoolExecutor(max_workers=send_workers)
+        self.max_in_flight = send_workers * 4
+        self.in_flight = 0
+        self.stats = {"sent": 0, "delivered": 0, "failed": 0, "skipped": 0}
+        self._lock = Lock()
+
+    def tick(self):
+        """Refresh the shared view, move every ship and dispatch due sends."""
+        if not self.gossip:
+            self.ships[0].poll_neighbors()
+        self.router.update(self.positions.positions())
+
+        for ship in self.ships:
+            ship.move()
+
+        now = time.time()
+        while self.schedule and self.schedule[0][0] <= now:
+            _, i = heapq.heappop(self.schedule)
+            ship = self.ships[i]
+            with self._lock:
+                busy = self.in_flight >= self.max_in_flight
+                if busy:
+                    self.stats["skipped"] += 1
+                else:
+                    self.in_flight += 1
+            if busy:
+                # Don't queue unboundedly behind slow relays; skip this send
+                ship.schedule_next_send(now)
+                skipped_sends.inc()
+            else:
+                self.send_pool.submit(self._send, ship)
+            heapq.heappush(self.schedule, (ship.next_send_time, i))
+
+    def _send(self, ship):
+        try:
+            delivered = ship.send_data()
+        except Exception as e:
+            logger.error(f"Error sending data from ship {ship.ship_id}: {e}")
+            delivered = False
+        with self._lock:
+            self.in_flight -= 1
+            self.stats["sent"] += 1
+            self.stats["delivered" if delivered else "failed"] += 1
+
+    def run(self):
+        """Tick forever, keeping to TIME_STEP as closely as possible."""
+        while True:
+            started = time.time()
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in fleet tick: {e}")
+            time.sleep(max(TIME_STEP - (time.time() - started), 0))
+
+    def summary(self):
+        with self._lock:
+            return {
+                "ships": len(self.ships),
+                "in_flight": self.in_flight,
+                **self.stats,
+            }
+
+
+@app.route("/get-position", methods=["GET"])
+def get_position():
+    """Return the position of one ship (the first, unless ship_id is given)."""
+    ship_id = request.args.get("ship_id")
+    ship = fleet.by_id.get(ship_id) if ship_id else fleet.ships[0]
+    if ship is None:
+        return jsonify({"status": "Unknown ship"}), 404
+    return jsonify({
+        "latitude": ship.latitude,
+        "longitude": ship.longitude
+    })
+
+@app.route("/fleet", methods=["GET"])
+def get_fleet():
+    """Return send statistics and the position of every ship."""
+    return jsonify({
+        **fleet.summary(),
+        "positions": {
+            ship.ship_id: [ship.latitude, ship.longitude] for ship in fleet.ships
+        },
+    })
+
+@app.route("/transport-stats", methods=["GET"])
+def get_transport_stats():
+    """Return per-peer connection reuse statistics."""
+    return jsonify(transport.stats())
+
+def create_app(ships=100, ip="127.0.0.1", id_prefix="F", send_interval=TIME_STEP * 5, send_jitter=0,
+               key_path="src/devices/symmetric.key", codec=PAYLOAD_CODEC, wire_format=WIRE_FORMAT,
+               interoperable=False, worker_index=0):
+    """Start a fleet of ships sending telemetry and return the app. Serve it from a single worker process."""
+    global fleet
+
+    if worker_index:
+        raise RuntimeError("A fleet must be served by a single worker process")
+
+    # Load the symmetric key; Group 8 only understands Fernet
+    try:
+        keyring = load_keyring(key_path)
+        cipher_suite = keyring.codec("fernet" if interoperable else codec)
+        logger.info(f"Symmetric key loaded successfully ({cipher_suite.name} codec)")
+    except Exception as e:
+        logger.error(f"Error loading symmetric key: {e}")
+        raise
+
+    # One gossip listener feeds every ship's view of the satellites
+    gossip = None
+    if NEIGHBOUR_DISCOVERY == "gossip":
+        gossip = PositionGossip(NeighbourTable(), interface_ip=ip).start()
+
+    fleet = Fleet(
+        ships,
+        id_prefix=id_prefix,
+        send_interval=send_interval,
+        send_jitter=send_jitter,
+        cipher_suite=cipher_suite,
+        interoperable=interoperable,
+        gossip=gossip,
+        wire_format=wire_format,
+    )
+    sends_in_flight.set_function(lambda: fleet.in_flight)
+    neighbour_table_size.set_function(lambda: len(fleet.positions))
+    Thread(target=fleet.run, daemon=True).start()
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many simulated ships in one process.")
+    parser.add_argument("--ships", type=int, default=100, help="Number of ships (default: 100).")
+    parser.add_argument("--port", type=int, default=SHIP_PORT[0],
+                        help=f"Port for the fleet server (default: {SHIP_PORT[0]}).")
+    parser.add_argument("--ip", type=str, default="127.0.0.1",
+                        help="IP address to bind the fleet server (default: 127.0.0.1).")
+    parser.add_argument("--id-prefix", type=str, default="F",
+                        help="Prefix for generated ship IDs (default: F).")
+    parser.add_argument("--send-interval", type=float, default=TIME_STEP * 5,
+                        help="Seconds between packets from each ship.")
+    parser.add_argument("--send-jitter", type=float, default=0,
+                        help="Maximum random offset in seconds applied to each ship's interval.")
+    parser.add_argument("--key-path", type=str, default="src/devices/symmetric.key",
+                        help="Path to the symmetric key file.")
+    parser.add_argument("--codec", type=str, default=PAYLOAD_CODEC,
+                        help=f"Payload codec: aesgcm, chacha20 or fernet (default: {PAYLOAD_CODEC}).")
+    parser.add_argument("--wire-format", choices=("binary", "json"), default=WIRE_FORMAT,
+                        help=f"Framing of packets sent to satellites (default: {WIRE_FORMAT}).")
+    parser.add_argument("--interoperable", action="store_true",
+                        help="Enable interoperability with Group 8's system.")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Keep per-ship log lines (noisy with many ships).")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('ship').setLevel(logging.ERROR)
+
+    def factory(worker_index):
+        return create_app(args.ships, args.ip, args.id_prefix, args.send_interval, args.send_jitter,
+                          args.key_path, args.codec, args.wire_format, args.interoperable, worker_index)
+
+    logger.info(f"Starting fleet of {args.ships} ships on {args.ip}:{args.port}")
+    try:
+        serve(factory, args.ip, args.port, server=args.server, threads=args.threads)
+    except (ValueError, RuntimeError, OSError):
+        sys.exit(1)
@@ -1,11 +1,8 @@
 import argparse
-from cryptography.fernet import Fernet
 import json
+import sqlite3
 from flask import Flask, request, jsonify
-import csv
-from pathlib import Path
 import time
-from datetime import datetime
 import sys
 import os
 import logging
@@ -21,94 +18,581 @@ logger = logging.getLogger('ground_control')
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
-from config import GROUND_CONTROL_PORT
+from config import GROUND_CONTROL_PORT, INGEST_SHARDS, TELEMETRY_STORE, QUERY_MAX_ROWS
 
 # Import utility functions
-from devices.ship import calculate_checksum
+from envelope import calculate_checksum, unpack_batch, is_batch, EnvelopeError
+from codec import CodecError, Keyring, load_keyring
+from wire import is_binary, decode_packet, WireError
+from ingest import make_record, create_sinks, BufferedWriter, ShardedVerifier
+from dedup import DedupIndex
+from telemetry_store import TelemetryStore, QueryError, parse_range
+from tracing import TRACE_HEADER, parse_trace, build_trace_record, TraceStats, TraceSink
+from metrics import instrument_flask, counter, histogram
+from serving import serve, worker_path, add_server_arguments
 
 app = Flask(__name__)
+instrument_flask(app)
 
-# CSV file for storing received data
+# Packet verification metrics, served at /metrics
+verified_packets = counter("packets_verified", "Packets verified, by result", ("result",))
+decrypt_seconds = histogram("packet_decrypt_duration_seconds", "Time spent decrypting payloads")
+checksum_seconds = histogram("packet_checksum_duration_seconds", "Time spent verifying checksums")
+
+# Base path for storing received data; each output format gets its own suffix
 OUTPUT_FILE = "src/data/output_data.csv"
 
-def ensure_output_file_exists():
-    """Create output file with headers if it doesn't exist."""
-    file_path = Path(OUTPUT_FILE)
-    if not file_path.exists():
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        file_path.touch()
-
-        with open(OUTPUT_FILE, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["ship_id", "timestamp_sent", "fish_count", "wind_level", "water_temp", "water_depth", "delay"])
-        logger.info(f"Created output file: {OUTPUT_FILE}")
-
-def save_data_to_csv(data, timestamp, delay, payload):
-    """Save received data to CSV file."""
-    with open(OUTPUT_FILE, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow([
-            data.get("ship_id", "unknown"),
-            datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else "N/A",
-            payload.get("caught_fish", "N/A"),
-            payload.get("wind_levels", "N/A"),
-            payload.get("water_temperature", "N/A"),
-            payload.get("water_depth", "N/A"),
-            delay,
-        ])
+# Per-hop traces of received packets, one JSON object per line
+TRACE_FILE = "src/data/traces.jsonl"
+
+# Indexed database of received readings, shared by every worker process
+STORE_FILE = "src/data/telemetry.db"
+
+# Buffered writers for verified records and their traces, created by create_app
+writer = None
+trace_writer = None
+
+# Codecs for the shared key, loaded by create_app
+keyring = None
+
+# Shard processes verifying acknowledged packets, or None to verify before
+# acknowledging; started by create_app
+ingest = None
+
+# Message IDs already written, to drop duplicate deliveries; created by create_app
+dedup = None
+
+# Queryable store of written readings, or None if TELEMETRY_STORE is off; opened by create_app
+store = None
+
+# Latency histograms built from packet traces
+trace_stats = TraceStats()
+
+# Index of this server process; /metrics, /trace-stats and /dedup-stats only
+# cover the requests this worker handled
+worker = 0
+
+class PacketError(Exception):
+    """A packet that failed validation, with the status to report back."""
+
+def verify_packet(data, keys=None, received_at=None, plaintext=None):
+    """
+    Decrypt and verify a single packet.
+
+    The packet's codec authenticates the payload. Packets from senders that
+    still add an MD5 checksum have it verified too.
+
+    Args:
+        data: Packet dict as sent by a ship
+        keys: Keyring to decrypt with (defaults to the loaded key)
+        received_at: Arrival time used for the delay (defaults to now)
+        plaintext: Payload already decrypted by decrypt_packets, if any
+
+    Returns:
+        dict: Telemetry record ready to be written
+
+    Raises:
+        PacketError: If the packet is malformed, corrupted or can't be decrypted
+    """
+    try:
+        record = _verify_packet(data, keys or keyring, received_at, plaintext)
+    except PacketError as e:
+        verified_packets.labels(str(e)).inc()
+        raise
+    verified_packets.labels("accepted").inc()
+    return record
+
+def _verify_packet(data, keys, received_at, plaintext):
+    """Checks behind verify_packet, which counts their outcome."""
+    if not data:
+        logger.warning("No data received")
+        raise PacketError("No data received")
+
+    if not isinstance(data, dict) or "payload" not in data:
+        logger.warning("Invalid data format - missing payload")
+        raise PacketError("Invalid data format")
+    codec = packet_codec(data, keys)
+
+    try:
+        # Decrypt and authenticate the payload
+        if plaintext is None:
+            with decrypt_seconds.time():
+                plaintext = codec.decrypt(data["payload"].encode())
+        decrypted_payload = plaintext.decode()
+
+        # Verify the checksum of senders that still add one
+        if "checksum" in data:
+            with checksum_seconds.time():
+                valid = calculate_checksum(decrypted_payload) == data["checksum"]
+            if not valid:
+                logger.warning(f"Checksum mismatch for data from Ship {data.get('ship_id', 'unknown')}")
+                raise PacketError("Checksum Error")
+
+        payload = json.loads(decrypted_payload)
+
+    except PacketError:
+        raise
+    except CodecError:
+        logger.warning(f"Payload from Ship {data.get('ship_id', 'unknown')} failed authentication")
+        raise PacketError("Checksum Error")
+    except (ValueError, json.JSONDecodeError) as e:
+        logger.error(f"JSON parsing error: {e}")
+        raise PacketError("Invalid payload format")
+    except Exception as e:
+        logger.error(f"Decryption error: {e}")
+        raise PacketError("Decryption Error")
+
+    timestamp = data.get("timestamp")
+    if received_at is None:
+        received_at = time.time()
+    delay = round(received_at - timestamp, 2) if timestamp else "Unknown"
+    return make_record(data.get("ship_id", "unknown"), timestamp, delay, payload, data.get("seq"))
+
+def packet_codec(data, keys):
+    """Return the codec a packet names. Raises PacketError if it is unknown."""
+    try:
+        return keys.for_packet(data)
+    except ValueError:
+        logger.warning(f"Unsupported codec {data.get('codec')!r} from Ship {data.get('ship_id', 'unknown')}")
+        raise PacketError("Unsupported codec")
+
+def decrypt_packets(packets, keys=None):
+    """
+    Decrypt the payloads of many single packets, one call per codec.
+
+    Returns:
+        list: Plaintext per packet, or None where a packet is an envelope,
+        is malformed or failed to decrypt (verify_packet reports why)
+    """
+    keys = keys or keyring
+    plaintexts = [None] * len(packets)
+    by_codec = {}
+    for index, packet in enumerate(packets):
+        if is_batch(packet) or not isinstance(packet, dict) or not isinstance(packet.get("payload"), str):
+            continue
+        try:
+            codec = keys.for_packet(packet)
+        except ValueError:
+            continue
+        by_codec.setdefault(codec, []).append(index)
+    with decrypt_seconds.time():
+        for codec, indices in by_codec.items():
+            tokens = [packets[index]["payload"].encode() for index in indices]
+            for index, plaintext in zip(indices, codec.decrypt_many(tokens)):
+                plaintexts[index] = plaintext
+    return plaintexts
+
+def verify_envelope(data, keys=None, received_at=None):
+    """
+    Open a batch envelope and verify each reading in it.
+
+    Args:
+        data: Envelope built by envelope.pack_batch
+        keys: Keyring to decrypt with (defaults to the loaded key)
+        received_at: Arrival time used for the delays (defaults to now)
+
+    Returns:
+        tuple: (records, rejected), where rejected lists {"reading", "status"}
+        for readings that failed their checksum
+
+    Raises:
+        PacketError: If the envelope itself can't be opened
+    """
+    ship_id = data.get("ship_id", "unknown")
+    try:
+        codec = packet_codec(data, keys or keyring)
+        with decrypt_seconds.time():
+            readings = unpack_batch(data, codec)
+    except PacketError as e:
+        verified_packets.labels(str(e)).inc()
+        raise
+    except EnvelopeError as e:
+        logger.warning(f"Rejected batch from Ship {ship_id}: {e}")
+        verified_packets.labels(str(e)).inc()
+        raise PacketError(str(e))
+
+    if received_at is None:
+        received_at = time.time()
+    records = []
+    rejected = []
+    for index, reading in enumerate(readings):
+        try:
+            payload = reading["payload"]
+            with checksum_seconds.time():
+                valid = calculate_checksum(json.dumps(payload)) == reading["checksum"]
+        except (KeyError, TypeError):
+            rejected.append({"reading": index, "status": "Invalid data format"})
+            continue
+        if not valid:
+            rejected.append({"reading": index, "status": "Checksum Error"})
+            continue
+        timestamp = reading.get("timestamp")
+        delay = round(received_at - timestamp, 2) if timestamp else "Unknown"
+        records.append(make_record(ship_id, timestamp, delay, payload, reading.get("seq")))
+
+    if rejected:
+        logger.warning(f"Dropped {len(rejected)} corrupted readings in batch from Ship {ship_id}")
+    verified_packets.labels("accepted").inc(len(records))
+    for entry in rejected:
+        verified_packets.labels(entry["status"]).inc()
+    return records, rejected
+
+def verify_packets(data, plaintext=None, received_at=None):
+    """Verify a single packet or a batch envelope, returning (records, rejected)."""
+    if is_batch(data):
+        return verify_envelope(data, received_at=received_at)
+    return [verify_packet(data, plaintext=plaintext, received_at=received_at)], []
+
+def drop_duplicates(records):
+    """Return the records whose message IDs haven't been seen before, reserving their IDs."""
+    return dedup.filter(records) if dedup is not None else records
+
+def write_records(records):
+    """
+    Hand records to the writer and remember their IDs. Returns False if the writer is full.
+
+    If the write fails the IDs reserved by drop_duplicates are released, so a resend is written.
+    """
+    if dedup is None:
+        return not records or writer.add_many(records)
+    written = False
+    try:
+        written = not records or writer.add_many(records)
+    finally:
+        if written:
+            dedup.add(records)
+        else:
+            dedup.release(records)
+    return written
+
+def check_packet(data, keys=None):
+    """
+    The cheap checks a packet passes before it is acknowledged and queued
+    for a shard: it has a payload, and a codec this ground control knows.
+
+    Raises:
+        PacketError: If the packet can't be verified later
+    """
+    if not data:
+        raise PacketError("No data received")
+    if not isinstance(data, dict) or not isinstance(data.get("payload"), str):
+        raise PacketError("Invalid data format")
+    packet_codec(data, keys or keyring)
+
+def init_shard(key):
+    """Load the shared key in a shard process."""
+    global keyring
+    keyring = Keyring(key)
+
+def verify_shard_batch(items):
+    """
+    Verify (packet, received_at) pairs in a shard process.
+
+    Returns:
+        list: (records, rejected, error) per packet, where error is the
+        PacketError status if the whole packet was rejected, else None
+    """
+    plaintexts = decrypt_packets([data for data, _ in items])
+    results = []
+    for (data, received_at), plaintext in zip(items, plaintexts):
+        try:
+            records, rejected = verify_packets(data, plaintext, received_at)
+        except PacketError as e:
+            results.append(([], [], str(e)))
+            continue
+        results.append((records, rejected, None))
+    return results
+
+def deliver_shard_result(context, result):
+    """Count, trace and write a packet verified by a shard process."""
+    records, rejected, error = result
+    if error:
+        verified_packets.labels(error).inc()
+        return
+    verified_packets.labels("accepted").inc(len(records))
+    for entry in rejected:
+        verified_packets.labels(entry["status"]).inc()
+    records = drop_duplicates(records)
+    if context is not None:
+        header, received_at, sent = context
+        record_trace(records, header, received_at, time.time() - received_at, sent)
+    if not write_records(records):
+        logger.warning(f"Output buffer full, dropping {len(records)} verified readings")
+
+def enqueue_packet(data, received_at, context=None):
+    """Queue a checked packet on its ship's shard. Returns None if queued, else the status."""
+    try:
+        check_packet(data)
+    except PacketError as e:
+        verified_packets.labels(str(e)).inc()
+        return str(e)
+    if not ingest.submit(data.get("ship_id", "unknown"), (data, received_at), context):
+        return "Busy"
+    return None
 
 @app.route("/", methods=["POST"])
 def receive_data():
-    """Handle incoming data from ships via satellites."""
+    """
+    Handle incoming data (a packet or a batch envelope) from ships via satellites.
+
+    Accepts JSON, or the binary framing when sent with its content type.
+    """
     try:
-        data = request.get_json()
-        if not data:
-            logger.warning("No data received")
-            return jsonify({"status": "No data received"}), 400
-            
-        if "payload" not in data or "checksum" not in data:
-            logger.warning("Invalid data format - missing payload or checksum")
-            return jsonify({"status": "Invalid data format"}), 400
-            
+        received_at = time.time()
+        if is_binary(request.content_type):
+            try:
+                data = decode_packet(request.get_data())
+            except WireError as e:
+                logger.warning(f"Unreadable frame: {e}")
+                verified_packets.labels("Invalid data format").inc()
+                return jsonify({"status": "Invalid data format"}), 400
+        else:
+            data = request.get_json()
+
+        # With shards, acknowledge now and verify in the ship's shard process
+        if ingest is not None:
+            context = (request.headers.get(TRACE_HEADER), received_at, envelope_sent_at(data))
+            status = enqueue_packet(data, received_at, context)
+            if status == "Busy":
+                logger.warning("Shard queue full, rejecting message")
+                return jsonify({"status": status}), 503
+            if status:
+                return jsonify({"status": status}), 400
+            return jsonify({"status": "Accepted"}), 202
+
+        if is_batch(data):
+            return receive_envelope(data, received_at)
         try:
-            # Decrypt the payload
-            encrypted_payload = data["payload"].encode()
-            decrypted_payload = cipher_suite.decrypt(encrypted_payload).decode()
-            
-            # Verify checksum
-            received_checksum = data["checksum"]
-            calculated_checksum = calculate_checksum(decrypted_payload)
-            
-            if received_checksum != calculated_checksum:
-                logger.warning(f"Checksum mismatch for data from Ship {data.get('ship_id', 'unknown')}")
-                return jsonify({"status": "Checksum Error"}), 400
-                
-            data["payload"] = json.loads(decrypted_payload)
-            
-        except (ValueError, json.JSONDecodeError) as e:
-            logger.error(f"JSON parsing error: {e}")
-            return jsonify({"status": "Invalid payload format"}), 400
-        except Exception as e:
-            logger.error(f"Decryption error: {e}")
-            return jsonify({"status": "Decryption Error"}), 400
-            
+            record = verify_packet(data)
+        except PacketError as e:
+            return jsonify({"status": str(e)}), 400
+
+        # A resent copy of a packet already written is acknowledged again
+        if not drop_duplicates([record]):
+            logger.info(f"Dropped duplicate message {record['seq']} from Ship {record['ship_id']}")
+            return jsonify({"status": "Acknowledged", "duplicate": True}), 200
+        record_trace([record], request.headers.get(TRACE_HEADER), received_at, time.time() - received_at)
+
         # Process the valid data
-        payload = data["payload"]
-        logger.info(f"Received data from Ship {data.get('ship_id', 'unknown')}")
-        
-        timestamp = data.get("timestamp")
-        delay = round(time.time() - timestamp, 2) if timestamp else "Unknown"
-        logger.info(f"Message delay: {delay} seconds")
-        
-        # Save data to CSV
-        save_data_to_csv(data, timestamp, delay, payload)
-        
+        logger.info(f"Received data from Ship {record['ship_id']}")
+        logger.info(f"Message delay: {record['delay']} seconds")
+
+        # Hand the record to the buffered writer
+        if not write_records([record]):
+            logger.warning("Output buffer full, rejecting message")
+            return jsonify({"status": "Busy"}), 503
+
         return jsonify({"status": "Acknowledged"}), 200
-        
+
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return jsonify({"status": "Server Error"}), 500
+
+def receive_envelope(data, received_at):
+    """Write every valid reading of a batch envelope."""
+    try:
+        records, rejected = verify_envelope(data)
+    except PacketError as e:
+        return jsonify({"status": str(e)}), 400
+    verified = len(records)
+    records = drop_duplicates(records)
+    record_trace(
+        records, request.headers.get(TRACE_HEADER), received_at, time.time() - received_at, envelope_sent_at(data)
+    )
+
+    logger.info(f"Received batch of {len(records)} readings from Ship {data.get('ship_id', 'unknown')}")
+    if not write_records(records):
+        logger.warning("Output buffer full, rejecting batch")
+        return jsonify({"status": "Busy"}), 503
+    return jsonify({
+        "status": "Acknowledged",
+        "accepted": len(records),
+        "duplicates": verified - len(records),
+        "rejected": rejected,
+    }), 200
+
+def envelope_sent_at(data):
+    """Return the time a batch envelope was sent, or None for a single packet."""
+    return data.get("timestamp") if is_batch(data) else None
+
+def record_trace(records, header, received_at, verify_time, sent=None):
+    """
+    Add a packet's hop trace to the histograms and queue it for the trace file.
+
+    records are the packet's written readings; a batch envelope gets one
+    trace, timed from sent, however many readings it carried.
+    """
+    if not records:
+        return
+    trace = build_trace_record(records[0], parse_trace(header), received_at, verify_time, len(records), sent)
+    trace_stats.add(trace)
+    # Traces are diagnostic, so drop them rather than wait if the buffer is full
+    if trace_writer is not None:
+        trace_writer.add(trace, timeout=0)
+
+@app.route("/trace-stats", methods=["GET"])
+def get_trace_stats():
+    """Return this worker's latency histograms per hop count and per satellite."""
+    return jsonify({**trace_stats.snapshot(), "worker": worker})
+
+@app.route("/dedup-stats", methods=["GET"])
+def get_dedup_stats():
+    """Return how many message IDs this worker remembers and how many duplicates it dropped."""
+    return jsonify({**(dedup.stats() if dedup is not None else {}), "worker": worker})
+
+def query_store(run):
+    """Answer a /readings query: run(ship_id, start, end) against the store."""
+    if store is None:
+        return jsonify({"status": "Telemetry store disabled"}), 404
+    try:
+        return jsonify(run(*parse_range(request.args)))
+    except QueryError as e:
+        return jsonify({"status": str(e)}), 400
+
+@app.route("/readings", methods=["GET"])
+def get_readings():
+    """Return readings in a time range, oldest first: ?ship=&start=&end=&last=&limit=."""
+    try:
+        limit = int(request.args.get("limit", QUERY_MAX_ROWS))
+    except ValueError:
+        return jsonify({"status": "limit must be an integer"}), 400
+    return query_store(lambda ship_id, start, end: store.readings(ship_id, start, end, limit))
+
+@app.route("/readings/stats", methods=["GET"])
+def get_reading_stats():
+    """Return delay percentiles, fish totals and mean conditions per ship and overall."""
+    return query_store(lambda ship_id, start, end: store.stats(ship_id, start, end))
+
+@app.route("/readings/series", methods=["GET"])
+def get_reading_series():
+    """Return readings downsampled into ?bucket= second buckets."""
+    try:
+        bucket = float(request.args.get("bucket", 60))
+    except ValueError:
+        return jsonify({"status": "bucket must be a number"}), 400
+    return query_store(lambda ship_id, start, end: store.series(bucket, ship_id, start, end))
+
+@app.route("/batch", methods=["POST"])
+def receive_batch():
+    """
+    Handle many packets in one request.
+
+    Accepts a JSON list of packets, or {"packets": [...]}; any packet may be
+    a batch envelope. Valid readings are written; invalid ones are reported
+    back by index (and reading index within an envelope).
+    """
+    try:
+        data = request.get_json()
+        packets = data.get("packets") if isinstance(data, dict) else data
+        if not isinstance(packets, list) or not packets:
+            logger.warning("No packets received")
+            return jsonify({"status": "No data received"}), 400
+
+        if ingest is not None:
+            return enqueue_batch(packets)
+
+        records = []
+        rejected = []
+        plaintexts = decrypt_packets(packets)
+        for index, (packet, plaintext) in enumerate(zip(packets, plaintexts)):
+            try:
+                verified, failed = verify_packets(packet, plaintext)
+            except PacketError as e:
+                rejected.append({"index": index, "status": str(e)})
+                continue
+            records.extend(verified)
+            rejected.extend({"index": index, **entry} for entry in failed)
+
+        verified = len(records)
+        records = drop_duplicates(records)
+        if not write_records(records):
+            logger.warning("Output buffer full, rejecting batch")
+            return jsonify({"status": "Busy"}), 503
+
+        logger.info(f"Received batch of {len(packets)} packets ({len(records)} readings, {len(rejected)} rejected)")
+        return jsonify({
+            "status": "Acknowledged",
+            "accepted": len(records),
+            "duplicates": verified - len(records),
+            "rejected": rejected,
+        }), 200
+
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         return jsonify({"status": "Server Error"}), 500
 
+def enqueue_batch(packets):
+    """Queue each packet of a /batch request on its ship's shard, reporting those not queued."""
+    received_at = time.time()
+    rejected = []
+    for index, packet in enumerate(packets):
+        status = enqueue_packet(packet, received_at)
+        if status:
+            rejected.append({"index": index, "status": status})
+    accepted = len(packets) - len(rejected)
+    if not accepted and any(entry["status"] == "Busy" for entry in rejected):
+        return jsonify({"status": "Busy"}), 503
+    logger.info(f"Queued batch of {len(packets)} packets ({len(rejected)} rejected)")
+    return jsonify({"status": "Accepted", "accepted": accepted, "rejected": rejected}), 202
+
+
+def create_app(key_path="src/devices/symmetric.key", output_format="csv", shards=INGEST_SHARDS, worker_index=0):
+    """
+    Load the shared key, open the outputs and return the app.
+
+    Worker 0 writes OUTPUT_FILE and TRACE_FILE; other workers of a
+    multi-process server write their own copies (output_data_w1.csv, ...),
+    so no two processes append to the same file. Every worker writes to the
+    one STORE_FILE database, so any of them can answer queries.
+
+    Args:
+        key_path: Path to the symmetric key file
+        output_format: Comma-separated output formats: csv, binlog, parquet
+        shards: Processes verifying packets after they are acknowledged, or
+            0 to verify each packet before acknowledging it
+        worker_index: Index of the server process calling the factory
+
+    Raises:
+        ValueError, RuntimeError: If an output format is unknown or unavailable
+        OSError: If the key file can't be read
+    """
+    global writer, trace_writer, keyring, ingest, dedup, store, worker
+
+    worker = worker_index
+    try:
+        keyring = load_keyring(key_path)
+        logger.info("Symmetric key loaded successfully")
+    except FileNotFoundError:
+        logger.error(f"Key file not found at {key_path}")
+        raise
+    except Exception as e:
+        logger.error(f"Error loading key: {e}")
+        raise
+
+    # Open the output sinks and start the buffered writers
+    try:
+        sinks = create_sinks(output_format.split(","), worker_path(OUTPUT_FILE, worker_index))
+    except (ValueError, RuntimeError) as e:
+        logger.error(f"Error opening output: {e}")
+        raise
+    if TELEMETRY_STORE:
+        try:
+            store = TelemetryStore(STORE_FILE)
+        except sqlite3.Error as e:
+            logger.error(f"Error opening telemetry store {STORE_FILE}: {e}")
+            raise RuntimeError(f"Can't open telemetry store: {e}") from e
+        sinks.append(store)
+    writer = BufferedWriter(sinks)
+    trace_writer = BufferedWriter([TraceSink(worker_path(TRACE_FILE, worker_index))], name="traces")
+    dedup = DedupIndex()
+
+    # Started after the writers, so it is closed (and drained into them) first
+    if shards:
+        ingest = ShardedVerifier(
+            verify_shard_batch, deliver_shard_result, shards, initializer=init_shard, initargs=(keyring.key,)
+        )
+        logger.info(f"Verifying packets on {shards} shard processes")
+    return app
 
 if __name__ == "__main__":
     # Argument parser for IP
@@ -117,24 +601,18 @@ if __name__ == "__main__":
                         help="IP address to bind the ground control server (default: 0.0.0.0).")
     parser.add_argument("--key-path", type=str, default="src/devices/symmetric.key",
                         help="Path to the symmetric key file.")
+    parser.add_argument("--output-format", type=str, default="csv",
+                        help="Comma-separated output formats: csv, binlog, parquet (default: csv).")
+    parser.add_argument("--shards", type=int, default=INGEST_SHARDS,
+                        help="Acknowledge packets after cheap checks and verify them on this many "
+                             f"processes, sharded by ship (default: {INGEST_SHARDS}, verify before acknowledging).")
+    add_server_arguments(parser, workers=True)
     args = parser.parse_args()
 
-    # Ensure output file exists
-    ensure_output_file_exists()
-
-    # Load the symmetric key
+    # Start the server; each worker process runs create_app
+    logger.info(f"Starting ground control server on {args.ip}:{GROUND_CONTROL_PORT}")
     try:
-        with open(args.key_path, "rb") as key_file:
-            key = key_file.read()
-        cipher_suite = Fernet(key)
-        logger.info("Symmetric key loaded successfully")
-    except FileNotFoundError:
-        logger.error(f"Key file not found at {args.key_path}")
+        serve(lambda worker_index: create_app(args.key_path, args.output_format, args.shards, worker_index),
+              args.ip, GROUND_CONTROL_PORT, server=args.server, workers=args.workers, threads=args.threads)
+    except (ValueError, RuntimeError, OSError):
         sys.exit(1)
-    except Exception as e:
-        logger.error(f"Error loading key: {e}")
-        sys.exit(1)
-
-    # Start the Flask server
-    logger.info(f"Starting ground control server on {args.ip}:{GROUND_CONTROL_PORT}")
-    app.run(host=args.ip, port=GROUND_CONTROL_PORT)
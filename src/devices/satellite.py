@@ -1,13 +1,12 @@
 import argparse
 from flask import Flask, request, jsonify
 import time
-from threading import Thread
+from threading import Event, Thread
 import requests
 import sys
 import random
 import os
 import logging
-from math import radians, sin, cos, sqrt, atan2
 
 # Setup logging
 logging.basicConfig(
@@ -22,34 +21,76 @@ sys.path.append(BASE_DIR)
 #sys.path.append("/Users/korayyesilova/Desktop/sc_project3/src")  # Update to your path
 from config import (
     SATELLITE_PORTS, GROUND_CONTROL_PORT, GROUND_CONTROL_COORDS, 
-    TIME_STEP, COMMUNICATION_RANGE_KM, EARTH_DEVICE_IP, SATELLITE_IP
+    TIME_STEP, COMMUNICATION_RANGE_KM, EARTH_DEVICE_IP, SATELLITE_IP,
+    NEIGHBOUR_DISCOVERY, STORE_FORWARD_DRAIN_BATCH, STORE_FORWARD_PERSIST, RELAY_DESTINATIONS
 )
+from gossip import NeighbourTable, PositionGossip, get_prober
+from geo import haversine
+from routing import RoutingTable, GROUND_CONTROL
+from transport import get_transport
+from comms import CommunicationReporter
+from tracing import TRACE_HEADER, append_hop
+from metrics import instrument_flask, counter, gauge, histogram
+from store_forward import StoreAndForwardQueue, PRIORITY_HEADER
+from wire import unframe, relay_headers, destination_url, WireError
+from serving import serve, add_server_arguments
 
 app = Flask(__name__)
+instrument_flask(app)
+
+# Pooled keep-alive connections to peers
+transport = get_transport()
+
+# Hop events are sent to the visualiser in batches
+communication_reporter = CommunicationReporter(
+    f"http://{EARTH_DEVICE_IP}:33069/log-communication", transport
+)
+
+# Relay and neighbour discovery metrics, served at /metrics
+forwarded_messages = counter(
+    "relay_forwards", "Messages forwarded, by next hop type and result", ("target", "result")
+)
+forward_retries = counter("relay_retries", "Forward attempts that failed and were retried")
+find_neighbors_seconds = histogram(
+    "find_neighbors_duration_seconds", "Time spent finding neighbours and refreshing routes"
+)
+neighbour_table_size = gauge("neighbour_table_size", "Peers in the neighbour table")
+held_packets = counter("store_forward_held", "Packets queued because they could not be forwarded")
+store_depth = gauge("store_forward_queued", "Packets waiting in the store-and-forward queue")
+
+# Satellites hosted by this process by port, and the one requests on any
+# other port go to, created by start_satellite (or a constellation host)
+satellites = {}
+satellite = None
+
+# Set to drain the store without waiting for the next time step
+drain_wakeup = Event()
 
 # Satellite movement parameters
 SATELLITE_SPEED = 2.5
 LAT_MIN, LAT_MAX = 48.5, 52.5
 LON_MIN, LON_MAX = -11.5, -5.83
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points on Earth using haversine formula."""
-    R = 6371  # Earth radius in kilometers
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
 # Satellite State
 class Satellite:
-    def __init__(self, satellite_id, all_ports):
+    def __init__(self, satellite_id, all_ports, gossip=None, positions=None, router=None,
+                 range_km=COMMUNICATION_RANGE_KM, store=None):
         self.id = satellite_id
         # Random initial position within specified range
         self.latitude = random.uniform(LAT_MIN, LAT_MAX)
         self.longitude = random.uniform(LON_MIN, LON_MAX)
         self.all_ports = all_ports
         self.neighbors = []
+        self.gossip = gossip  # PositionGossip, or None to poll peers over HTTP
+        # A shared view (simulator) is kept fresh by its owner, who also
+        # feeds the shared router once per step
+        self.shared_view = positions is not None
+        if positions is None:
+            positions = gossip.table if gossip else NeighbourTable()
+        self.positions = positions
+        self.range_km = range_km
+        self.router = router if router is not None else RoutingTable(range_km=range_km)
+        self.store = store  # StoreAndForwardQueue for packets with no route, or None
         self.moving_up_right = random.choice([True, False])
         self.step_size = 0.05
         logger.info(f"Satellite {self.id} initialized at ({self.latitude}, {self.longitude})")
@@ -73,156 +114,259 @@ class Satellite:
             self.moving_up_right = not self.moving_up_right
             logger.debug(f"Satellite {self.id} reversed direction to stay within boundaries")
 
+        # Announce our position to peers
+        if self.gossip:
+            self.gossip.publish(self.latitude, self.longitude)
+
         # Update list of neighboring satellites
-        self.find_neighbors()
+        with find_neighbors_seconds.time():
+            self.find_neighbors()
 
     def find_neighbors(self):
-        """Find neighboring satellites within communication range."""
-        self.neighbors = []
-        for port in self.all_ports:
-            if port != self.id:
-                try:
-                    response = requests.get(
-                        f"http://{SATELLITE_IP}:{port}/get-position", 
-                        proxies={"http": None, "https": None},
-                        timeout=2
-                    )
-                    if response.status_code == 200:
-                        position = response.json()
-                        distance = haversine(
-                            self.latitude, self.longitude, 
-                            position["latitude"], position["longitude"]
-                        )
-                        if distance <= COMMUNICATION_RANGE_KM:
-                            self.neighbors.append(port)
-                except (requests.exceptions.RequestException, ValueError):
-                    pass
-
-def find_closest_neighbor_to_ground_control():
-    """Find the neighbor closest to ground control."""
-    closest_neighbor = None
-    closest_distance = float("inf")
-    
-    for neighbor in satellite.neighbors:
-        try:
-            response = requests.get(
-                f"http://{SATELLITE_IP}:{neighbor}/get-position", 
-                proxies={"http": None, "https": None},
-                timeout=2
-            )
-            if response.status_code != 200:
-                continue
-                
-            position = response.json()
-            neighbor_distance = haversine(
-                position["latitude"], position["longitude"],
-                GROUND_CONTROL_COORDS[0], GROUND_CONTROL_COORDS[1]
-            )
-            if neighbor_distance < closest_distance:
-                closest_distance = neighbor_distance
-                closest_neighbor = neighbor
-        except Exception:
-            continue
-            
-    return closest_neighbor
+        """Find neighboring satellites within communication range and refresh routes."""
+        if self.shared_view:
+            self.neighbors = [
+                node_id for node_id in self.router.neighbours(self.id) if node_id != GROUND_CONTROL
+            ]
+            return
+
+        if not self.gossip:
+            self.poll_neighbors()
+
+        # Positions are already local, so no round trips are needed
+        positions = self.positions.positions()
+        positions.pop(self.id, None)
+        self.neighbors = [
+            port for port, (lat, lon) in positions.items()
+            if haversine(self.latitude, self.longitude, lat, lon) <= self.range_km
+        ]
+
+        positions[self.id] = (self.latitude, self.longitude)
+        self.router.update(positions)
+
+    def poll_neighbors(self):
+        """Refresh the position table by probing every other satellite over HTTP at once."""
+        get_prober().probe(self.positions, SATELLITE_IP, [port for port in self.all_ports if port != self.id])
+
+    def next_hop(self):
+        """Return GROUND_CONTROL if it is in range, else the routed next hop (or None)."""
+        ground_control_distance = haversine(
+            self.latitude, self.longitude,
+            GROUND_CONTROL_COORDS[0], GROUND_CONTROL_COORDS[1]
+        )
+        if ground_control_distance <= self.range_km:
+            return GROUND_CONTROL
+        return self.router.next_hop(self.id)
+
+    def hold(self, data, priority=0):
+        """Queue a packet that can't be forwarded yet. Returns False if it wasn't kept."""
+        if self.store is None or not self.store.put(data, priority):
+            return False
+        held_packets.inc()
+        return True
+
+def local_satellite():
+    """Return the hosted satellite a request was addressed to, by the port it arrived on."""
+    port = request.environ.get("SERVER_PORT", "")
+    return satellites.get(int(port), satellite) if port.isdigit() else satellite
+
+def reply_body(response):
+    """Return a next hop's reply as JSON, or as text if it isn't JSON (e.g. a proxy's error page)."""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+def hop_url(hop):
+    """Return the URL messages for the given next hop are posted to."""
+    if hop == GROUND_CONTROL:
+        return f"http://{EARTH_DEVICE_IP}:{GROUND_CONTROL_PORT}/"
+    return f"http://{SATELLITE_IP}:{hop}/"
 
 @app.route("/", methods=["POST"])
 def receive_message():
-    """Handle incoming messages and route them toward ground control."""
+    """
+    Handle incoming messages and route them toward ground control.
+
+    The body is never parsed: it is forwarded as received, with its content
+    type and routing headers, and the final hop goes to the destination in
+    the X-Destination-IP/X-Destination-Port headers. Only a message held for
+    store-and-forward is read.
+    """
     try:
+        arrival = time.time()
+        satellite = local_satellite()
         # Get message data
-        data = request.get_json()
-        if not data:
+        body = request.get_data()
+        if not body:
             logger.warning("Received empty message")
             return jsonify({"status": "No data received"}), 400
         
         # Add realistic network delay
         random_delay = random.uniform(0.1, 1.0)
         time.sleep(random_delay)
+        queued = time.time() - arrival
         
-        # Set headers for forwarding
-        headers = {
-            "X-Group-ID": "10",
-            "X-Destination-IP": EARTH_DEVICE_IP,
-            "X-Destination-Port": str(GROUND_CONTROL_PORT)
-        }
+        # Pass the routing headers on as received
+        headers = relay_headers(request.headers)
+        trace = request.headers.get(TRACE_HEADER)
+        priority = request.headers.get(PRIORITY_HEADER, 0, type=int)
 
-        # Check if we can reach ground control directly
-        ground_control_distance = haversine(
-            satellite.latitude, satellite.longitude,
-            GROUND_CONTROL_COORDS[0], GROUND_CONTROL_COORDS[1]
-        )
-        
-        # If within range of ground control, send directly
-        if ground_control_distance <= COMMUNICATION_RANGE_KM:
+        def traced_headers(retries):
+            """Headers with this hop appended to the packet's trace."""
+            forward = time.time() - arrival - queued
+            return {**headers, TRACE_HEADER: append_hop(trace, satellite.id, arrival, queued, forward, retries)}
+
+        def hold_message():
+            """Queue the message for later; the store holds packets as JSON."""
+            try:
+                packet = unframe(request.content_type, body)
+            except WireError as e:
+                logger.warning(f"Not holding unreadable message: {e}")
+                return False
+            return satellite.hold(packet, priority)
+
+        # Send straight to ground control when it is in range, else to the routed next hop
+        next_hop = satellite.next_hop()
+        if next_hop == GROUND_CONTROL:
             try:
-                response = requests.post(
-                    f"http://{EARTH_DEVICE_IP}:{GROUND_CONTROL_PORT}/", 
-                    json=data, 
-                    proxies={"http": None, "https": None},
+                response = transport.post(
+                    destination_url(request.headers, RELAY_DESTINATIONS) or hop_url(GROUND_CONTROL),
+                    data=body, 
+                    headers=traced_headers(0),
                     timeout=5
                 )
+                # Busy means ground control couldn't take it yet, so keep it rather than drop it
+                if response.status_code == 503:
+                    forwarded_messages.labels("ground_control", "busy").inc()
+                    logger.warning("Ground control busy")
+                    if hold_message():
+                        return held_response(satellite)
+                    return jsonify({"status": "Ground control busy", "response": reply_body(response)}), 503
+                reply = reply_body(response)
+                forwarded_messages.labels("ground_control", "success" if response.ok else "failure").inc()
                 log_communication([satellite.latitude, satellite.longitude], GROUND_CONTROL_COORDS)
-                logger.info(f"Message sent to Ground Control")
-                return jsonify({"status": "Message forwarded to ground control", "response": response.json()})
+                logger.info(f"Message sent to Ground Control ({response.status_code})")
+                return jsonify({"status": "Message forwarded to ground control", "response": reply}), response.status_code
             except requests.exceptions.Timeout:
+                forwarded_messages.labels("ground_control", "timeout").inc()
                 logger.error("Timeout connecting to ground control")
+                if hold_message():
+                    return held_response(satellite)
                 return jsonify({"status": "Timeout connecting to ground control"}), 504
             except Exception as e:
+                forwarded_messages.labels("ground_control", "failure").inc()
                 logger.error(f"Error forwarding to ground control: {e}")
+                if hold_message():
+                    return held_response(satellite)
                 return jsonify({"status": "Error forwarding to ground control", "error": str(e)}), 500
 
-        # Find the best satellite to forward to
-        closest_neighbor = find_closest_neighbor_to_ground_control()
-        if not closest_neighbor:
+        if not next_hop:
+            forwarded_messages.labels("none", "no_route").inc()
             logger.warning("No neighbors available to forward message")
+            if hold_message():
+                return held_response(satellite)
             return jsonify({"status": "No route to ground control"}), 404
         
         # Try to forward the message with retries
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = requests.post(
-                    f"http://{SATELLITE_IP}:{closest_neighbor}/", 
-                    json=data, 
-                    proxies={"http": None, "https": None},
+                response = transport.post(
+                    hop_url(next_hop),
+                    data=body, 
+                    headers=traced_headers(attempt),
                     timeout=5
                 )
                 
-                if response.status_code == 200:
-                    logger.info(f"Message forwarded to satellite {closest_neighbor}")
+                # 202 means the next satellite queued it for later delivery
+                if response.status_code in (200, 202):
+                    forwarded_messages.labels("satellite", "success").inc()
+                    logger.info(f"Message forwarded to satellite {next_hop}")
                     
                     # Log the communication for visualization
-                    target_coords = requests.get(
-                        f"http://{SATELLITE_IP}:{closest_neighbor}/get-position", 
-                        proxies={"http": None, "https": None}
-                    ).json()
-                    target = [target_coords["latitude"], target_coords["longitude"]]
-                    log_communication([satellite.latitude, satellite.longitude], target)
+                    target = satellite.router.position(next_hop)
+                    if target:
+                        log_communication([satellite.latitude, satellite.longitude], target)
                     
-                    return jsonify({"status": "Message forwarded", "response": response.json()}), 200
+                    return jsonify({"status": "Message forwarded", "response": reply_body(response)}), 200
                 
             except Exception as e:
                 logger.warning(f"Attempt {attempt+1}/{max_retries} failed: {e}")
                 
-            # Wait before retry with exponential backoff
-            retry_delay = 0.5 * (2 ** attempt)
-            time.sleep(retry_delay)
+            # Wait before retry with exponential backoff; after the last attempt, hold it at once
+            if attempt + 1 < max_retries:
+                forward_retries.inc()
+                time.sleep(0.5 * (2 ** attempt))
 
+        forwarded_messages.labels("satellite", "failure").inc()
+        if hold_message():
+            return held_response(satellite)
         return jsonify({"status": "Message could not be forwarded after retries"}), 500
         
     except Exception as e:
         logger.error(f"Error in receive_message: {e}")
         return jsonify({"status": "Internal error", "error": str(e)}), 500
 
+@app.route("/batch", methods=["POST"])
+def receive_batch():
+    """
+    Accept packets drained in bulk from another satellite's queue.
+
+    Takes {"packets": [...], "priorities": [...]} (priorities optional).
+    Packets go straight into this satellite's queue, which is drained
+    towards ground control as soon as a route exists.
+    """
+    data = request.get_json(silent=True)
+    packets = data.get("packets") if isinstance(data, dict) else None
+    if not isinstance(packets, list) or not packets:
+        return jsonify({"status": "No data received"}), 400
+    priorities = data.get("priorities")
+    if not isinstance(priorities, list) or len(priorities) != len(packets):
+        priorities = [0] * len(packets)
+
+    satellite = local_satellite()
+    accepted = sum(1 for packet, priority in zip(packets, priorities) if satellite.hold(packet, priority))
+    if not accepted:
+        return jsonify({"status": "Queue full"}), 503
+    drain_wakeup.set()
+    return jsonify({"status": "Queued", "accepted": accepted, "rejected": len(packets) - accepted}), 202
+
 @app.route("/get-position", methods=["GET"])
 def get_position():
     """Return current satellite position."""
+    satellite = local_satellite()
     return jsonify({
         "latitude": satellite.latitude,
         "longitude": satellite.longitude
     })
 
+@app.route("/routes", methods=["GET"])
+def get_routes():
+    """Return this satellite's routing table, including route ages."""
+    satellite = local_satellite()
+    return jsonify({
+        "id": satellite.id,
+        "next_hop": satellite.router.next_hop(satellite.id),
+        "routes": satellite.router.snapshot()
+    })
+
+@app.route("/store-stats", methods=["GET"])
+def get_store_stats():
+    """Return the store-and-forward queue depth and drop counts."""
+    store = local_satellite().store
+    return jsonify(store.stats() if store is not None else {})
+
+@app.route("/probe-stats", methods=["GET"])
+def get_probe_stats():
+    """Return the peers neighbour probing is backing off from."""
+    return jsonify(get_prober().stats())
+
+@app.route("/transport-stats", methods=["GET"])
+def get_transport_stats():
+    """Return per-peer connection reuse statistics."""
+    return jsonify(transport.stats())
+
 def position_updater():
     """Periodic task to update satellite position."""
     while True:
@@ -231,40 +375,119 @@ def position_updater():
 
 def log_communication(source, target):
     """Log communication events for visualization."""
-    url = f"http://{EARTH_DEVICE_IP}:33069/log-communication"
-    data = {
-        "source": {"latitude": source[0], "longitude": source[1]},
-        "target": {"latitude": target[0], "longitude": target[1]},
-    }
-    try:
-        requests.post(url, json=data, proxies={"http": None, "https": None}, timeout=2)
-    except requests.RequestException:
-        logger.debug("Failed to log communication")
+    communication_reporter.report(source, target)
 
-if __name__ == "__main__":
-    # Configure Flask to be less verbose
-    werkzeug_logger = logging.getLogger('werkzeug')
-    werkzeug_logger.setLevel(logging.ERROR)
+def held_response(satellite):
+    """Tell the sender its packet was accepted for later delivery."""
+    return jsonify({"status": "Queued for later delivery", "queued": len(satellite.store)}), 202
+
+def forward_held_packets(satellite):
+    """Forward a satellite's queued packets in batches for as long as it has a route."""
+    store = satellite.store
+    while store is not None and len(store):
+        next_hop = satellite.next_hop()
+        if next_hop is None:
+            return
+        entries = store.drain(STORE_FORWARD_DRAIN_BATCH)
+        if not entries:
+            return
+        body = {
+            "packets": [packet for packet, _, _ in entries],
+            "priorities": [priority for _, priority, _ in entries],
+        }
+        try:
+            response = transport.post(hop_url(next_hop) + "batch", json=body, timeout=5)
+            delivered = response.status_code in (200, 202)
+        except requests.RequestException as e:
+            logger.warning(f"Failed to drain queue to {next_hop}: {e}")
+            delivered = False
+        if not delivered:
+            store.requeue(entries)
+            return
+
+        target = "ground_control" if next_hop == GROUND_CONTROL else "satellite"
+        forwarded_messages.labels(target, "drained").inc(len(entries))
+        logger.info(f"Forwarded {len(entries)} queued packets to {next_hop}")
+        position = GROUND_CONTROL_COORDS if next_hop == GROUND_CONTROL else satellite.router.position(next_hop)
+        if position:
+            log_communication([satellite.latitude, satellite.longitude], position)
+
+def store_drainer():
+    """Drain every hosted satellite's store each time step, or sooner when a batch arrives."""
+    while True:
+        drain_wakeup.wait(TIME_STEP)
+        drain_wakeup.clear()
+        for hosted in list(satellites.values()):
+            try:
+                forward_held_packets(hosted)
+            except Exception as e:
+                logger.error(f"Error draining store-and-forward queue of satellite {hosted.id}: {e}")
 
+def create_store(port):
+    """Return the store-and-forward queue for the satellite on port."""
+    store_path = f"src/data/spool/satellite_{port}.db" if STORE_FORWARD_PERSIST else None
+    return StoreAndForwardQueue(path=store_path)
+
+def start_satellite(port, ip="127.0.0.1"):
+    """Create this process's satellite and store-and-forward queue and start draining it."""
+    global satellite
+
+    # Join the position gossip group unless configured to poll peers
+    gossip = None
+    if NEIGHBOUR_DISCOVERY == "gossip":
+        gossip = PositionGossip(NeighbourTable(), node_id=port, interface_ip=ip).start()
+
+    # Hold undeliverable packets until a route appears
+    satellite = Satellite(
+        satellite_id=port,
+        all_ports=SATELLITE_PORTS,
+        gossip=gossip,
+        store=create_store(port),
+    )
+    satellites[port] = satellite
+    neighbour_table_size.set_function(lambda: len(satellite.positions))
+    store_depth.set_function(lambda: len(satellite.store))
+    Thread(target=store_drainer, daemon=True).start()
+    return satellite
+
+def create_app(port, ip="127.0.0.1", worker_index=0):
+    """
+    Start the satellite on port and return the app.
+
+    The satellite's position, neighbours and held packets live in this
+    process, so a satellite must be served by a single worker process.
+    """
+    if worker_index:
+        raise RuntimeError("A satellite must be served by a single worker process")
+    start_satellite(port, ip)
+    Thread(target=position_updater, daemon=True).start()
+    return app
+
+if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Run a satellite server.")
     parser.add_argument("--port", type=int, required=True, help="Port number for the satellite.")
     parser.add_argument("--ip", type=str, default="127.0.0.1",
                         help="IP address to bind the satellite (default: 127.0.0.1).")
+    parser.add_argument("--async-relay", action="store_true",
+                        help="Relay messages on asyncio/aiohttp instead of the Flask server.")
+    add_server_arguments(parser)
     args = parser.parse_args()
 
     port = args.port
     ip = args.ip
 
-    # Initialize satellite
-    satellite = Satellite(
-        satellite_id=port,
-        all_ports=SATELLITE_PORTS,
-    )
+    # The asyncio relay runs its own position updater task
+    if args.async_relay:
+        try:
+            from devices.async_relay import run_async_relay
+        except ImportError as e:
+            logger.error(f"aiohttp is required for --async-relay: {e}")
+            sys.exit(1)
+        start_satellite(port, ip)
+        run_async_relay(satellite, hop_url, log_communication, ip, port, hold=satellite.hold)
+        sys.exit(0)
 
-    # Start position updater thread
-    Thread(target=position_updater, daemon=True).start()
-    
-    # Start Flask server
     logger.info(f"Starting satellite {port} on {ip}:{port}")
-    app.run(debug=False, host=ip, port=port)
+    serve(lambda worker_index: create_app(port, ip, worker_index), ip, port,
+          server=args.server, threads=args.threads)
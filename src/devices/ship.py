@@ -1,16 +1,13 @@
 import argparse
-from cryptography.fernet import Fernet
+import itertools
 import json
 from flask import Flask, jsonify
-import requests
 import random
 import time
 import sys
 import os
-import hashlib
 import logging
-from math import radians, sin, cos, sqrt, atan2
-from threading import Thread
+from threading import Event, Thread
 
 # Setup logging
 logging.basicConfig(
@@ -23,9 +20,22 @@ logger = logging.getLogger('ship')
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 from config import (
-    SATELLITE_PORTS, TIME_STEP, GROUND_CONTROL_COORDS, COMMUNICATION_RANGE_KM, 
-    SHIP_SPEED, SATELLITE_IP, EARTH_DEVICE_IP, GROUND_CONTROL_PORT, GROUP8_IP
+    SATELLITE_PORTS, TIME_STEP, COMMUNICATION_RANGE_KM,
+    SHIP_SPEED, SATELLITE_IP, EARTH_DEVICE_IP, GROUND_CONTROL_PORT, GROUP8_IP,
+    NEIGHBOUR_DISCOVERY, SHIP_BUFFER_MAX_READINGS, SHIP_BUFFER_TTL, SHIP_UPLINK_BATCH,
+    SHIP_UPLINK_INTERVAL, SHIP_BUFFER_PERSIST, PAYLOAD_CODEC, WIRE_FORMAT
 )
+from gossip import NeighbourTable, PositionGossip, get_prober
+from geo import haversine
+from routing import RoutingTable
+from transport import get_transport
+from comms import CommunicationReporter
+from metrics import instrument_flask, counter, gauge, histogram
+from envelope import calculate_checksum, pack_batch
+from codec import load_keyring, tamper
+from wire import encode_packet, BINARY_CONTENT_TYPE
+from store_forward import StoreAndForwardQueue
+from serving import serve, add_server_arguments
 
 # Ship starting position
 CENTER_LAT, CENTER_LON = 49.6, -8.68
@@ -35,46 +45,92 @@ LAT_MIN, LAT_MAX = 49.5, 51.0
 LON_MIN, LON_MAX = -11.0, -7.5
 
 app = Flask(__name__)
+instrument_flask(app)
 
-def calculate_checksum(data):
-    """Calculate MD5 checksum of the given data."""
-    data_str = str(data).encode('utf-8')
-    return hashlib.md5(data_str).hexdigest()
+# Pooled keep-alive connections to peers
+transport = get_transport()
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points on Earth using haversine formula."""
-    R = 6371  # Earth radius in kilometers
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
+# Hop events are sent to the visualiser in batches
+communication_reporter = CommunicationReporter(
+    f"http://{EARTH_DEVICE_IP}:33069/log-communication", transport
+)
+
+# Telemetry and neighbour discovery metrics, served at /metrics
+sent_packets = counter("ship_packets_sent", "Telemetry packets sent, by result", ("result",))
+find_neighbors_seconds = histogram(
+    "find_neighbors_duration_seconds", "Time spent finding neighbours and refreshing routes"
+)
+neighbour_table_size = gauge("neighbour_table_size", "Peers in the neighbour table")
+uplinked_readings = counter("ship_readings_uplinked", "Buffered readings uplinked, by result", ("result",))
+outbox_depth = gauge("ship_outbox_readings", "Readings waiting in the outbound buffer")
+
+# This process's ship, created by create_app
+ship = None
 
 def log_communication(source, target):
     """Log communication events for visualization."""
-    url = f"http://{EARTH_DEVICE_IP}:33069/log-communication"
-    data = {
-        "source": {"latitude": source[0], "longitude": source[1]},
-        "target": {"latitude": target[0], "longitude": target[1]},
-    }
-    try:
-        requests.post(url, json=data, proxies={"http": None, "https": None}, timeout=2)
-    except requests.RequestException:
-        logger.debug("Failed to log communication")
+    communication_reporter.report(source, target)
 
 class Ship:
-    def __init__(self, port):
-        """Initialize a ship with the given port number."""
+    def __init__(self, port=None, gossip=None, ship_id=None, positions=None, router=None,
+                 cipher_suite=None, interoperable=False, send_interval=TIME_STEP * 5, send_jitter=0,
+                 range_km=COMMUNICATION_RANGE_KM, outbox=None, uplink_batch=SHIP_UPLINK_BATCH,
+                 uplink_interval=SHIP_UPLINK_INTERVAL, wire_format=WIRE_FORMAT):
+        """
+        Initialize a ship.
+
+        Args:
+            port: Port the ship's server listens on (None when hosted in a fleet)
+            gossip: PositionGossip listener, or None to poll satellites
+            ship_id: Ship ID sent with telemetry (defaults to the port's last two digits)
+            positions: Shared NeighbourTable refreshed by the caller (fleet mode)
+            router: Shared RoutingTable updated by the caller (fleet mode)
+            cipher_suite: Codec used to encrypt telemetry payloads
+            interoperable: Send to Group 8's satellite instead of ours, adding the
+                MD5 checksum their nodes expect
+            send_interval: Seconds between telemetry packets
+            send_jitter: Maximum random offset in seconds applied to each interval
+            range_km: Radio range used to find satellites in reach
+            outbox: StoreAndForwardQueue to buffer readings in, or None to send
+                each reading as its own packet
+            uplink_batch: Readings packed into one envelope
+            uplink_interval: Maximum seconds a reading waits for its batch to fill, or 0 to send at once
+            wire_format: "binary" or "json" framing for packets sent to our
+                satellites (Group 8 always gets JSON)
+        """
         self.latitude = CENTER_LAT
         self.longitude = CENTER_LON
         self.neighbors = []  # List of satellites within communication range
+        self.gossip = gossip
+        # A shared view is kept fresh by its owner rather than by every ship
+        self.shared_view = positions is not None
+        if positions is None:
+            positions = gossip.table if gossip else NeighbourTable()
+        self.positions = positions
+        self.range_km = range_km
+        self.router = router if router is not None else RoutingTable(range_km=range_km)
+        self.cipher_suite = cipher_suite
+        self.interoperable = interoperable
         self.speed = SHIP_SPEED
         self.direction = 1  # Direction multiplier (1 or -1)
         self.port = port
-        self.ship_id = str(port)[-2:]
+        self.ship_id = ship_id if ship_id is not None else str(port)[-2:]
+        self.send_interval = send_interval
+        self.send_jitter = send_jitter
         self.last_sent_time = 0
+        self.next_send_time = 0
         self.retry_count = 0
         self.max_retries = 3
+        self.outbox = outbox
+        self.uplink_batch = uplink_batch
+        self.uplink_interval = uplink_interval
+        self.last_uplink_time = time.time()
+        self.wire_format = wire_format
+        # Set when a reading is buffered, to wake the uplink thread
+        self.uplink_wakeup = Event()
+        # Message numbers start from the clock in milliseconds, so they keep
+        # increasing across restarts and (ship_id, seq) stays unique
+        self._sequence = itertools.count(int(time.time() * 1000))
         logger.info(f"Ship {self.ship_id} initialized at ({self.latitude}, {self.longitude})")
 
     def move(self):
@@ -93,61 +149,44 @@ class Ship:
             logger.debug(f"Ship {self.ship_id} reversed direction to stay within boundary")
 
         # Find satellites within communication range
-        self.find_neighbors()
+        with find_neighbors_seconds.time():
+            self.find_neighbors()
 
     def is_within_celtic_sea(self, lat, lon):
         """Check if the given coordinates are within the Celtic Sea boundary."""
         return LAT_MIN <= lat <= LAT_MAX and LON_MIN <= lon <= LON_MAX
 
     def find_neighbors(self):
-        """Find satellites within communication range."""
-        self.neighbors = []
-        for port in SATELLITE_PORTS:
-            try:
-                response = requests.get(
-                    f"http://{SATELLITE_IP}:{port}/get-position", 
-                    proxies={"http": None, "https": None},
-                    timeout=2
-                )
-                if response.status_code == 200:
-                    position = response.json()
-                    distance = haversine(
-                        self.latitude, self.longitude, 
-                        position["latitude"], position["longitude"]
-                    )
-                    if distance <= COMMUNICATION_RANGE_KM:
-                        self.neighbors.append((port, distance))
-            except requests.RequestException:
-                continue
+        """Find satellites within communication range and refresh routes."""
+        if not self.gossip and not self.shared_view:
+            self.poll_neighbors()
+
+        positions = self.positions.positions()
+        neighbors = []
+        for port, (lat, lon) in positions.items():
+            distance = haversine(self.latitude, self.longitude, lat, lon)
+            if distance <= self.range_km:
+                neighbors.append((port, distance))
+        self.neighbors = neighbors
+        if not self.shared_view:
+            self.router.update(positions)
+
+    def poll_neighbors(self):
+        """Refresh the position table by probing every satellite over HTTP at once."""
+        get_prober().probe(self.positions, SATELLITE_IP, SATELLITE_PORTS)
 
     def find_closest_to_ground_control(self):
-        """Find the satellite closest to ground control from neighbors."""
-        ground_lat, ground_lon = GROUND_CONTROL_COORDS
-        closest_port = None
-        closest_distance = float("inf")
-
-        for port, _ in self.neighbors:
-            try:
-                response = requests.get(
-                    f"http://{SATELLITE_IP}:{port}/get-position", 
-                    proxies={"http": None, "https": None},
-                    timeout=2
-                )
-                if response.status_code != 200:
-                    continue
-                    
-                position = response.json()
-                distance_to_ground = haversine(
-                    position["latitude"], position["longitude"], 
-                    ground_lat, ground_lon
-                )
-                if distance_to_ground < closest_distance:
-                    closest_distance = distance_to_ground
-                    closest_port = port
-            except requests.RequestException:
-                continue
-                
-        return closest_port
+        """Find the neighbouring satellite with the shortest route to ground control."""
+        return self.router.best_uplink(self.neighbors)
+
+    def read_sensors(self):
+        """Return one set of telemetry readings."""
+        return {
+            "caught_fish": random.randint(0, 100),
+            "wind_levels": round(random.uniform(5.0, 20.0), 1),
+            "water_temperature": round(random.uniform(10.0, 15.0), 1),
+            "water_depth": round(random.uniform(50.0, 200.0), 1),
+        }
 
     def create_data_packet(self):
         """Create a data packet with ship telemetry."""
@@ -158,103 +197,214 @@ class Ship:
             "ship_id": self.ship_id,
             "destination": "ground_control",
             "timestamp": current_time,
-            "payload": {
-                "caught_fish": random.randint(0, 100),
-                "wind_levels": round(random.uniform(5.0, 20.0), 1),
-                "water_temperature": round(random.uniform(10.0, 15.0), 1),
-                "water_depth": round(random.uniform(50.0, 200.0), 1),
-            }
+            "payload": self.read_sensors()
         }
 
-        # Serialize and encrypt the payload
+        # Number the packet so ground control can drop duplicate deliveries
+        if not self.interoperable:
+            data["seq"] = next(self._sequence)
+
+        # Serialize and encrypt the payload; the codec authenticates it
         payload_str = json.dumps(data["payload"])
-        encrypted_payload = cipher_suite.encrypt(payload_str.encode())
-        data["payload"] = encrypted_payload.decode()
+        encrypted_payload = self.cipher_suite.encrypt(payload_str.encode())
+        data["codec"] = self.cipher_suite.name
 
-        # Calculate checksum
-        data["checksum"] = calculate_checksum(payload_str)
+        # Group 8's nodes still expect a checksum of the plaintext
+        if self.interoperable:
+            data["checksum"] = calculate_checksum(payload_str)
 
-        # Introduce random corruption for testing checksum validation
+        # Introduce random corruption for testing integrity validation
         if random.random() < 0.2:  # 20% probability
-            decrypted_payload = json.loads(cipher_suite.decrypt(data["payload"].encode()).decode())
-            decrypted_payload["caught_fish"] = "CORRUPTED"
+            encrypted_payload = tamper(encrypted_payload)
             logger.warning("Payload corrupted for demonstration - ground control will discard this message")
-            data["payload"] = cipher_suite.encrypt(json.dumps(decrypted_payload).encode()).decode()
+        data["payload"] = encrypted_payload.decode()
             
         return data
 
+    def create_reading(self, timestamp=None):
+        """
+        Create an unencrypted reading to buffer for a batch envelope.
+
+        The reading carries its own checksum so ground control can drop it
+        alone if it is corrupted, and its own message number so a resent
+        envelope isn't written twice.
+        """
+        payload = self.read_sensors()
+        reading = {
+            "seq": next(self._sequence),
+            "timestamp": time.time() if timestamp is None else timestamp,
+            "payload": payload,
+            "checksum": calculate_checksum(json.dumps(payload)),
+        }
+
+        # Introduce random corruption for testing checksum validation
+        if random.random() < 0.2:  # 20% probability
+            payload["caught_fish"] = "CORRUPTED"
+            logger.warning("Reading corrupted for demonstration - ground control will discard it")
+
+        return reading
+
+    def schedule_next_send(self, current_time):
+        """Record a send at current_time and pick when the next one is due."""
+        self.last_sent_time = current_time
+        jitter = random.uniform(-self.send_jitter, self.send_jitter) if self.send_jitter else 0
+        self.next_send_time = current_time + max(self.send_interval + jitter, 0)
+
     def send_data(self):
-        """Generate and send data to the closest satellite."""
+        """
+        Generate and send data to the closest satellite.
+
+        With an outbox, the reading is buffered instead and batches are
+        uplinked by flush_outbox on the uplink thread, so a slow satellite
+        never holds up the ship's movement.
+
+        Returns:
+            bool: True if the packet was acknowledged, False if it wasn't,
+            or None if no packet was due or, with an outbox, it was buffered
+        """
         current_time = time.time()
         
         # Only send data periodically
-        if current_time - self.last_sent_time <= TIME_STEP * 5:
-            return
+        if current_time < self.next_send_time:
+            return None
+        self.schedule_next_send(current_time)
+
+        if self.outbox is not None and not self.interoperable:
+            if not self.outbox.put(self.create_reading(current_time)):
+                logger.warning("Outbound buffer full, dropping reading")
+            self.uplink_wakeup.set()
+            return None
 
         # Create headers for forwarding
-        headers = {
-            "X-Group-ID": "10",
-            "X-Destination-IP": str(EARTH_DEVICE_IP),
-            "X-Destination-Port": str(GROUND_CONTROL_PORT)
-        }
+        headers = self.forwarding_headers()
             
         # Create data packet
         data = self.create_data_packet()
         
         # Handle interoperable mode
-        if interoperable:
+        if self.interoperable:
             try:
-                response = requests.post(
+                response = transport.post(
                     f"http://{GROUP8_IP}:{33001}/", 
                     json=data, 
-                    proxies={"http": None, "https": None}, 
                     headers=headers,
                     timeout=5
                 )
                 logger.info(f"Data sent to Group 8's satellite")
+                delivered = response.status_code == 200
+                sent_packets.labels("delivered" if delivered else "rejected").inc()
+                return delivered
             except Exception as e:
                 logger.error(f"Error sending data to Group 8's satellite: {e}")
-            self.last_sent_time = current_time
-            return
+            sent_packets.labels("failed").inc()
+            return False
 
         # Find and send to closest satellite
         closest_satellite = self.find_closest_to_ground_control()
         if not closest_satellite:
             logger.warning("No satellite within range to send data")
-            self.last_sent_time = current_time  # Still update time to avoid constant retries
-            return
+            sent_packets.labels("no_uplink").inc()
+            return False
             
         try:
             # Send data to closest satellite
-            response = requests.post(
-                f"http://{SATELLITE_IP}:{closest_satellite}/", 
-                json=data, 
-                proxies={"http": None, "https": None}, 
-                headers=headers,
-                timeout=5
-            )
+            response = self.post_packet(closest_satellite, data, headers)
             
-            if response.status_code == 200:
+            # 202 means the satellite queued it until it has a route
+            if response.status_code in (200, 202):
                 logger.info(f"Message sent to satellite {closest_satellite}")
                 
                 # Log communication for visualization
-                target_coords = requests.get(
-                    f"http://{SATELLITE_IP}:{closest_satellite}/get-position", 
-                    proxies={"http": None, "https": None}
-                ).json()
-                target = [target_coords["latitude"], target_coords["longitude"]]
-                log_communication([self.latitude, self.longitude], target)
+                target = self.router.position(closest_satellite)
+                if target:
+                    log_communication([self.latitude, self.longitude], target)
                 
                 # Process acknowledgment if needed
                 # ack = response.json()
+                sent_packets.labels("delivered").inc()
+                return True
             else:
                 logger.warning(f"Received non-200 response: {response.status_code}")
+                sent_packets.labels("rejected").inc()
+                return False
                 
         except Exception as e:
             logger.error(f"Error sending data to Satellite {closest_satellite}: {e}")
-            
-        # Update last sent time regardless of success to avoid spam
-        self.last_sent_time = current_time
+        sent_packets.labels("failed").inc()
+        return False
+
+    def forwarding_headers(self):
+        """Headers that tell satellites where to forward a packet."""
+        return {
+            "X-Group-ID": "10",
+            "X-Destination-IP": str(EARTH_DEVICE_IP),
+            "X-Destination-Port": str(GROUND_CONTROL_PORT)
+        }
+
+    def post_packet(self, satellite_port, data, headers):
+        """Post a packet to one of our satellites in the configured wire format."""
+        url = f"http://{SATELLITE_IP}:{satellite_port}/"
+        if self.wire_format == "binary":
+            headers = {**headers, "Content-Type": BINARY_CONTENT_TYPE}
+            return transport.post(url, data=encode_packet(data), headers=headers, timeout=5)
+        return transport.post(url, json=data, headers=headers, timeout=5)
+
+    def flush_outbox(self, current_time=None):
+        """
+        Uplink buffered readings in envelopes while a satellite is in range.
+
+        Nothing is sent until a full batch is waiting or uplink_interval
+        seconds have passed since the last uplink; with an interval of 0,
+        whatever is waiting is sent at once. Once started, the outbox is
+        drained batch by batch; a batch that isn't acknowledged goes back in
+        the outbox for the next attempt.
+
+        Returns:
+            bool: True if every batch sent was acknowledged, False if one
+            wasn't, or None if nothing was sent
+        """
+        if current_time is None:
+            current_time = time.time()
+        queued = len(self.outbox)
+        if not queued:
+            return None
+        if queued < self.uplink_batch and current_time - self.last_uplink_time < self.uplink_interval:
+            return None
+
+        closest_satellite = self.find_closest_to_ground_control()
+        if not closest_satellite:
+            logger.debug(f"No satellite within range, holding {queued} readings")
+            return None
+
+        delivered = None
+        while len(self.outbox):
+            entries = self.outbox.drain(self.uplink_batch)
+            if not entries:
+                break
+            readings = [reading for reading, _, _ in entries]
+            data = pack_batch(readings, self.cipher_suite, self.ship_id, time.time())
+            try:
+                response = self.post_packet(closest_satellite, data, self.forwarding_headers())
+                delivered = response.status_code in (200, 202)
+                if not delivered:
+                    logger.warning(f"Received non-200 response: {response.status_code}")
+            except Exception as e:
+                logger.error(f"Error sending batch to Satellite {closest_satellite}: {e}")
+                delivered = False
+            if not delivered:
+                self.outbox.requeue(entries)
+                uplinked_readings.labels("failed").inc(len(entries))
+                sent_packets.labels("failed").inc()
+                break
+
+            logger.info(f"Batch of {len(entries)} readings sent to satellite {closest_satellite}")
+            uplinked_readings.labels("delivered").inc(len(entries))
+            sent_packets.labels("delivered").inc()
+            self.last_uplink_time = current_time
+            target = self.router.position(closest_satellite)
+            if target:
+                log_communication([self.latitude, self.longitude], target)
+        return delivered
 
 @app.route("/get-position", methods=["GET"])
 def get_position():
@@ -264,6 +414,21 @@ def get_position():
         "longitude": ship.longitude
     })
 
+@app.route("/outbox-stats", methods=["GET"])
+def get_outbox_stats():
+    """Return the outbound buffer depth and drop counts."""
+    return jsonify(ship.outbox.stats() if ship.outbox is not None else {})
+
+@app.route("/probe-stats", methods=["GET"])
+def get_probe_stats():
+    """Return the peers neighbour probing is backing off from."""
+    return jsonify(get_prober().stats())
+
+@app.route("/transport-stats", methods=["GET"])
+def get_transport_stats():
+    """Return per-peer connection reuse statistics."""
+    return jsonify(transport.stats())
+
 def ship_behavior():
     """Continuously update the ship's position and send data to the nearest satellite."""
     try:
@@ -277,11 +442,60 @@ def ship_behavior():
         time.sleep(5)
         Thread(target=ship_behavior, daemon=True).start()
 
-if __name__ == "__main__":
-    # Configure Flask to be less verbose
-    werkzeug_logger = logging.getLogger('werkzeug')
-    werkzeug_logger.setLevel(logging.ERROR)
+def uplink_behavior():
+    """Uplink the ship's buffered readings whenever a reading is buffered, apart from the movement loop."""
+    while True:
+        ship.uplink_wakeup.wait(TIME_STEP)
+        ship.uplink_wakeup.clear()
+        try:
+            ship.flush_outbox()
+        except Exception as e:
+            logger.error(f"Error in ship uplink thread: {e}")
+
+def create_app(port, ip="127.0.0.1", interoperable=False, codec=PAYLOAD_CODEC, wire_format=WIRE_FORMAT,
+               buffer=True, uplink_batch=SHIP_UPLINK_BATCH, key_path="src/devices/symmetric.key",
+               worker_index=0):
+    """
+    Start the ship on port and return the app.
+
+    The ship's position and outbound buffer live in this process, so a ship
+    must be served by a single worker process.
+    """
+    global ship
 
+    if worker_index:
+        raise RuntimeError("A ship must be served by a single worker process")
+
+    # Load the symmetric key; Group 8 only understands Fernet
+    try:
+        keyring = load_keyring(key_path)
+        cipher_suite = keyring.codec("fernet" if interoperable else codec)
+        logger.info(f"Symmetric key loaded successfully ({cipher_suite.name} codec)")
+    except Exception as e:
+        logger.error(f"Error loading symmetric key: {e}")
+        raise
+
+    # Initialize ship, listening to satellite position gossip unless configured to poll
+    gossip = None
+    if NEIGHBOUR_DISCOVERY == "gossip":
+        gossip = PositionGossip(NeighbourTable(), interface_ip=ip).start()
+    outbox = None
+    if buffer and not interoperable:
+        outbox_path = f"src/data/outbox/ship_{port}.db" if SHIP_BUFFER_PERSIST else None
+        outbox = StoreAndForwardQueue(max_size=SHIP_BUFFER_MAX_READINGS, ttl=SHIP_BUFFER_TTL, path=outbox_path)
+        outbox_depth.set_function(lambda: len(outbox))
+    ship = Ship(port=port, gossip=gossip, cipher_suite=cipher_suite, interoperable=interoperable,
+                outbox=outbox, uplink_batch=uplink_batch, wire_format=wire_format)
+    neighbour_table_size.set_function(lambda: len(ship.positions))
+
+    # Start ship behavior thread
+    logger.info(f"Starting ship {ship.ship_id} on port {port}")
+    Thread(target=ship_behavior, daemon=True).start()
+    if outbox is not None:
+        Thread(target=uplink_behavior, daemon=True).start()
+    return app
+
+if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Run the ship server.")
     parser.add_argument("--port", type=int, required=True, help="Port for the ship server.")
@@ -289,29 +503,22 @@ if __name__ == "__main__":
                         help="IP address to bind the ship server (default: 127.0.0.1).")
     parser.add_argument("--interoperable", action="store_true",
                         help="Enable interoperability with Group 8's system.")
+    parser.add_argument("--codec", type=str, default=PAYLOAD_CODEC,
+                        help=f"Payload codec: aesgcm, chacha20 or fernet (default: {PAYLOAD_CODEC}).")
+    parser.add_argument("--wire-format", choices=("binary", "json"), default=WIRE_FORMAT,
+                        help=f"Framing of packets sent to satellites (default: {WIRE_FORMAT}).")
+    parser.add_argument("--no-buffer", action="store_true",
+                        help="Send each reading as its own packet instead of buffering batches.")
+    parser.add_argument("--uplink-batch", type=int, default=SHIP_UPLINK_BATCH,
+                        help=f"Readings per uplinked envelope (default: {SHIP_UPLINK_BATCH}).")
+    add_server_arguments(parser)
     args = parser.parse_args()
 
-    # Set interoperability mode
-    interoperable = args.interoperable
-
-    # Initialize ship
-    port = args.port
-    ship = Ship(port=port)
+    def factory(worker_index):
+        return create_app(args.port, args.ip, args.interoperable, args.codec, args.wire_format,
+                          not args.no_buffer, args.uplink_batch, worker_index=worker_index)
 
-    # Load the symmetric key
     try:
-        with open("src/devices/symmetric.key", "rb") as key_file:
-            key = key_file.read()
-        cipher_suite = Fernet(key)
-        logger.info("Symmetric key loaded successfully")
-    except Exception as e:
-        logger.error(f"Error loading symmetric key: {e}")
+        serve(factory, args.ip, args.port, server=args.server, threads=args.threads)
+    except (ValueError, RuntimeError, OSError):
         sys.exit(1)
-
-    # Start ship behavior thread
-    logger.info(f"Starting ship {ship.ship_id} on port {port}")
-    Thread(target=ship_behavior, daemon=True).start()
-    
-    # Start Flask server
-    app.run(host=args.ip, port=port, debug=False)
-
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import zlib
+
+from codec import CodecError
+
+# Packet "type" marking a batch envelope
+BATCH_TYPE = "batch"
+
+# How an envelope's readings are serialised before encryption
+BATCH_ENCODING = "zlib+json"
+
+
+class EnvelopeError(Exception):
+    """A batch envelope that could not be opened."""
+
+
+def calculate_checksum(data):
+    """Calculate MD5 checksum of the given data."""
+    data_str = str(data).encode('utf-8')
+    return hashlib.md5(data_str).hexdigest()
+
+
+def pack_batch(readings, codec, ship_id, timestamp):
+    """
+    Wrap many readings in one compressed, encrypted packet.
+
+    Each reading keeps its own timestamp and checksum, so ground control
+    can compute per-reading delays and drop corrupted readings without
+    losing the rest of the batch. The codec authenticates the envelope
+    as a whole, so it carries no checksum of its own.
+
+    Args:
+        readings: List of {"timestamp", "payload", "checksum"} dicts
+        codec: Codec used to encrypt the envelope
+        ship_id: Sending ship
+        timestamp: Time the envelope is sent
+
+    Returns:
+        dict: Packet that relays forward like any other
+    """
+    body = json.dumps(readings, separators=(',', ':'))
+    return {
+        "source": "ship",
+        "ship_id": ship_id,
+        "destination": "ground_control",
+        "type": BATCH_TYPE,
+        "encoding": BATCH_ENCODING,
+        "codec": codec.name,
+        "count": len(readings),
+        "timestamp": timestamp,
+        "payload": codec.encrypt(zlib.compress(body.encode())).decode(),
+    }
+
+
+def unpack_batch(envelope, codec):
+    """
+    Decrypt and decompress a batch envelope.
+
+    Envelopes from senders that still add a checksum have it verified too.
+
+    Returns:
+        list: The readings, not yet checked individually
+
+    Raises:
+        EnvelopeError: If the envelope is malformed or fails authentication
+    """
+    if envelope.get("encoding") != BATCH_ENCODING:
+        raise EnvelopeError("Unsupported encoding")
+    try:
+        sealed = codec.decrypt(envelope["payload"].encode())
+    except CodecError as e:
+        raise EnvelopeError("Checksum Error") from e
+    except Exception as e:
+        raise EnvelopeError("Decryption Error") from e
+    try:
+        body = zlib.decompress(sealed).decode()
+    except (zlib.error, UnicodeDecodeError) as e:
+        raise EnvelopeError("Invalid payload format") from e
+    if "checksum" in envelope and calculate_checksum(body) != envelope["checksum"]:
+        raise EnvelopeError("Checksum Error")
+    try:
+        readings = json.loads(body)
+    except ValueError:
+        raise EnvelopeError("Invalid payload format")
+    if not isinstance(readings, list):
+        raise EnvelopeError("Invalid payload format")
+    return readings
+
+
+def is_batch(packet):
+    """Return True if packet is a batch envelope."""
+    return isinstance(packet, dict) and packet.get("type") == BATCH_TYPE
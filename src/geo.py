@@ -0,0 +1,169 @@
+from collections import defaultdict
+from math import radians, sin, cos, sqrt, atan2
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS_KM = 6371
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 2 * 3.141592653589793 * EARTH_RADIUS_KM / 360
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points on Earth using haversine formula."""
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def pairwise_haversine(lats1, lons1, lats2=None, lons2=None):
+    """
+    Calculate the distance between every pair of points with NumPy.
+
+    Args:
+        lats1, lons1: Coordinates of the first set of points
+        lats2, lons2: Coordinates of the second set (defaults to the first)
+
+    Returns:
+        ndarray: len(lats1) x len(lats2) matrix of distances in kilometres
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for pairwise_haversine")
+    lat1 = np.radians(np.asarray(lats1, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=float))[:, None]
+    if lats2 is None:
+        lat2, lon2 = lat1.T, lon1.T
+    else:
+        lat2 = np.radians(np.asarray(lats2, dtype=float))[None, :]
+        lon2 = np.radians(np.asarray(lons2, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(np.clip(1 - a, 0, None)))
+
+
+def adjacency_matrix(lats, lons, range_km):
+    """
+    Return a boolean matrix of which points are within range of each other.
+
+    A point is not considered adjacent to itself.
+    """
+    adjacency = pairwise_haversine(lats, lons) <= range_km
+    np.fill_diagonal(adjacency, False)
+    return adjacency
+
+
+class GridIndex:
+    """
+    Bucket points into cells at least range_km wide.
+
+    Two points within range_km of each other are always in the same or
+    adjacent cells, so only those cell pairs need distance checks. Columns
+    wrap around at the antimeridian, so points either side of it are
+    neighbours too.
+
+    Raises:
+        ValueError: If range_km isn't positive
+    """
+
+    def __init__(self, lats, lons, range_km):
+        if not range_km > 0:
+            raise ValueError(f"range_km must be positive, not {range_km}")
+        self.lats = lats
+        self.lons = lons
+        self.range_km = range_km
+        # Longitude degrees shrink towards the poles; size cells for the
+        # most poleward point so they are never narrower than range_km
+        max_lat = max((abs(lat) for lat in lats), default=0)
+        self.lat_step = range_km / KM_PER_DEGREE
+        lon_step = range_km / (KM_PER_DEGREE * max(cos(radians(min(max_lat, 89.0))), 1e-6))
+        # Whole columns around the globe, so the last one borders the first
+        self.columns = max(int(360 // lon_step), 1)
+        self.lon_step = 360 / self.columns
+        self.cells = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            self.cells[self.cell(lat, lon)].append(i)
+
+    def cell(self, lat, lon):
+        """Return the (row, column) cell containing a point."""
+        return int(lat // self.lat_step), int((lon + 180) // self.lon_step) % self.columns
+
+    def neighbours(self, cell):
+        """Return the cells bordering a cell, wrapping columns around the globe."""
+        row, col = cell
+        return {(row + d_row, (col + d_col) % self.columns) for d_row in (-1, 0, 1) for d_col in (-1, 0, 1)}
+
+    def candidate_blocks(self):
+        """
+        Yield (indices_a, indices_b, same_cell) for every cell pair to check.
+
+        Each unordered pair of neighbouring cells is yielded once.
+        """
+        for cell, members in self.cells.items():
+            yield members, members, True
+            for other_cell in self.neighbours(cell):
+                # Each pair from the cell that sorts first, skipping the cell itself
+                if other_cell <= cell:
+                    continue
+                other = self.cells.get(other_cell)
+                if other:
+                    yield members, other, False
+
+    def query(self, lat, lon):
+        """Return indices of points within range_km of (lat, lon)."""
+        found = []
+        for cell in self.neighbours(self.cell(lat, lon)):
+            for i in self.cells.get(cell, ()):
+                if haversine(lat, lon, self.lats[i], self.lons[i]) <= self.range_km:
+                    found.append(i)
+        return found
+
+
+def neighbour_pairs(lats, lons, range_km):
+    """
+    Find every pair of points within range_km of each other.
+
+    Candidate pairs come from a GridIndex, and each block of candidates is
+    checked with vectorized haversine when NumPy is available.
+
+    Args:
+        lats, lons: Sequences of point coordinates
+        range_km: Maximum distance for a pair
+
+    Returns:
+        list: (i, j, distance_km) tuples with i < j; none if range_km isn't positive
+    """
+    if not range_km > 0:
+        return []
+    lats, lons = list(lats), list(lons)
+    index = GridIndex(lats, lons, range_km)
+    pairs = []
+    for members_a, members_b, same_cell in index.candidate_blocks():
+        if np is not None and len(members_a) * len(members_b) > 16:
+            a = np.asarray(members_a)
+            b = np.asarray(members_b)
+            distances = pairwise_haversine(
+                [lats[i] for i in members_a], [lons[i] for i in members_a],
+                [lats[j] for j in members_b], [lons[j] for j in members_b],
+            )
+            mask = distances <= range_km
+            if same_cell:
+                mask &= a[:, None] < b[None, :]
+            rows, cols = np.nonzero(mask)
+            i, j = a[rows], b[cols]
+            pairs.extend(zip(
+                np.minimum(i, j).tolist(), np.maximum(i, j).tolist(), distances[rows, cols].tolist()
+            ))
+            continue
+
+        for i in members_a:
+            for j in members_b:
+                if same_cell and j <= i:
+                    continue
+                distance = haversine(lats[i], lons[i], lats[j], lons[j])
+                if distance <= range_km:
+                    pairs.append((min(i, j), max(i, j), distance))
+    return pairs
@@ -0,0 +1,240 @@
+import json
+import logging
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock, Thread
+
+import requests
+
+from config import GOSSIP_GROUP, GOSSIP_PORT, POSITION_TTL, TIME_STEP, PROBE_DEADLINE, PROBE_WORKERS
+from transport import get_transport, PeerBackoff
+
+logger = logging.getLogger('gossip')
+
+# Re-announce an unchanged position often enough that it never goes stale
+HEARTBEAT_INTERVAL = max(POSITION_TTL / 3, TIME_STEP)
+
+
+class NeighbourTable:
+    """Thread-safe table of the last known position of every peer."""
+
+    def __init__(self, ttl=POSITION_TTL):
+        self.ttl = ttl
+        # node_id -> (latitude, longitude, sender timestamp, local receive time)
+        self._entries = {}
+        self._lock = Lock()
+
+    def update(self, node_id, latitude, longitude, timestamp=None):
+        """Record a position, ignoring updates older than the one we hold."""
+        received_at = time.time()
+        timestamp = received_at if timestamp is None else timestamp
+        with self._lock:
+            current = self._entries.get(node_id)
+            if current and current[2] > timestamp:
+                return False
+            self._entries[node_id] = (latitude, longitude, timestamp, received_at)
+            return True
+
+    def remove(self, node_id):
+        """Forget a peer."""
+        with self._lock:
+            self._entries.pop(node_id, None)
+
+    def get(self, node_id):
+        """Return (latitude, longitude) of a peer, or None if unknown or stale."""
+        with self._lock:
+            entry = self._entries.get(node_id)
+        # Staleness uses our own clock so skew between hosts doesn't matter
+        if entry and time.time() - entry[3] <= self.ttl:
+            return entry[0], entry[1]
+        return None
+
+    def positions(self):
+        """Return {node_id: (latitude, longitude)} for every fresh entry."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            return {
+                node_id: (lat, lon)
+                for node_id, (lat, lon, _, received_at) in self._entries.items()
+                if received_at >= cutoff
+            }
+
+    def __len__(self):
+        return len(self.positions())
+
+
+class PositionGossip:
+    """
+    Publish and receive positions over UDP multicast.
+
+    Every node joins the same multicast group. Publishers send one datagram
+    per position change; subscribers fold received datagrams into a
+    NeighbourTable, so neighbour discovery never needs a request/response
+    round trip.
+    """
+
+    def __init__(self, table, node_id=None, interface_ip="127.0.0.1",
+                 group=GOSSIP_GROUP, port=GOSSIP_PORT):
+        self.table = table
+        self.node_id = node_id
+        self.interface_ip = "0.0.0.0" if interface_ip in ("", "0.0.0.0") else interface_ip
+        self.group = group
+        self.port = port
+        self._last_published = {}  # {node_id: (position, publish time)}
+        self._running = False
+
+        self._sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self._sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        if self.interface_ip != "0.0.0.0":
+            self._sender.setsockopt(
+                socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface_ip)
+            )
+
+        self._receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            self._receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._receiver.bind(("", self.port))
+        membership = struct.pack(
+            "4s4s", socket.inet_aton(self.group), socket.inet_aton(self.interface_ip)
+        )
+        self._receiver.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        self._receiver.settimeout(1.0)
+
+    def publish(self, latitude, longitude, node_id=None):
+        """
+        Announce a position if it changed or the heartbeat is due.
+
+        node_id defaults to this node's ID; a process hosting several nodes
+        publishes each of them under its own ID.
+        """
+        node_id = self.node_id if node_id is None else node_id
+        if node_id is None:
+            return
+        now = time.time()
+        position = (latitude, longitude)
+        last_position, last_time = self._last_published.get(node_id, (None, 0))
+        if position == last_position and now - last_time < HEARTBEAT_INTERVAL:
+            return
+        message = json.dumps({
+            "id": node_id, "lat": latitude, "lon": longitude, "ts": now
+        }, separators=(",", ":")).encode()
+        try:
+            self._sender.sendto(message, (self.group, self.port))
+            self._last_published[node_id] = (position, now)
+        except OSError as e:
+            logger.debug(f"Failed to publish position: {e}")
+
+    def start(self):
+        """Start the background listener thread."""
+        self._running = True
+        Thread(target=self._listen, daemon=True).start()
+        return self
+
+    def close(self):
+        """Stop listening and release the sockets."""
+        self._running = False
+        self._sender.close()
+
+    def _listen(self):
+        while self._running:
+            try:
+                message, _ = self._receiver.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                update = json.loads(message)
+                if update["id"] == self.node_id:
+                    continue
+                self.table.update(update["id"], update["lat"], update["lon"], update["ts"])
+            except (ValueError, KeyError, TypeError):
+                logger.debug("Ignoring malformed gossip datagram")
+        self._receiver.close()
+
+
+class PositionProber:
+    """
+    Poll peers' /get-position concurrently under one deadline.
+
+    This is the "poll" alternative to gossip. Every peer is probed at once
+    and a scan waits at most deadline seconds, so it takes as long as the
+    slowest live peer rather than the sum of every dead peer's timeout.
+    Answers that arrive after the deadline still update the table.
+
+    Peers that fail are skipped by a circuit breaker (PeerBackoff) whose
+    backoff doubles with each consecutive failure. Once it expires the peer
+    is probed again in the background, without holding up the scan, and a
+    success closes the breaker.
+    """
+
+    def __init__(self, transport=None, deadline=PROBE_DEADLINE, workers=PROBE_WORKERS, backoff=None):
+        self.transport = transport or get_transport()
+        self.deadline = deadline
+        self.backoff = backoff or PeerBackoff()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe")
+        # Peers with a probe still running, so a slow peer isn't probed twice
+        self._pending = set()
+        self._lock = Lock()
+
+    def probe(self, table, ip, ports):
+        """
+        Refresh table with the positions of the peers at ip:port.
+
+        Returns:
+            list: Ports that answered before the scan ended
+        """
+        futures = {}
+        for port in ports:
+            peer = f"{ip}:{port}"
+            if not self.backoff.available(peer):
+                continue
+            with self._lock:
+                if peer in self._pending:
+                    continue
+                self._pending.add(peer)
+            future = self._pool.submit(self._probe_one, table, ip, port, peer)
+            # Re-probes of failing peers update the table whenever they answer
+            if not self.backoff.failures(peer):
+                futures[future] = port
+        if futures:
+            wait(futures, timeout=self.deadline)
+        return [port for future, port in futures.items() if future.done() and future.result()]
+
+    def _probe_one(self, table, ip, port, peer):
+        try:
+            response = self.transport.get(f"http://{ip}:{port}/get-position", timeout=self.deadline)
+            if response.status_code == 200:
+                position = response.json()
+                table.update(port, position["latitude"], position["longitude"])
+                self.backoff.success(peer)
+                return True
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(peer)
+        self.backoff.failure(peer)
+        return False
+
+    def stats(self):
+        """Return {peer: {"failures", "retry_in"}} for every peer the breaker is skipping."""
+        return self.backoff.snapshot()
+
+
+_prober = None
+_prober_lock = Lock()
+
+
+def get_prober():
+    """Return the process-wide PositionProber."""
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = PositionProber()
+    return _prober
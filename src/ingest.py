@@ -0,0 +1,425 @@
+import atexit
+import csv
+import hashlib
+import logging
+import math
+import multiprocessing
+import queue
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from threading import Condition, Thread
+
+from config import (
+    INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_MAX_BUFFER, INGEST_SHARD_QUEUE,
+    INGEST_SHARD_BATCH
+)
+from metrics import counter, gauge, histogram
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger('ingest')
+
+# Writer metrics, labelled by writer name (and sink class for write latency)
+buffered_records = gauge("ingest_buffered_records", "Records waiting to be written", ("writer",))
+written_records = counter("ingest_records_written", "Records written to every sink", ("writer",))
+write_seconds = histogram(
+    "ingest_write_duration_seconds", "Time spent writing one batch to a sink", ("writer", "sink")
+)
+shard_queued = gauge("ingest_shard_queued", "Packets waiting for their shard process", ("shard",))
+shard_batch_seconds = histogram(
+    "ingest_shard_batch_duration_seconds", "Time a shard process took to verify one batch", ("shard",)
+)
+shard_failures = counter("ingest_shard_failures", "Queued packets lost to a failed shard process", ("shard",))
+
+# Column order shared by every output format
+COLUMNS = ["ship_id", "timestamp_sent", "fish_count", "wind_level", "water_temp", "water_depth", "delay"]
+
+
+def make_record(ship_id, timestamp, delay, payload, seq=None):
+    """Build a telemetry record from a verified packet; seq is its sender's message number, if any."""
+    return {
+        "seq": seq,
+        "ship_id": ship_id,
+        "timestamp_sent": timestamp,
+        "fish_count": payload.get("caught_fish"),
+        "wind_level": payload.get("wind_levels"),
+        "water_temp": payload.get("water_temperature"),
+        "water_depth": payload.get("water_depth"),
+        "delay": delay,
+    }
+
+
+class CsvSink:
+    """Append records to a CSV file that stays open between flushes."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, mode="a", newline="")
+        self._writer = csv.writer(self._file)
+        if is_new:
+            self._writer.writerow(COLUMNS)
+            self._file.flush()
+            logger.info(f"Created output file: {self.path}")
+
+    def write(self, records):
+        self._writer.writerows([
+            [
+                record["ship_id"] or "unknown",
+                datetime.fromtimestamp(record["timestamp_sent"]).strftime('%Y-%m-%d %H:%M:%S')
+                if record["timestamp_sent"] else "N/A",
+                _or_na(record["fish_count"]),
+                _or_na(record["wind_level"]),
+                _or_na(record["water_temp"]),
+                _or_na(record["water_depth"]),
+                _or_na(record["delay"]),
+            ]
+            for record in records
+        ])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BinaryLogSink:
+    """
+    Append records to a fixed-width binary log.
+
+    Each record is packed as RECORD_FORMAT after an 8 byte file header, so the
+    log can be appended to without parsing and read back with read_binary_log.
+    Missing numeric values are stored as NaN (-1 for fish_count).
+    """
+
+    MAGIC = b"SCTLOG1\n"
+    RECORD_FORMAT = struct.Struct("<8sdiffff")
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, mode="ab")
+        if is_new:
+            self._file.write(self.MAGIC)
+
+    def write(self, records):
+        pack = self.RECORD_FORMAT.pack
+        self._file.write(b"".join(
+            pack(
+                str(record["ship_id"] or "unknown").encode()[:8],
+                _as_float(record["timestamp_sent"]),
+                _as_int(record["fish_count"]),
+                _as_float(record["wind_level"]),
+                _as_float(record["water_temp"]),
+                _as_float(record["water_depth"]),
+                _as_float(record["delay"]),
+            )
+            for record in records
+        ))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_binary_log(path):
+    """Yield records from a log written by BinaryLogSink."""
+    record_format = BinaryLogSink.RECORD_FORMAT
+    with open(path, "rb") as file:
+        if file.read(len(BinaryLogSink.MAGIC)) != BinaryLogSink.MAGIC:
+            raise ValueError(f"{path} is not a telemetry binary log")
+        while True:
+            chunk = file.read(record_format.size)
+            if len(chunk) < record_format.size:
+                return
+            values = record_format.unpack(chunk)
+            yield dict(zip(COLUMNS, (values[0].rstrip(b"\0").decode(),) + values[1:]))
+
+
+class ParquetSink:
+    """Write each flushed batch as a Parquet row group (requires pyarrow)."""
+
+    def __init__(self, path):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the parquet output format")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.schema = pa.schema([
+            ("ship_id", pa.string()),
+            ("timestamp_sent", pa.float64()),
+            ("fish_count", pa.int32()),
+            ("wind_level", pa.float32()),
+            ("water_temp", pa.float32()),
+            ("water_depth", pa.float32()),
+            ("delay", pa.float32()),
+        ])
+        # Parquet files can't be appended to, so each run gets its own file
+        if self.path.exists():
+            self.path = self.path.with_name(f"{self.path.stem}-{int(time.time())}{self.path.suffix}")
+        self._writer = pq.ParquetWriter(self.path, self.schema)
+
+    def write(self, records):
+        columns = {name: [] for name in COLUMNS}
+        for record in records:
+            columns["ship_id"].append(str(record["ship_id"] or "unknown"))
+            columns["timestamp_sent"].append(record["timestamp_sent"])
+            columns["fish_count"].append(_as_int(record["fish_count"], None))
+            columns["wind_level"].append(_as_float(record["wind_level"], None))
+            columns["water_temp"].append(_as_float(record["water_temp"], None))
+            columns["water_depth"].append(_as_float(record["water_depth"], None))
+            columns["delay"].append(_as_float(record["delay"], None))
+        self._writer.write_table(pa.table(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+# Output format name -> (sink class, file extension)
+SINKS = {
+    "csv": (CsvSink, ".csv"),
+    "binlog": (BinaryLogSink, ".bin"),
+    "parquet": (ParquetSink, ".parquet"),
+}
+
+
+def create_sinks(formats, base_path):
+    """
+    Create one sink per output format next to base_path.
+
+    Args:
+        formats: Iterable of format names from SINKS
+        base_path: Output path; its suffix is replaced per format
+
+    Returns:
+        list: Sink instances
+    """
+    base = Path(base_path)
+    sinks = []
+    for name in formats:
+        if name not in SINKS:
+            raise ValueError(f"Unknown output format: {name}")
+        sink_class, extension = SINKS[name]
+        sinks.append(sink_class(base.with_suffix(extension)))
+    return sinks
+
+
+class BufferedWriter:
+    """
+    Buffer records in memory and flush them to every sink in batches.
+
+    A background thread flushes whenever batch_size records are waiting or
+    flush_interval seconds have passed. add() blocks while the buffer holds
+    max_buffer records, and close() (registered with atexit) flushes whatever
+    is left, so no accepted record is dropped on shutdown.
+
+    name labels this writer's metrics.
+    """
+
+    def __init__(self, sinks, batch_size=INGEST_BATCH_SIZE,
+                 flush_interval=INGEST_FLUSH_INTERVAL, max_buffer=INGEST_MAX_BUFFER, name="telemetry"):
+        self.name = name
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.written = 0
+        self._buffer = []
+        self._condition = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        buffered_records.labels(name).set_function(self.pending)
+        atexit.register(self.close)
+
+    def add(self, record, timeout=5):
+        """Queue one record. Returns False if the buffer stayed full for timeout seconds."""
+        return self.add_many([record], timeout)
+
+    def add_many(self, records, timeout=5):
+        """Queue several records at once. Returns False if the buffer stayed full."""
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: len(self._buffer) < self.max_buffer or self._closed, timeout
+            ) or self._closed:
+                return False
+            self._buffer.extend(records)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def pending(self):
+        """Return the number of buffered records not yet written."""
+        return len(self._buffer)
+
+    def flush(self):
+        """Write every buffered record now."""
+        with self._condition:
+            batch, self._buffer = self._buffer, []
+            self._condition.notify_all()
+        if not batch:
+            return
+        for sink in self.sinks:
+            try:
+                with write_seconds.labels(self.name, type(sink).__name__).time():
+                    sink.write(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} records to {type(sink).__name__}: {e}")
+        self.written += len(batch)
+        written_records.labels(self.name).inc(len(batch))
+
+    def close(self):
+        """Flush remaining records and close every sink."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+        logger.info(f"Telemetry writer closed after {self.written} records")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._buffer) >= self.batch_size or self._closed,
+                    self.flush_interval
+                )
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+
+class ShardedVerifier:
+    """
+    Verify queued packets on a pool of processes, sharded by key.
+
+    Each shard is one worker process fed by one dispatcher thread, so items
+    submitted with the same key are verified, and their results delivered,
+    in the order they were submitted. The dispatcher hands its worker every
+    item waiting for the shard (up to batch_size) in one call, so under load
+    the cost of crossing the process boundary is shared by a batch.
+
+    verify(items) runs in a worker process and returns one result per item;
+    it must be a module-level function so it can be pickled. deliver(context,
+    result) runs in this process, on the shard's dispatcher thread. Workers
+    are spawned rather than forked, since the parent runs other threads.
+    close() (registered with atexit) delivers everything already queued.
+    """
+
+    def __init__(self, verify, deliver, shards, initializer=None, initargs=(),
+                 batch_size=INGEST_SHARD_BATCH, max_queue=INGEST_SHARD_QUEUE):
+        self.verify = verify
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self._pool_args = {
+            "max_workers": 1,
+            "mp_context": multiprocessing.get_context("spawn"),
+            "initializer": initializer,
+            "initargs": initargs,
+        }
+        self._executors = [ProcessPoolExecutor(**self._pool_args) for _ in range(shards)]
+        self._queues = [queue.Queue(maxsize=max_queue) for _ in range(shards)]
+        self._closed = False
+        self._threads = []
+        for shard, items in enumerate(self._queues):
+            shard_queued.labels(str(shard)).set_function(items.qsize)
+            thread = Thread(target=self._run, args=(shard,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.close)
+
+    def shard(self, key):
+        """Return the shard items with this key go to; stable across restarts."""
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % len(self._queues)
+
+    def submit(self, key, item, context=None):
+        """Queue item for its key's shard. Returns False if that shard's queue is full."""
+        if self._closed:
+            return False
+        try:
+            self._queues[self.shard(key)].put_nowait((item, context))
+        except queue.Full:
+            return False
+        return True
+
+    def pending(self):
+        """Return the number of items waiting for a shard process."""
+        return sum(items.qsize() for items in self._queues)
+
+    def close(self):
+        """Verify and deliver every queued item, then stop the shard processes."""
+        if self._closed:
+            return
+        self._closed = True
+        for items in self._queues:
+            items.put(None)
+        for thread in self._threads:
+            thread.join(timeout=30)
+        for executor in self._executors:
+            executor.shutdown()
+
+    def _run(self, shard):
+        items = self._queues[shard]
+        label = str(shard)
+        while True:
+            batch = [items.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(items.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._verify_batch(shard, label, batch)
+            if stop:
+                return
+
+    def _verify_batch(self, shard, label, batch):
+        try:
+            with shard_batch_seconds.labels(label).time():
+                results = self._executors[shard].submit(self.verify, [item for item, _ in batch]).result()
+        except Exception as e:
+            logger.error(f"Shard {shard} failed to verify {len(batch)} packets: {e}")
+            shard_failures.labels(label).inc(len(batch))
+            if isinstance(e, BrokenProcessPool):
+                self._executors[shard] = ProcessPoolExecutor(**self._pool_args)
+            return
+        for (_, context), result in zip(batch, results):
+            try:
+                self.deliver(context, result)
+            except Exception as e:
+                logger.error(f"Error delivering result from shard {shard}: {e}")
+
+
+def _or_na(value):
+    return "N/A" if value is None else value
+
+
+def _as_float(value, default=math.nan):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_int(value, default=-1):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,322 @@
+import bisect
+import time
+import weakref
+from threading import Lock, RLock, local
+
+# Default histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Sharded:
+    """
+    Per-thread cells that are summed when read.
+
+    Each thread only ever writes its own cell, so updates take no lock; the
+    lock is only held to register a thread's cell the first time it writes.
+    When a thread exits its cell is folded into a base total and dropped, so
+    servers that start a thread per request don't accumulate cells.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = local()
+        self._cells = {}
+        self._base = [0] * size
+        # Reentrant, since a cell may be retired by garbage collection while it is held
+        self._lock = RLock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._size
+            # The owner lives only in this thread's locals, so it is collected when the thread exits
+            owner = _CellOwner()
+            with self._lock:
+                self._cells[id(cell)] = cell
+            weakref.finalize(owner, self._retire, cell)
+            self._local.cell = cell
+            self._local.owner = owner
+            return cell
+
+    def totals(self):
+        with self._lock:
+            cells = [self._base] + list(self._cells.values())
+        return [sum(values) for values in zip(*cells)]
+
+    def _retire(self, cell):
+        with self._lock:
+            if self._cells.pop(id(cell), None) is not None:
+                self._base = [total + value for total, value in zip(self._base, cell)]
+
+
+class _CellOwner:
+    """Marks the lifetime of one thread's cell."""
+    pass
+
+
+class _Metric:
+    """Base for labelled metrics; each distinct label set gets its own child."""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values, **kwargs):
+        """Return the child for one set of label values."""
+        key = tuple(str(value) for value in values) or tuple(str(kwargs[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        """Yield (suffix, labels dict, value) for every exposed sample."""
+        for key, child in list(self._children.items()):
+            yield from child.samples(dict(zip(self.labelnames, key)))
+
+    def _new_child(self):
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Sharded(1)
+
+    def inc(self, amount=1):
+        self._shards.cell()[0] += amount
+
+    def samples(self, labels):
+        yield "_total", labels, self._shards.totals()[0]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests handled."""
+
+    kind = "counter"
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead."""
+        self.function = function
+
+    def samples(self, labels):
+        if self.function is None:
+            value = self.value
+        else:
+            try:
+                value = self.function()
+            except Exception:
+                return
+        yield "", labels, value
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. queue depth."""
+
+    kind = "gauge"
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One cell per bucket plus +Inf, then the sum
+        self._shards = _Sharded(len(buckets) + 2)
+
+    def observe(self, value):
+        cell = self._shards.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        """Context manager observing the seconds spent in its block."""
+        return _Timer(self)
+
+    def samples(self, labels):
+        totals = self._shards.totals()
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], totals):
+            cumulative += count
+            yield "_bucket", {**labels, "le": str(bound)}, cumulative
+        yield "_sum", labels, totals[-1]
+        yield "_count", labels, cumulative
+
+
+class Histogram(_Metric):
+    """Distribution of observations, e.g. request durations, in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, labelnames)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Registry:
+    """Named metrics of one process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        """Add metric, or return the one already registered under its name."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Metrics of this process
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    """Return the process-wide counter called name, creating it if needed."""
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=()):
+    """Return the process-wide gauge called name, creating it if needed."""
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Return the process-wide histogram called name, creating it if needed."""
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def instrument_flask(app):
+    """
+    Count and time every request to a Flask app and serve GET /metrics.
+
+    Requests are labelled by endpoint (the view function name, so paths
+    with arguments don't multiply series), method and status.
+    """
+    from flask import Response, request
+
+    requests_total = counter(
+        "http_requests", "HTTP requests handled", ("endpoint", "method", "status")
+    )
+    request_seconds = histogram(
+        "http_request_duration_seconds", "Time spent handling HTTP requests", ("endpoint",)
+    )
+    in_progress = gauge("http_requests_in_progress", "HTTP requests being handled")
+    active = _Sharded(1)
+    in_progress.set_function(lambda: active.totals()[0])
+
+    @app.before_request
+    def start_timer():
+        request.environ["metrics.started"] = time.perf_counter()
+        active.cell()[0] += 1
+
+    @app.after_request
+    def record_request(response):
+        started = request.environ.get("metrics.started")
+        if started is not None:
+            endpoint = request.endpoint or "unknown"
+            requests_total.labels(endpoint, request.method, response.status_code).inc()
+            request_seconds.labels(endpoint).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        # Runs even if the view raised, so the in-progress count can't leak
+        if request.environ.pop("metrics.started", None) is not None:
+            active.cell()[0] -= 1
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Return this process's metrics in the Prometheus text format."""
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
@@ -0,0 +1,189 @@
+import heapq
+import logging
+import time
+from threading import Lock
+
+from config import (
+    GROUND_CONTROL_COORDS, COMMUNICATION_RANGE_KM, ROUTING_METRIC, ROUTE_MAX_AGE
+)
+from geo import neighbour_pairs
+
+logger = logging.getLogger('routing')
+
+# Node ID used for ground control in the topology graph
+GROUND_CONTROL = "ground_control"
+
+
+class Route:
+    """Next hop towards ground control from one node."""
+
+    __slots__ = ("next_hop", "cost", "hops", "computed_at")
+
+    def __init__(self, next_hop, cost, hops, computed_at):
+        self.next_hop = next_hop
+        self.cost = cost
+        self.hops = hops
+        self.computed_at = computed_at
+
+    @property
+    def age(self):
+        """Seconds since this route was computed."""
+        return time.time() - self.computed_at
+
+    def to_dict(self, now=None):
+        age = self.age if now is None else now - self.computed_at
+        return {
+            "next_hop": self.next_hop,
+            "cost": round(self.cost, 2),
+            "hops": self.hops,
+            "age": round(age, 2),
+        }
+
+
+class RoutingTable:
+    """
+    Link-state routing towards ground control.
+
+    The topology graph is rebuilt from node positions on every update, and
+    shortest paths are only recomputed when the set of links changes (or the
+    routes exceed ROUTE_MAX_AGE, so link costs that drift as nodes move are
+    picked up eventually). Looking up a next hop is a dict access.
+
+    clock defaults to time.time; the simulator passes its virtual clock so
+    route ages follow simulated time.
+    """
+
+    def __init__(self, range_km=COMMUNICATION_RANGE_KM, metric=ROUTING_METRIC,
+                 max_age=ROUTE_MAX_AGE, ground_control_coords=GROUND_CONTROL_COORDS,
+                 clock=time.time):
+        self.range_km = range_km
+        self.metric = metric
+        self.max_age = max_age
+        self.ground_control_coords = tuple(ground_control_coords)
+        self.positions = {}
+        self.clock = clock
+        self.edges = frozenset()
+        self.adjacency = {}
+        self.routes = {}
+        self.computed_at = 0
+        self._lock = Lock()
+
+    def update(self, positions):
+        """
+        Feed the latest node positions into the topology graph.
+
+        Args:
+            positions: Dict of {node_id: (latitude, longitude)}
+
+        Returns:
+            bool: True if the shortest paths were recomputed
+        """
+        nodes = dict(positions)
+        nodes[GROUND_CONTROL] = self.ground_control_coords
+        edges, distances = self._build_edges(nodes)
+
+        with self._lock:
+            self.positions = nodes
+            now = self.clock()
+            stale = now - self.computed_at > self.max_age
+            if edges == self.edges and not stale:
+                return False
+            self.edges = edges
+            self.adjacency = self._adjacency(nodes, distances)
+            self.routes = self._shortest_paths(self.adjacency, now)
+            self.computed_at = now
+        logger.debug(f"Recomputed routes for {len(self.routes)} nodes over {len(edges)} links")
+        return True
+
+    def next_hop(self, node_id):
+        """Return the next hop from node_id towards ground control, or None."""
+        route = self.routes.get(node_id)
+        return route.next_hop if route else None
+
+    def route(self, node_id):
+        """Return the Route for node_id, or None if it cannot reach ground control."""
+        return self.routes.get(node_id)
+
+    def neighbours(self, node_id):
+        """Return the IDs of every node within range of node_id."""
+        return [neighbour for neighbour, _ in self.adjacency.get(node_id, ())]
+
+    def position(self, node_id):
+        """Return the last known (latitude, longitude) of a node, or None."""
+        return self.positions.get(node_id)
+
+    def best_uplink(self, candidates):
+        """
+        Pick the neighbour with the cheapest total path to ground control.
+
+        Args:
+            candidates: Iterable of (node_id, distance_km) for directly reachable nodes
+
+        Returns:
+            node_id of the best first hop, or None if no candidate has a route
+        """
+        best, best_cost = None, float("inf")
+        for node_id, distance in candidates:
+            route = self.routes.get(node_id)
+            if route is None and node_id != GROUND_CONTROL:
+                continue
+            cost = self._link_cost(distance) + (route.cost if route else 0)
+            if cost < best_cost:
+                best, best_cost = node_id, cost
+        return best
+
+    def snapshot(self):
+        """Return the routing table as a JSON-serialisable dict."""
+        now = self.clock()
+        return {str(node_id): route.to_dict(now) for node_id, route in self.routes.items()}
+
+    def _link_cost(self, distance):
+        return 1 if self.metric == "hops" else distance
+
+    def _build_edges(self, nodes):
+        """Return ({(a, b)}, {(a, b): distance_km}) for every in-range pair of nodes."""
+        ids = list(nodes)
+        pairs = neighbour_pairs(
+            [nodes[node_id][0] for node_id in ids],
+            [nodes[node_id][1] for node_id in ids],
+            self.range_km,
+        )
+        distances = {}
+        for i, j, distance in pairs:
+            a, b = ids[i], ids[j]
+            # Order the pair so the same link always hashes the same way
+            distances[(a, b) if str(a) <= str(b) else (b, a)] = distance
+        return frozenset(distances), distances
+
+    def _adjacency(self, nodes, distances):
+        """Return {node_id: [(neighbour, link_cost)]} for the undirected graph."""
+        adjacency = {node_id: [] for node_id in nodes}
+        for (a, b), distance in distances.items():
+            cost = self._link_cost(distance)
+            adjacency[a].append((b, cost))
+            adjacency[b].append((a, cost))
+        return adjacency
+
+    def _shortest_paths(self, adjacency, now):
+        """Run Dijkstra outwards from ground control over the undirected graph."""
+        # Routes point towards ground control, so a node's next hop is the
+        # node it was reached from when expanding outwards from ground control
+        best = {GROUND_CONTROL: (0, 0)}
+        visited = set()
+        routes = {}
+        queue = [(0, 0, 0, GROUND_CONTROL, None)]
+        counter = 1
+        while queue:
+            cost, hops, _, node_id, via = heapq.heappop(queue)
+            if node_id in visited:
+                continue
+            visited.add(node_id)
+            if node_id != GROUND_CONTROL:
+                routes[node_id] = Route(via, cost, hops, now)
+            for neighbour, link_cost in adjacency[node_id]:
+                candidate = (cost + link_cost, hops + 1)
+                if neighbour not in visited and (neighbour not in best or candidate < best[neighbour]):
+                    best[neighbour] = candidate
+                    heapq.heappush(queue, (candidate[0], candidate[1], counter, neighbour, node_id))
+                    counter += 1
+        return routes
@@ -0,0 +1,150 @@
+import importlib.util
+import logging
+from pathlib import Path
+from threading import Thread
+
+from config import WSGI_SERVER, SERVER_THREADS, SERVER_KEEPALIVE, SERVER_TIMEOUT
+
+logger = logging.getLogger('serving')
+
+# Servers serve() can run an app on, from most to least capable
+SERVERS = ("gunicorn", "waitress", "werkzeug")
+
+
+def serve(factory, host, port, server=WSGI_SERVER, workers=1, threads=SERVER_THREADS):
+    """
+    Serve an app from its factory until interrupted.
+
+    factory(worker_index) builds the app and starts its background threads.
+    It is called inside each worker process, after gunicorn forks it, so
+    every worker gets its own threads, sockets and open files; worker_index
+    runs from 0 to workers - 1 and is reused when a worker is replaced.
+
+    gunicorn runs workers processes of threads threads each (its gthread
+    worker). waitress and Werkzeug's development server run one process;
+    if the requested server isn't installed the next one in SERVERS is used,
+    unless more than one worker was asked for.
+
+    Args:
+        factory: Function of the worker index returning a WSGI app
+        host: Address to bind
+        port: Port to bind, or a list of ports all serving the app
+        server: One of SERVERS
+        workers: Worker processes (gunicorn only)
+        threads: Request threads per worker
+
+    Raises:
+        ValueError: If server isn't one of SERVERS
+        RuntimeError: If workers > 1 but gunicorn isn't installed
+    """
+    if server not in SERVERS:
+        raise ValueError(f"Unknown server: {server}")
+    for candidate in SERVERS[SERVERS.index(server):]:
+        if candidate == "werkzeug" or importlib.util.find_spec(candidate):
+            break
+        logger.warning(f"{candidate} is not installed, trying the next server")
+    if workers > 1 and candidate != "gunicorn":
+        message = (f"{workers} worker processes need gunicorn (pip3 install gunicorn), "
+                   f"but only {candidate} is available; run with one worker instead")
+        logger.error(message)
+        raise RuntimeError(message)
+    ports = [port] if isinstance(port, int) else list(port)
+    RUNNERS[candidate](factory, host, ports, workers, threads)
+
+
+def _serve_gunicorn(factory, host, ports, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        """Runs factory in each gthread worker, numbering workers from 0."""
+
+        def __init__(self):
+            self.worker_index = 0
+            super().__init__()
+
+        def load_config(self):
+            options = {
+                "bind": [f"{host}:{port}" for port in ports],
+                "workers": workers,
+                "threads": threads,
+                "worker_class": "gthread",
+                "keepalive": SERVER_KEEPALIVE,
+                "timeout": SERVER_TIMEOUT,
+                "accesslog": None,
+                "pre_fork": self._number_worker,
+                "post_fork": self._remember_index,
+            }
+            # Several device servers run side by side; don't share a control socket
+            if "control_socket_disable" in self.cfg.settings:
+                options["control_socket_disable"] = True
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return factory(self.worker_index)
+
+        @staticmethod
+        def _number_worker(arbiter, worker):
+            taken = {getattr(other, "index", None) for other in arbiter.WORKERS.values()}
+            worker.index = next(index for index in range(len(taken) + 1) if index not in taken)
+
+        def _remember_index(self, arbiter, worker):
+            self.worker_index = worker.index
+
+    logger.info(f"Serving {_describe(host, ports)} with gunicorn ({workers} workers x {threads} threads)")
+    Application().run()
+
+
+def _serve_waitress(factory, host, ports, workers, threads):
+    import waitress
+
+    if workers > 1:
+        logger.warning("waitress runs a single process; ignoring workers")
+    logger.info(f"Serving {_describe(host, ports)} with waitress ({threads} threads)")
+    listen = " ".join(f"{host}:{port}" for port in ports)
+    waitress.serve(factory(0), listen=listen, threads=threads, ident=None,
+                   channel_timeout=SERVER_TIMEOUT)
+
+
+def _serve_werkzeug(factory, host, ports, workers, threads):
+    from werkzeug.serving import make_server
+
+    if workers > 1:
+        logger.warning("The development server runs a single process; ignoring workers")
+    logger.warning("Serving with Werkzeug's development server; use --server gunicorn or waitress for production")
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = factory(0)
+    servers = [make_server(host, port, app, threaded=True) for port in ports]
+    for server in servers[1:]:
+        Thread(target=server.serve_forever, daemon=True).start()
+    servers[0].serve_forever()
+
+
+def _describe(host, ports):
+    return f"on {host}:{ports[0]}" if len(ports) == 1 else f"on {host} ports {', '.join(map(str, ports))}"
+
+
+def worker_path(path, worker_index):
+    """Return path for worker 0 and a per-worker variant (output_w1.csv) for the others."""
+    if not worker_index:
+        return path
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}_w{worker_index}{path.suffix}"))
+
+
+RUNNERS = {
+    "gunicorn": _serve_gunicorn,
+    "waitress": _serve_waitress,
+    "werkzeug": _serve_werkzeug,
+}
+
+
+def add_server_arguments(parser, workers=False):
+    """Add --server and --threads (and --workers if the app can run in several processes)."""
+    parser.add_argument("--server", choices=SERVERS, default=WSGI_SERVER,
+                        help=f"Server to run on (default: {WSGI_SERVER}).")
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS,
+                        help=f"Request threads per worker (default: {SERVER_THREADS}).")
+    if workers:
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Worker processes, needs --server gunicorn (default: 1).")
@@ -0,0 +1,366 @@
+import argparse
+import heapq
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+from itertools import count
+
+from cryptography.fernet import Fernet
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('simulation')
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from config import (
+    NUM_SATELLITES, START_PORT, COMMUNICATION_RANGE_KM, TIME_STEP, SIMULATION_DURATION,
+    SHIP_SPEED, PAYLOAD_CODEC
+)
+from codec import Keyring
+from gossip import NeighbourTable
+from routing import RoutingTable, GROUND_CONTROL
+from ingest import create_sinks
+from store_forward import StoreAndForwardQueue
+from devices.satellite import Satellite
+from devices.ship import Ship, LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+from devices.ground_control import verify_packet, PacketError
+
+# Where simulated telemetry is written, next to the live output_data.csv
+OUTPUT_FILE = "src/data/simulation_output.csv"
+
+# Per-hop relay delay and retry behaviour, matching the satellite server
+HOP_DELAY = (0.1, 1.0)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values by nearest rank, or None."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Simulation:
+    """
+    Discrete-event simulation of the whole network in one process.
+
+    Satellites and ships are the real device classes sharing one position
+    table and one routing table, so movement and routing decisions are the
+    ones the servers make. Instead of HTTP and time.sleep, relaying is a heap
+    of timed events on a virtual clock: every TIME_STEP all nodes move and
+    routes are refreshed, ships send when due, and each satellite waits its
+    random relay delay before choosing a next hop. Packets are checked with
+    ground control's verify_packet, so corrupted payloads fail the same way.
+
+    With store_forward, satellites hold packets they can't forward in a
+    StoreAndForwardQueue on the virtual clock and drain them once a route
+    appears, as the servers do.
+
+    The device classes draw from the module-level random generator, so the
+    simulation seeds it; two runs with the same seed and parameters produce
+    the same statistics.
+    """
+
+    def __init__(self, num_satellites=NUM_SATELLITES, num_ships=1, range_km=COMMUNICATION_RANGE_KM,
+                 send_interval=TIME_STEP * 5, seed=0, time_step=TIME_STEP, start_time=None,
+                 max_hops=64, keyring=None, codec=PAYLOAD_CODEC, satellite_step=None, ship_speed=SHIP_SPEED,
+                 store_forward=False):
+        random.seed(seed)
+        self.seed = seed
+        # Failures draw from their own generator so adding them doesn't
+        # change how the same seed moves the nodes
+        self.failure_random = random.Random(seed)
+        self.range_km = range_km
+        self.time_step = time_step
+        self.start_time = time.time() if start_time is None else start_time
+        self.now = self.start_time
+        self.max_hops = max_hops
+        self.keyring = keyring or Keyring(Fernet.generate_key())
+        self.cipher_suite = self.keyring.codec(codec)
+
+        self.positions = NeighbourTable()
+        self.router = RoutingTable(range_km=range_km, clock=self.clock)
+        satellite_ids = list(range(START_PORT, START_PORT + num_satellites))
+        self.satellites = {
+            satellite_id: Satellite(
+                satellite_id, satellite_ids,
+                positions=self.positions, router=self.router, range_km=range_km,
+            )
+            for satellite_id in satellite_ids
+        }
+        if satellite_step is not None:
+            for satellite in self.satellites.values():
+                satellite.step_size = satellite_step
+        self.failed = set()
+        self.stores = {
+            satellite_id: StoreAndForwardQueue(clock=self.clock) for satellite_id in self.satellites
+        } if store_forward else {}
+        self.held = 0
+
+        self.ships = []
+        for i in range(num_ships):
+            ship = Ship(
+                ship_id=f"{i + 1:02d}",
+                positions=self.positions,
+                router=self.router,
+                cipher_suite=self.cipher_suite,
+                send_interval=send_interval,
+                range_km=range_km,
+            )
+            ship.speed = ship_speed
+            ship.latitude = random.uniform(LAT_MIN, LAT_MAX)
+            ship.longitude = random.uniform(LON_MIN, LON_MAX)
+            ship.direction = random.choice([1, -1])
+            self.ships.append(ship)
+
+        self.started = False
+        self.events = []
+        self._sequence = count()
+        self.records = []
+        self.delays = []
+        self.hops = []
+        self.sent = 0
+        self.checksum_failures = 0
+        self.dropped = Counter()
+
+    def clock(self):
+        """Return the current virtual time."""
+        return self.now
+
+    def schedule(self, at, handler, *args):
+        """Run handler(*args) at virtual time at."""
+        heapq.heappush(self.events, (at, next(self._sequence), handler, args))
+
+    def fail(self, satellite_id):
+        """Take a satellite down; packets routed to it fail until routes converge."""
+        self.failed.add(satellite_id)
+        self.positions.remove(satellite_id)
+
+    def recover(self, satellite_id):
+        """Bring a failed satellite back."""
+        self.failed.discard(satellite_id)
+
+    def schedule_failures(self, count, at, until=None):
+        """
+        Fail count randomly chosen satellites at virtual offset at.
+
+        Args:
+            count: Number of satellites to take down
+            at: Seconds after the start of the run
+            until: Seconds after the start when they recover (None to stay down)
+        """
+        def fail_some():
+            alive = sorted(set(self.satellites) - self.failed)
+            victims = self.failure_random.sample(alive, min(count, len(alive)))
+            for satellite_id in victims:
+                self.fail(satellite_id)
+            if until is not None:
+                for satellite_id in victims:
+                    self.schedule(self.start_time + until, self.recover, satellite_id)
+
+        self.schedule(self.start_time + at, fail_some)
+
+    def run(self, duration=SIMULATION_DURATION):
+        """
+        Advance the virtual clock by duration seconds.
+
+        Returns:
+            dict: Delivery and latency statistics (see stats)
+        """
+        started = time.time()
+        end = self.now + duration
+        if not self.started:
+            self.started = True
+            self._step()
+            for ship in self.ships:
+                self.schedule(self.now + random.uniform(0, ship.send_interval), self._send, ship)
+
+        while self.events and self.events[0][0] <= end:
+            at, _, handler, args = heapq.heappop(self.events)
+            self.now = at
+            handler(*args)
+        self.now = end
+
+        stats = self.stats()
+        stats["wall_time"] = round(time.time() - started, 3)
+        stats["speedup"] = round(duration / stats["wall_time"], 1) if stats["wall_time"] else None
+        return stats
+
+    def stats(self):
+        """Return delivery ratio, delay percentiles and hop counts so far."""
+        in_flight = sum(1 for event in self.events if event[2] == self._forward)
+        return {
+            "satellites": len(self.satellites),
+            "ships": len(self.ships),
+            "range_km": self.range_km,
+            "seed": self.seed,
+            "duration": round(self.now - self.start_time, 3),
+            "sent": self.sent,
+            "delivered": len(self.delays),
+            "checksum_failures": self.checksum_failures,
+            "dropped": dict(self.dropped, **self._store_drops()),
+            "in_flight": in_flight,
+            "held": self.held,
+            "queued": sum(len(store) for store in self.stores.values()),
+            "delivery_ratio": round(len(self.delays) / self.sent, 4) if self.sent else None,
+            "delay_mean": round(sum(self.delays) / len(self.delays), 3) if self.delays else None,
+            "delay_p50": _rounded(percentile(self.delays, 50)),
+            "delay_p99": _rounded(percentile(self.delays, 99)),
+            "hops_mean": round(sum(self.hops) / len(self.hops), 2) if self.hops else None,
+            "hops_max": max(self.hops, default=None),
+        }
+
+    def write_output(self, path=OUTPUT_FILE):
+        """Write delivered records in the same CSV layout as ground control."""
+        for sink in create_sinks(["csv"], path):
+            sink.write(self.records)
+            sink.close()
+
+    def _step(self):
+        """Move every node and refresh the shared view once per time step."""
+        for satellite_id, satellite in self.satellites.items():
+            if satellite_id in self.failed:
+                continue
+            satellite.move()
+            self.positions.update(satellite_id, satellite.latitude, satellite.longitude)
+        self.router.update(self.positions.positions())
+        self._drain_stores()
+        for ship in self.ships:
+            ship.move()
+        self.schedule(self.now + self.time_step, self._step)
+
+    def _send(self, ship):
+        ship.schedule_next_send(self.now)
+        self.schedule(ship.next_send_time, self._send, ship)
+
+        packet = ship.create_data_packet()
+        packet["timestamp"] = self.now
+        self.sent += 1
+
+        uplink = ship.find_closest_to_ground_control()
+        if uplink is None or uplink in self.failed:
+            self.dropped["no_uplink"] += 1
+            return
+        self._relay(uplink, packet, 1)
+
+    def _relay(self, satellite_id, packet, hops):
+        """Hand a packet to a satellite, which forwards it after its relay delay."""
+        self.schedule(self.now + random.uniform(*HOP_DELAY), self._forward, satellite_id, packet, hops, 0)
+
+    def _forward(self, satellite_id, packet, hops, attempt):
+        if satellite_id in self.failed:
+            self.dropped["node_failed"] += 1
+            return
+
+        next_hop = self.satellites[satellite_id].next_hop()
+        if next_hop is None:
+            if not self._hold(satellite_id, packet, hops):
+                self.dropped["no_route"] += 1
+        elif next_hop == GROUND_CONTROL:
+            self._deliver(packet, hops)
+        elif next_hop not in self.failed:
+            if hops >= self.max_hops:
+                self.dropped["hop_limit"] += 1
+            else:
+                self._relay(next_hop, packet, hops + 1)
+        elif attempt + 1 < MAX_RETRIES:
+            # Wait before retry with exponential backoff, then route again
+            self.schedule(
+                self.now + RETRY_BACKOFF * (2 ** attempt),
+                self._forward, satellite_id, packet, hops, attempt + 1
+            )
+        elif not self._hold(satellite_id, packet, hops):
+            self.dropped["retries_exhausted"] += 1
+
+    def _hold(self, satellite_id, packet, hops):
+        """Queue an undeliverable packet on its satellite, if store-and-forward is on."""
+        store = self.stores.get(satellite_id)
+        if store is None or not store.put((packet, hops)):
+            return False
+        self.held += 1
+        return True
+
+    def _drain_stores(self):
+        """Release held packets on every live satellite that has a route again."""
+        for satellite_id, store in self.stores.items():
+            if not len(store) or satellite_id in self.failed:
+                continue
+            if self.satellites[satellite_id].next_hop() is None:
+                continue
+            for (packet, hops), _, _ in store.drain():
+                self._forward(satellite_id, packet, hops, 0)
+
+    def _store_drops(self):
+        drops = {
+            "expired": sum(store.expired for store in self.stores.values()),
+            "evicted": sum(store.evicted for store in self.stores.values()),
+        }
+        return {reason: count for reason, count in drops.items() if count}
+
+    def _deliver(self, packet, hops):
+        try:
+            record = verify_packet(packet, keys=self.keyring, received_at=self.now)
+        except PacketError:
+            self.checksum_failures += 1
+            return
+        self.records.append(record)
+        self.delays.append(self.now - packet["timestamp"])
+        self.hops.append(hops)
+
+
+def _rounded(value, digits=3):
+    return None if value is None else round(value, digits)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the network on a virtual clock.")
+    parser.add_argument("--satellites", type=int, default=NUM_SATELLITES,
+                        help=f"Number of satellites (default: {NUM_SATELLITES}).")
+    parser.add_argument("--ships", type=int, default=1, help="Number of ships (default: 1).")
+    parser.add_argument("--range-km", type=float, default=COMMUNICATION_RANGE_KM,
+                        help=f"Communication range in km (default: {COMMUNICATION_RANGE_KM}).")
+    parser.add_argument("--duration", type=float, default=SIMULATION_DURATION,
+                        help=f"Simulated seconds (default: {SIMULATION_DURATION}).")
+    parser.add_argument("--send-interval", type=float, default=TIME_STEP * 5,
+                        help="Seconds between packets from each ship.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE,
+                        help=f"CSV file for delivered records, or '' to skip (default: {OUTPUT_FILE}).")
+    parser.add_argument("--store-forward", action="store_true",
+                        help="Hold undeliverable packets on satellites until a route appears.")
+    parser.add_argument("--json", action="store_true", help="Print statistics as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-device log lines.")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        for name in ("satellite", "ship", "ground_control", "routing"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    simulation = Simulation(
+        num_satellites=args.satellites,
+        num_ships=args.ships,
+        range_km=args.range_km,
+        send_interval=args.send_interval,
+        seed=args.seed,
+        store_forward=args.store_forward,
+    )
+    stats = simulation.run(args.duration)
+    if args.output:
+        simulation.write_output(args.output)
+        logger.info(f"Wrote {len(simulation.records)} records to {args.output}")
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        for key, value in stats.items():
+            print(f"{key:>18}: {value}")
@@ -0,0 +1,165 @@
+import heapq
+import json
+import logging
+import sqlite3
+import time
+from itertools import count
+from pathlib import Path
+from threading import Lock
+
+from config import STORE_FORWARD_MAX_PACKETS, STORE_FORWARD_TTL
+
+logger = logging.getLogger('store_forward')
+
+# Optional HTTP header giving a packet's store-and-forward priority
+PRIORITY_HEADER = "X-Priority"
+
+
+class StoreAndForwardQueue:
+    """
+    Bounded priority queue of packets waiting for a route.
+
+    Higher priorities drain first and packets of equal priority drain in
+    arrival order. Packets older than ttl seconds are dropped instead of
+    delivered. When the queue is full a new packet evicts the oldest packet
+    of the lowest priority, unless that priority is higher than its own, in
+    which case the new packet is refused.
+
+    If path is given the queue is mirrored to a SQLite file, so packets
+    survive a restart. The in-memory heap stays the source of truth; the
+    file is only read back on startup.
+    """
+
+    def __init__(self, max_size=STORE_FORWARD_MAX_PACKETS, ttl=STORE_FORWARD_TTL, path=None,
+                 clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        # Entries are (-priority, sequence, expires_at, item)
+        self._heap = []
+        self._sequence = count()
+        self._lock = Lock()
+        self.expired = 0
+        self.evicted = 0
+        self._db = None
+        if path is not None:
+            self._open(Path(path))
+
+    def put(self, item, priority=0, expires_at=None):
+        """
+        Queue a JSON-serialisable item.
+
+        Args:
+            item: Packet to hold
+            priority: Higher values drain first and are evicted last
+            expires_at: Expiry time (defaults to ttl seconds from now)
+
+        Returns:
+            bool: False if the queue is full of higher priority items
+        """
+        with self._lock:
+            self._expire()
+            if len(self._heap) >= self.max_size:
+                victim = self._lowest()
+                if -victim[0] > priority:
+                    return False
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self._delete([victim])
+                self.evicted += 1
+            if expires_at is None:
+                expires_at = self.clock() + self.ttl
+            entry = (-priority, next(self._sequence), expires_at, item)
+            heapq.heappush(self._heap, entry)
+            self._insert([entry])
+            return True
+
+    def drain(self, max_items=None):
+        """
+        Remove up to max_items unexpired entries, highest priority first.
+
+        Returns:
+            list: (item, priority, expires_at) tuples; pass undelivered ones
+            to requeue
+        """
+        with self._lock:
+            self._expire()
+            taken = []
+            while self._heap and (max_items is None or len(taken) < max_items):
+                taken.append(heapq.heappop(self._heap))
+            self._delete(taken)
+            return [(item, -priority, expires_at) for priority, _, expires_at, item in taken]
+
+    def requeue(self, entries):
+        """Put back drained entries that could not be delivered, keeping priority and expiry."""
+        for item, priority, expires_at in entries:
+            self.put(item, priority, expires_at)
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._heap)
+
+    def stats(self):
+        """Return queue depth and drop counts."""
+        return {
+            "queued": len(self),
+            "max_size": self.max_size,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _lowest(self):
+        # Lowest priority first, then the oldest of those
+        return max(self._heap, key=lambda entry: (entry[0], -entry[1]))
+
+    def _expire(self):
+        now = self.clock()
+        if not any(entry[2] <= now for entry in self._heap):
+            return
+        live, dead = [], []
+        for entry in self._heap:
+            (dead if entry[2] <= now else live).append(entry)
+        heapq.heapify(live)
+        self._heap = live
+        self._delete(dead)
+        self.expired += len(dead)
+        logger.debug(f"Expired {len(dead)} queued packets")
+
+    def _open(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            "sequence INTEGER PRIMARY KEY, priority INTEGER, expires_at REAL, item TEXT)"
+        )
+        rows = self._db.execute("SELECT priority, expires_at, item FROM queue ORDER BY sequence").fetchall()
+        # Renumber restored entries so new sequence numbers stay unique
+        self._db.execute("DELETE FROM queue")
+        for priority, expires_at, item in rows:
+            self._heap.append((-priority, next(self._sequence), expires_at, json.loads(item)))
+        heapq.heapify(self._heap)
+        self._insert(self._heap)
+        if rows:
+            logger.info(f"Restored {len(rows)} queued packets from {path}")
+
+    def _insert(self, entries):
+        if self._db is None or not entries:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO queue (sequence, priority, expires_at, item) VALUES (?, ?, ?, ?)",
+                [(sequence, -priority, expires_at, json.dumps(item))
+                 for priority, sequence, expires_at, item in entries]
+            )
+
+    def _delete(self, entries):
+        if self._db is None or not entries:
+            return
+        with self._db:
+            self._db.executemany("DELETE FROM queue WHERE sequence = ?", [(entry[1],) for entry in entries])
@@ -0,0 +1,193 @@
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from config import NUM_SATELLITES, COMMUNICATION_RANGE_KM, SHIP_SPEED, SIMULATION_DURATION
+from simulation import Simulation
+
+logger = logging.getLogger('sweep')
+
+# Where the combined results table is written
+OUTPUT_FILE = "src/data/sweep_results.csv"
+
+# Parameters varied by the sweep, in results table order
+PARAMETERS = ["satellites", "range_km", "satellite_step", "ship_speed", "failures", "store_forward", "seed"]
+
+# Summary metrics copied from each run's statistics
+METRICS = [
+    "sent", "delivered", "delivery_ratio", "delay_p50", "delay_p99",
+    "hops_mean", "hops_max", "checksum_failures", "dropped", "held", "wall_time",
+]
+
+
+def parse_failures(pattern):
+    """
+    Parse a failure pattern into (count, at, until) tuples.
+
+    Patterns are "none" or comma-free groups joined by "+", each
+    "COUNT@AT" (COUNT satellites stop AT seconds in and stay down, like
+    stop_port.sh) or "COUNT@AT-UNTIL" (they come back UNTIL seconds in).
+    For example "2@60+1@120-300".
+    """
+    if not pattern or pattern == "none":
+        return []
+    failures = []
+    for group in pattern.split("+"):
+        try:
+            count, window = group.split("@")
+            at, _, until = window.partition("-")
+            failures.append((int(count), float(at), float(until) if until else None))
+        except ValueError:
+            raise ValueError(f"Invalid failure pattern: {group}")
+    return failures
+
+
+def expand_grid(grid):
+    """Return one parameter dict per combination of the grid's value lists."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_scenario(params, ships=1, duration=SIMULATION_DURATION, send_interval=5):
+    """
+    Run one simulation and return its parameters and summary metrics.
+
+    Runs in a worker process, so it builds everything it needs from params.
+    """
+    for name in ("satellite", "ship", "ground_control", "routing", "ingest"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    simulation = Simulation(
+        num_satellites=params["satellites"],
+        num_ships=ships,
+        range_km=params["range_km"],
+        send_interval=send_interval,
+        seed=params["seed"],
+        satellite_step=params["satellite_step"],
+        ship_speed=params["ship_speed"],
+        store_forward=params.get("store_forward", False),
+    )
+    for count, at, until in parse_failures(params["failures"]):
+        simulation.schedule_failures(count, at, until)
+    stats = simulation.run(duration)
+    stats["dropped"] = sum(stats["dropped"].values())
+    return {**params, **{metric: stats[metric] for metric in METRICS}}
+
+
+def run_sweep(grid, workers=None, **scenario_options):
+    """
+    Run every combination in grid across a process pool.
+
+    Args:
+        grid: Dict of {parameter: [values]} covering PARAMETERS
+        workers: Number of processes (defaults to the CPU count)
+        scenario_options: ships, duration and send_interval for every run
+
+    Returns:
+        list: One result row per combination, in grid order
+    """
+    scenarios = expand_grid(grid)
+    results = [None] * len(scenarios)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_scenario, params, **scenario_options): index
+            for index, params in enumerate(scenarios)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logger.error(f"Scenario {scenarios[index]} failed: {e}")
+                results[index] = {**scenarios[index], "error": str(e)}
+            logger.info(f"Finished {done}/{len(scenarios)} scenarios")
+    return results
+
+
+def write_results(results, path=OUTPUT_FILE):
+    """Write result rows as one CSV table."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    columns = PARAMETERS + METRICS + (["error"] if any("error" in row for row in results) else [])
+    with open(path, mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns, restval="")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_results(results):
+    """Print result rows as an aligned text table."""
+    columns = PARAMETERS + [metric for metric in METRICS if metric != "wall_time"]
+    rows = [[str(row.get(column, "")) for column in columns] for row in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def _values(text, cast):
+    return [cast(value) for value in text.split(",") if value]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Sweep simulated scenarios across CPU cores.")
+    parser.add_argument("--satellites", type=str, default=str(NUM_SATELLITES),
+                        help="Comma-separated satellite counts.")
+    parser.add_argument("--range-km", type=str, default=str(COMMUNICATION_RANGE_KM),
+                        help="Comma-separated communication ranges in km.")
+    parser.add_argument("--satellite-step", type=str, default="0.05",
+                        help="Comma-separated satellite speeds in degrees per time step.")
+    parser.add_argument("--ship-speed", type=str, default=str(SHIP_SPEED),
+                        help="Comma-separated ship speeds.")
+    parser.add_argument("--failures", type=str, default="none",
+                        help="Comma-separated failure patterns, e.g. none,2@60,1@60-300.")
+    parser.add_argument("--store-forward", type=str, default="0",
+                        help="Comma-separated 0/1 for satellite store-and-forward, e.g. 0,1.")
+    parser.add_argument("--seeds", type=str, default="0",
+                        help="Comma-separated seeds; each combination runs once per seed.")
+    parser.add_argument("--ships", type=int, default=1, help="Ships per run (default: 1).")
+    parser.add_argument("--duration", type=float, default=SIMULATION_DURATION,
+                        help=f"Simulated seconds per run (default: {SIMULATION_DURATION}).")
+    parser.add_argument("--send-interval", type=float, default=5,
+                        help="Seconds between packets from each ship (default: 5).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count).")
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE,
+                        help=f"CSV results table (default: {OUTPUT_FILE}).")
+    args = parser.parse_args()
+
+    grid = {
+        "satellites": _values(args.satellites, int),
+        "range_km": _values(args.range_km, float),
+        "satellite_step": _values(args.satellite_step, float),
+        "ship_speed": _values(args.ship_speed, float),
+        "failures": _values(args.failures, str),
+        "store_forward": [value == "1" for value in _values(args.store_forward, str)],
+        "seed": _values(args.seeds, int),
+    }
+    try:
+        for pattern in grid["failures"]:
+            parse_failures(pattern)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.time()
+    results = run_sweep(
+        grid, workers=args.workers,
+        ships=args.ships, duration=args.duration, send_interval=args.send_interval,
+    )
+    write_results(results, args.output)
+    print_results(results)
+    logger.info(f"{len(results)} scenarios in {time.time() - started:.1f}s, results written to {args.output}")
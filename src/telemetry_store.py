@@ -0,0 +1,291 @@
+import math
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock, local
+
+from config import QUERY_MAX_ROWS, QUERY_MAX_BUCKETS
+from dedup import duplicate_readings
+from metrics import histogram
+
+# Query latency, labelled by query kind (readings, stats or series)
+query_seconds = histogram("telemetry_query_duration_seconds", "Time spent answering one telemetry query", ("query",))
+
+# Columns of a reading, in table order
+FIELDS = ("ship_id", "timestamp", "fish_count", "wind_level", "water_temp", "water_depth", "delay", "seq")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    ship_id TEXT NOT NULL,
+    timestamp REAL,
+    fish_count INTEGER,
+    wind_level REAL,
+    water_temp REAL,
+    water_depth REAL,
+    delay REAL,
+    seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS readings_ship_time ON readings (ship_id, timestamp);
+CREATE INDEX IF NOT EXISTS readings_time ON readings (timestamp);
+"""
+
+# A ship's message ID is stored once; unnumbered readings (NULL seq) never collide
+MESSAGE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS readings_message ON readings (ship_id, seq)"
+
+# Delay as a number, or NULL; databases written before delays were checked may hold "Unknown"
+DELAY = "CASE WHEN typeof(delay) IN ('real', 'integer') THEN delay END"
+
+# Aggregate columns reported by stats(), per ship and overall; delays is only used to find percentiles
+TOTALS = f"""
+    COUNT(*) AS readings, AVG({DELAY}) AS delay_mean, MAX({DELAY}) AS delay_max, SUM(fish_count) AS fish_total,
+    AVG(wind_level) AS wind_level, AVG(water_temp) AS water_temp, AVG(water_depth) AS water_depth,
+    COUNT({DELAY}) AS delays
+"""
+
+# Delay percentiles reported by stats()
+PERCENTILES = (("delay_p50", 0.5), ("delay_p99", 0.99))
+
+
+class QueryError(Exception):
+    """Raised when a query's parameters are invalid."""
+    pass
+
+
+class TelemetryStore:
+    """
+    Keep received readings in an SQLite database indexed by ship and time.
+
+    The store is a sink: BufferedWriter hands it each flushed batch, which is
+    inserted in one transaction. The database runs in WAL mode, so queries
+    from request threads read a consistent snapshot without blocking the
+    writer. Every query thread gets its own read connection. Several
+    processes may write to the same file; SQLite serialises their
+    transactions and waits up to busy_timeout seconds for the lock. A reading
+    whose (ship_id, seq) message ID is already stored is skipped, whichever
+    process wrote the first copy.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        self._write_lock = Lock()
+        self._readers = local()
+        self._connection = self._connect()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode a commit is durable at the next checkpoint, which is safe against corruption
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._write_lock, self._connection:
+            self._connection.executescript(SCHEMA)
+            # Databases created before readings were numbered lack the seq column
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(readings)")]
+            if "seq" not in columns:
+                self._connection.execute("ALTER TABLE readings ADD COLUMN seq INTEGER")
+            self._connection.execute(MESSAGE_INDEX)
+
+    def _connect(self):
+        return sqlite3.connect(str(self.path), timeout=self.busy_timeout, check_same_thread=False)
+
+    def _reader(self):
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            connection = self._readers.connection = self._connect()
+            connection.row_factory = sqlite3.Row
+        return connection
+
+    def write(self, records):
+        """
+        Insert a batch of records in one transaction, skipping message IDs already stored.
+
+        Values that aren't numbers are stored as NULL.
+        """
+        rows = [
+            (
+                str(record["ship_id"] or "unknown"),
+                _real(record["timestamp_sent"]),
+                _integer(record["fish_count"]),
+                _real(record["wind_level"]),
+                _real(record["water_temp"]),
+                _real(record["water_depth"]),
+                _real(record["delay"]),
+                _integer(record.get("seq")),
+            )
+            for record in records
+        ]
+        with self._write_lock, self._connection:
+            inserted = self._connection.executemany(
+                f"INSERT OR IGNORE INTO readings ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", rows
+            ).rowcount
+        if inserted < len(rows):
+            duplicate_readings.inc(len(rows) - inserted)
+
+    def close(self):
+        with self._write_lock:
+            self._connection.close()
+
+    def readings(self, ship_id=None, start=None, end=None, limit=QUERY_MAX_ROWS):
+        """
+        Return readings in a time range, oldest first.
+
+        Args:
+            ship_id: Only readings from this ship, or None for every ship
+            start: Earliest timestamp (inclusive), or None
+            end: Latest timestamp (exclusive), or None
+            limit: Most readings returned; capped at QUERY_MAX_ROWS
+
+        Returns:
+            list: Reading dicts with the FIELDS keys
+        """
+        limit = min(limit, QUERY_MAX_ROWS)
+        if limit < 1:
+            raise QueryError("limit must be positive")
+        where, params = _range(ship_id, start, end)
+        with query_seconds.labels("readings").time():
+            rows = self._reader().execute(
+                f"SELECT * FROM readings {where} ORDER BY timestamp LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self, ship_id=None, start=None, end=None):
+        """
+        Aggregate readings in a time range, per ship and overall.
+
+        Returns:
+            dict: {"all": totals, "ships": {ship_id: totals}}, where totals holds
+            the reading count, mean/p50/p99/max delay, fish total and the mean
+            wind, water temperature and depth
+        """
+        where, params = _range(ship_id, start, end)
+        connection = self._reader()
+        with query_seconds.labels("stats").time():
+            # One read transaction, so every figure comes from the same snapshot
+            with connection:
+                connection.execute("BEGIN")
+                overall = dict(connection.execute(f"SELECT {TOTALS} FROM readings {where}", params).fetchone())
+                ships = {
+                    row["ship_id"]: dict(row) for row in connection.execute(
+                        f"SELECT ship_id, {TOTALS} FROM readings {where} GROUP BY ship_id ORDER BY ship_id", params
+                    )
+                }
+                _add_percentiles(connection, overall, where, params)
+                for ship, totals in ships.items():
+                    del totals["ship_id"]
+                    _add_percentiles(connection, totals, *_range(ship, start, end))
+        return {"all": overall, "ships": ships}
+
+    def series(self, bucket, ship_id=None, start=None, end=None):
+        """
+        Downsample readings in a time range into fixed-width time buckets.
+
+        Args:
+            bucket: Bucket width in seconds
+            ship_id, start, end: As for readings()
+
+        Returns:
+            list: One dict per non-empty bucket, oldest first, with the bucket
+            start time, reading count, mean and max delay, fish total and the
+            mean wind, water temperature and depth
+        """
+        if not bucket or bucket <= 0:
+            raise QueryError("bucket must be a positive number of seconds")
+        where, params = _range(ship_id, start, end)
+        with query_seconds.labels("series").time():
+            rows = self._reader().execute(
+                f"""
+                SELECT CAST(timestamp / ? AS INTEGER) * ? AS start, COUNT(*) AS readings,
+                       AVG({DELAY}) AS delay_mean, MAX({DELAY}) AS delay_max, SUM(fish_count) AS fish_total,
+                       AVG(wind_level) AS wind_level, AVG(water_temp) AS water_temp,
+                       AVG(water_depth) AS water_depth
+                FROM readings {where} AND timestamp IS NOT NULL
+                GROUP BY CAST(timestamp / ? AS INTEGER) ORDER BY start LIMIT ?
+                """,
+                [bucket, bucket] + params + [bucket, QUERY_MAX_BUCKETS],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def _range(ship_id, start, end):
+    """Return a WHERE clause and its parameters for a ship and time range."""
+    clauses, params = ["1"], []
+    if ship_id is not None:
+        clauses.append("ship_id = ?")
+        params.append(ship_id)
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def _add_percentiles(connection, totals, where, params):
+    """
+    Add the delay percentiles of the readings matching where to totals.
+
+    Each percentile is the delay at its rank, found by SQLite with ORDER BY
+    and OFFSET, so the delays are never loaded here. Ranks are counted from
+    whichever end is nearer, which keeps SQLite's sorter small for p99.
+    """
+    count = totals.pop("delays")
+    for name, fraction in PERCENTILES:
+        totals[name] = None
+        if not count:
+            continue
+        rank = min(int(count * fraction), count - 1)
+        order, offset = ("ASC", rank) if rank < count / 2 else ("DESC", count - 1 - rank)
+        row = connection.execute(
+            f"SELECT delay FROM readings {where} AND typeof(delay) IN ('real', 'integer') "
+            f"ORDER BY delay {order} LIMIT 1 OFFSET ?", params + [offset]
+        ).fetchone()
+        if row is not None:
+            totals[name] = row[0]
+    totals["fish_total"] = totals["fish_total"] or 0
+
+
+def parse_range(args, now=None):
+    """
+    Read ship, start, end and last from query arguments.
+
+    start and end are Unix timestamps; last=N means the N seconds before end
+    (or now) and can't be combined with start.
+
+    Returns:
+        tuple: (ship_id, start, end)
+
+    Raises:
+        QueryError: If a value isn't a number or the range is contradictory
+    """
+    try:
+        start = _number(args.get("start"))
+        end = _number(args.get("end"))
+        last = _number(args.get("last"))
+    except ValueError:
+        raise QueryError("start, end and last must be numbers")
+    if last is not None:
+        if start is not None:
+            raise QueryError("last can't be combined with start")
+        if end is not None:
+            start = end - last
+        else:
+            start = (time.time() if now is None else now) - last
+    return args.get("ship") or None, start, end
+
+
+def _real(value):
+    """Return value as a finite float, or None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+def _integer(value):
+    """Return value as an int that fits an SQLite INTEGER, or None."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if -2 ** 63 <= value < 2 ** 63 else None
+    value = _real(value)
+    return None if value is None else int(value)
+
+
+def _number(value):
+    return None if value in (None, "") else float(value)
@@ -0,0 +1,184 @@
+import bisect
+import json
+from collections import defaultdict
+from pathlib import Path
+from threading import Lock
+
+# HTTP header carrying the per-hop trace of a packet
+TRACE_HEADER = "X-Trace"
+
+# Upper bounds (seconds) of histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+# Fields of one hop entry, in header order
+HOP_FIELDS = ("hop", "arrival", "queue", "forward", "retries")
+
+
+def append_hop(trace, hop_id, arrival, queue, forward, retries=0):
+    """
+    Return trace with one more hop entry appended.
+
+    Entries are "hop,arrival,queue,forward,retries" joined by ";", so a
+    relay can extend the header without parsing it.
+
+    Args:
+        trace: Incoming header value, or None at the first hop
+        hop_id: ID of the relaying node
+        arrival: Time the packet arrived at the node
+        queue: Seconds it waited before forwarding started (relay delay)
+        forward: Seconds spent choosing a next hop and retrying
+        retries: Failed attempts before this one
+    """
+    entry = f"{hop_id},{arrival:.3f},{queue:.3f},{forward:.3f},{retries}"
+    return f"{trace};{entry}" if trace else entry
+
+
+def parse_trace(trace):
+    """
+    Parse a trace header into a list of hop dicts.
+
+    Malformed entries are skipped, since a trace is diagnostic only.
+    """
+    hops = []
+    for entry in (trace or "").split(";"):
+        fields = entry.split(",")
+        if len(fields) != len(HOP_FIELDS):
+            continue
+        try:
+            hops.append({
+                "hop": fields[0],
+                "arrival": float(fields[1]),
+                "queue": float(fields[2]),
+                "forward": float(fields[3]),
+                "retries": int(fields[4]),
+            })
+        except ValueError:
+            continue
+    return hops
+
+
+def build_trace_record(record, hops, received_at, verify_time, readings=1, sent=None):
+    """
+    Combine a telemetry record with its hop trace and ground control timings.
+
+    uplink is the time from the ship sending to the first satellite
+    receiving; last_leg is the time from the last satellite forwarding to
+    ground control receiving.
+
+    A batch envelope crosses the network once, so it gets one trace: record
+    is one of its readings, readings their number and sent the time the
+    envelope was sent, which delay is then measured from.
+    """
+    delay = record["delay"]
+    if sent is None:
+        sent = record["timestamp_sent"]
+    elif isinstance(sent, (int, float)):
+        delay = round(received_at - sent, 2)
+    trace = {
+        "ship_id": record["ship_id"],
+        "timestamp_sent": sent,
+        "received_at": round(received_at, 3),
+        "delay": delay,
+        "verify": round(verify_time, 4),
+        "readings": readings,
+        "hop_count": len(hops),
+        "hops": hops,
+    }
+    if hops and isinstance(sent, (int, float)) and sent:
+        last = hops[-1]
+        trace["uplink"] = round(hops[0]["arrival"] - sent, 3)
+        trace["last_leg"] = round(received_at - (last["arrival"] + last["queue"] + last["forward"]), 3)
+    return trace
+
+
+class Histogram:
+    """Counts of observations per HISTOGRAM_BUCKETS bucket, with sum and count."""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        # A list keeps the buckets in order through jsonify's key sorting
+        bounds = list(self.buckets) + ["+Inf"]
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "buckets": [{"le": bound, "count": count} for bound, count in zip(bounds, self.counts)],
+        }
+
+
+class TraceStats:
+    """
+    Latency histograms built from packet traces at ground control.
+
+    End-to-end delay is grouped by hop count; queueing and forwarding time
+    are grouped by satellite, so slow relays stand out.
+    """
+
+    def __init__(self):
+        self.by_hop_count = defaultdict(Histogram)
+        self.queue_by_satellite = defaultdict(Histogram)
+        self.forward_by_satellite = defaultdict(Histogram)
+        self.retries_by_satellite = defaultdict(int)
+        self.uplink = Histogram()
+        self.last_leg = Histogram()
+        self.verify = Histogram()
+        self._lock = Lock()
+
+    def add(self, trace):
+        """Record one trace built by build_trace_record."""
+        with self._lock:
+            if isinstance(trace["delay"], (int, float)):
+                self.by_hop_count[trace["hop_count"]].observe(trace["delay"])
+            for hop in trace["hops"]:
+                self.queue_by_satellite[hop["hop"]].observe(hop["queue"])
+                self.forward_by_satellite[hop["hop"]].observe(hop["forward"])
+                self.retries_by_satellite[hop["hop"]] += hop["retries"]
+            if "uplink" in trace:
+                self.uplink.observe(trace["uplink"])
+                self.last_leg.observe(trace["last_leg"])
+            self.verify.observe(trace["verify"])
+
+    def snapshot(self):
+        """Return every histogram as a JSON-serialisable dict."""
+        with self._lock:
+            return {
+                "delay_by_hop_count": {
+                    str(hops): histogram.to_dict() for hops, histogram in sorted(self.by_hop_count.items())
+                },
+                "satellites": {
+                    str(hop): {
+                        "queue": self.queue_by_satellite[hop].to_dict(),
+                        "forward": self.forward_by_satellite[hop].to_dict(),
+                        "retries": self.retries_by_satellite[hop],
+                    }
+                    for hop in sorted(self.queue_by_satellite)
+                },
+                "uplink": self.uplink.to_dict(),
+                "last_leg": self.last_leg.to_dict(),
+                "ground_control_verify": self.verify.to_dict(),
+            }
+
+
+class TraceSink:
+    """Append trace records to a JSON lines file; used with ingest.BufferedWriter."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, mode="a")
+
+    def write(self, records):
+        self._file.write("".join(json.dumps(record) + "\n" for record in records))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,172 @@
+import logging
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_SIZE, HTTP_TIMEOUT, PEER_BACKOFF_BASE, PEER_BACKOFF_MAX
+
+logger = logging.getLogger('transport')
+
+
+class PeerStats:
+    """Request counters for one peer."""
+
+    __slots__ = ("requests", "failures")
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+
+
+class Transport:
+    """
+    Pooled keep-alive HTTP client shared by all inter-node calls.
+
+    Each peer (host:port) gets its own requests.Session, so connections to a
+    peer are reused across calls instead of paying a TCP handshake per
+    request. Proxies from the environment are ignored, as every caller used
+    to do with proxies={"http": None, "https": None}.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._sessions = {}
+        self._stats = {}
+        self._lock = Lock()
+
+    def session(self, peer):
+        """Return the pooled session for a "host:port" peer, creating it if needed."""
+        session = self._sessions.get(peer)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(peer)
+            if session is None:
+                session = requests.Session()
+                session.trust_env = False
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[peer] = session
+                self._stats[peer] = PeerStats()
+        return session
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Send a request over the peer's pooled session."""
+        peer = urlsplit(url).netloc
+        session = self.session(peer)
+        stats = self._stats[peer]
+        stats.requests += 1
+        try:
+            return session.request(
+                method, url, timeout=self.timeout if timeout is None else timeout, **kwargs
+            )
+        except requests.RequestException:
+            stats.failures += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """
+        Return per-peer connection reuse statistics.
+
+        Returns:
+            dict: {peer: {"requests", "failures", "connections", "reused"}}
+        """
+        result = {}
+        for peer, session in list(self._sessions.items()):
+            stats = self._stats[peer]
+            pools = session.get_adapter(f"http://{peer}/").poolmanager.pools
+            connections = 0
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+            result[peer] = {
+                "requests": stats.requests,
+                "failures": stats.failures,
+                "connections": connections,
+                "reused": max(stats.requests - connections, 0),
+            }
+        return result
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._stats.clear()
+
+
+class PeerBackoff:
+    """
+    Negative cache for peers that fail to answer.
+
+    Each consecutive failure doubles how long a peer is skipped for, from
+    base up to max_backoff seconds. Once the backoff expires the peer is
+    tried again, and a success clears it.
+    """
+
+    def __init__(self, base=PEER_BACKOFF_BASE, max_backoff=PEER_BACKOFF_MAX):
+        self.base = base
+        self.max_backoff = max_backoff
+        self._entries = {}  # peer -> (consecutive failures, retry_at)
+        self._lock = Lock()
+
+    def available(self, peer):
+        """Return True if the peer is not currently backed off."""
+        entry = self._entries.get(peer)
+        return entry is None or time.time() >= entry[1]
+
+    def failures(self, peer):
+        """Return the peer's consecutive failures (0 if it last answered)."""
+        entry = self._entries.get(peer)
+        return entry[0] if entry else 0
+
+    def failure(self, peer):
+        """Record a failed call and extend the peer's backoff."""
+        with self._lock:
+            failures = self._entries.get(peer, (0, 0))[0] + 1
+            delay = min(self.base * 2 ** (failures - 1), self.max_backoff)
+            self._entries[peer] = (failures, time.time() + delay)
+        if failures == 1:
+            logger.info(f"Peer {peer} failed, backing off for {delay}s")
+
+    def success(self, peer):
+        """Record a successful call, clearing any backoff."""
+        if peer in self._entries:
+            with self._lock:
+                self._entries.pop(peer, None)
+            logger.info(f"Peer {peer} is reachable again")
+
+    def snapshot(self):
+        """Return {peer: {"failures", "retry_in"}} for every backed-off peer."""
+        now = time.time()
+        return {
+            str(peer): {"failures": failures, "retry_in": round(max(retry_at - now, 0), 2)}
+            for peer, (failures, retry_at) in list(self._entries.items())
+        }
+
+
+_transport = None
+_transport_lock = Lock()
+
+
+def get_transport():
+    """Return the process-wide Transport."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
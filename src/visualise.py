@@ -1,5 +1,9 @@
-from flask import Flask, jsonify, send_from_directory, request
-import math
+import argparse
+from flask import Flask, jsonify, send_from_directory, request, Response
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+import json
 import sys
 import time
 import requests
@@ -20,14 +24,42 @@ sys.path.append(BASE_DIR)
 from config import (
     COMMUNICATION_RANGE_KM, SHIP_PORT, SATELLITE_PORTS, 
     GROUND_CONTROL_COORDS, EARTH_DEVICE_IP, SATELLITE_IP,
-    COMMUNICATION_DISPLAY_TIME
+    COMMUNICATION_DISPLAY_TIME, VISUALISER_CACHE_TTL, VISUALISER_FETCH_WORKERS,
+    VISUALISER_STREAM_INTERVAL, VISUALISER_MAX_STREAMS, SERVER_THREADS
 )
+from transport import get_transport, PeerBackoff
+from geo import neighbour_pairs
+from comms import CommunicationLog
+from metrics import instrument_flask, gauge, histogram
+from serving import serve, add_server_arguments
 
-# Shared data to track active communications
-active_communications = []
+# Bounded, time-ordered log of recent communications
+communications = CommunicationLog()
 
 # Flask app for visualization
 app = Flask(__name__)
+instrument_flask(app)
+
+# Collection metrics, served at /metrics
+collect_seconds = histogram(
+    "visualiser_collect_duration_seconds", "Time spent collecting every device's position"
+)
+gauge("visualiser_communications", "Communication events still displayed").set_function(
+    lambda: len(communications)
+)
+
+# Pooled keep-alive connections to every device
+transport = get_transport()
+
+# Threads used to fetch every device's position at once
+fetch_pool = ThreadPoolExecutor(max_workers=VISUALISER_FETCH_WORKERS)
+
+# Devices that stopped answering are skipped until their backoff expires
+dead_nodes = PeerBackoff()
+
+# Last collected world state, shared by every client for VISUALISER_CACHE_TTL
+snapshot_cache = {"snapshot": None, "collected_at": 0}
+snapshot_lock = Lock()
 
 def fetch_position(ip, port, timeout=2):
     """
@@ -42,9 +74,8 @@ def fetch_position(ip, port, timeout=2):
         tuple: (latitude, longitude) or None if request failed
     """
     try:
-        response = requests.get(
+        response = transport.get(
             f"http://{ip}:{port}/get-position", 
-            proxies={"http": None, "https": None}, 
             timeout=timeout
         )
         if response.status_code == 200:
@@ -54,24 +85,6 @@ def fetch_position(ip, port, timeout=2):
         return None
     return None
 
-def haversine(lat1, lon1, lat2, lon2):
-    """
-    Calculate distance between two points using the haversine formula.
-    
-    Args:
-        lat1, lon1: Coordinates of first point
-        lat2, lon2: Coordinates of second point
-        
-    Returns:
-        float: Distance in kilometers
-    """
-    R = 6371  # Radius of the Earth in kilometers
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
 @app.route('/get-all-positions', methods=['GET'])
 def get_all_positions():
     """
@@ -81,32 +94,54 @@ def get_all_positions():
         JSON with positions of satellites, ships, ground control,
         network edges, and active communications
     """
-    # Clean up expired communications
-    current_time = time.time()
-    global active_communications
-    active_communications = [
-        comm for comm in active_communications
-        if current_time - comm["timestamp"] <= COMMUNICATION_DISPLAY_TIME
-    ]
+    positions = dict(get_world_snapshot())
+    positions["communications"] = communications.active()
     
+    return jsonify(positions)
+
+def get_world_snapshot():
+    """
+    Return the cached world state, collecting it again once it is stale.
+
+    Only one request collects at a time; concurrent requests wait for it and
+    share the result instead of repeating the fan-out.
+
+    Returns:
+        dict: Positions of satellites, ship and ground control, plus edges
+    """
+    with snapshot_lock:
+        if time.time() - snapshot_cache["collected_at"] <= VISUALISER_CACHE_TTL:
+            return snapshot_cache["snapshot"]
+
+        with collect_seconds.time():
+            snapshot = collect_world_snapshot()
+        snapshot_cache["snapshot"] = snapshot
+        snapshot_cache["collected_at"] = time.time()
+        return snapshot
+
+def collect_world_snapshot():
+    """
+    Fetch every device's position in parallel and compute network edges.
+
+    Returns:
+        dict: Positions of satellites, ship and ground control, plus edges
+    """
     # Initialize result structure
     positions = {
         "satellites": [],
         "ship": None,
         "edges": [],
-        "communications": active_communications,
         "ground_control": {
             "latitude": GROUND_CONTROL_COORDS[0], 
             "longitude": GROUND_CONTROL_COORDS[1]
         },
     }
     
-    # Collect satellite positions
-    satellites = fetch_satellite_positions()
-    positions["satellites"] = satellites
+    # Fetch the ship alongside the satellites
+    ship_future = fetch_pool.submit(fetch_live_position, EARTH_DEVICE_IP, SHIP_PORT[0])
+    positions["satellites"] = fetch_satellite_positions()
     
-    # Fetch ship position
-    ship_position = fetch_position(EARTH_DEVICE_IP, SHIP_PORT[0])
+    ship_position = ship_future.result()
     if ship_position:
         positions["ship"] = {
             "latitude": ship_position[0], 
@@ -116,18 +151,36 @@ def get_all_positions():
     # Calculate network edges
     positions["edges"] = calculate_network_edges(positions)
     
-    return jsonify(positions)
+    return positions
+
+def fetch_live_position(ip, port):
+    """
+    Fetch a device's position unless it is backed off as dead.
+
+    Returns:
+        tuple: (latitude, longitude) or None if skipped or unreachable
+    """
+    peer = f"{ip}:{port}"
+    if not dead_nodes.available(peer):
+        return None
+    position = fetch_position(ip, port)
+    if position:
+        dead_nodes.success(peer)
+    else:
+        dead_nodes.failure(peer)
+    return position
 
 def fetch_satellite_positions():
     """
-    Fetch positions of all satellites.
+    Fetch positions of all satellites in parallel.
     
     Returns:
         list: Satellite position data
     """
+    ports = list(SATELLITE_PORTS)
+    results = fetch_pool.map(lambda port: fetch_live_position(SATELLITE_IP, port), ports)
     satellites = []
-    for port in SATELLITE_PORTS:
-        position = fetch_position(SATELLITE_IP, port)
+    for port, position in zip(ports, results):
         if position:
             satellites.append({
                 "latitude": position[0], 
@@ -175,55 +228,243 @@ def calculate_network_edges(positions):
         })
     
     # Check which entities are within range of each other
-    for i, source in enumerate(all_positions):
-        for target in all_positions[i + 1:]:
-            distance = haversine(
-                source["latitude"], source["longitude"], 
-                target["latitude"], target["longitude"]
-            )
-            if distance <= COMMUNICATION_RANGE_KM:
-                edges.append({"source": source, "target": target})
+    pairs = neighbour_pairs(
+        [entity["latitude"] for entity in all_positions],
+        [entity["longitude"] for entity in all_positions],
+        COMMUNICATION_RANGE_KM
+    )
+    for i, j, _ in sorted(pairs):
+        edges.append({"source": all_positions[i], "target": all_positions[j]})
     
     return edges
 
 @app.route('/log-communication', methods=['POST'])
 def log_communication():
-    """Log a communication event between two entities."""
+    """
+    Log communication events between entities.
+
+    Accepts a single {"source", "target"} event, a list of them, or
+    {"events": [...]} so devices can report many hops in one request.
+    """
     try:
         data = request.get_json()
         if not data:
             return jsonify({"status": "No data received"}), 400
-            
-        source = data.get("source")
-        target = data.get("target")
-        
-        if not source or not target:
-            return jsonify({"status": "Missing source or target"}), 400
-            
-        timestamp = time.time()
-        active_communications.append({
-            "source": source, 
-            "target": target, 
-            "timestamp": timestamp
-        })
+
+        if isinstance(data, dict):
+            events = data["events"] if "events" in data else [data]
+        else:
+            events = data
+        if not isinstance(events, list):
+            return jsonify({"status": "Invalid events"}), 400
+
+        pairs = []
+        for event in events:
+            source = event.get("source") if isinstance(event, dict) else None
+            target = event.get("target") if isinstance(event, dict) else None
+            if not source or not target:
+                return jsonify({"status": "Missing source or target"}), 400
+            pairs.append((source, target))
+
+        communications.add_many(pairs)
         
-        logger.debug(f"Communication logged: {source} -> {target}")
-        return jsonify({"status": "logged"}), 200
+        logger.debug(f"Logged {len(pairs)} communications")
+        return jsonify({"status": "logged", "count": len(pairs)}), 200
         
     except Exception as e:
         logger.error(f"Error logging communication: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def node_id(entity):
+    """Return a stable ID for an entity in a world snapshot."""
+    if entity.get("type") == "satellite":
+        return f"satellite:{entity['port']}"
+    return entity["type"]
+
+def world_state(snapshot):
+    """
+    Flatten a world snapshot into nodes and edges keyed by stable IDs.
+
+    Returns:
+        tuple: ({node_id: node}, {edge_id: edge})
+    """
+    nodes = {
+        "ground_control": {"type": "ground_control", **snapshot["ground_control"]}
+    }
+    for sat in snapshot["satellites"]:
+        nodes[f"satellite:{sat['port']}"] = {"type": "satellite", **sat}
+    if snapshot["ship"]:
+        nodes["ship"] = {"type": "ship", **snapshot["ship"]}
+
+    edges = {}
+    for edge in snapshot["edges"]:
+        source, target = sorted((node_id(edge["source"]), node_id(edge["target"])))
+        edges[f"{source}|{target}"] = {"source": source, "target": target}
+    return nodes, edges
+
+class StreamBroadcaster:
+    """
+    Push world state changes to every connected dashboard.
+
+    A single background thread collects the world once per tick, works out
+    which nodes moved, which edges appeared or disappeared and which
+    communications are new, and sends that one delta to every subscriber.
+    New subscribers get a full snapshot first.
+
+    Every subscriber holds a server thread while it is connected, so at most
+    max_subscribers are accepted, leaving the other threads for the rest of
+    the app.
+    """
+
+    def __init__(self, interval=VISUALISER_STREAM_INTERVAL, queue_size=32, max_subscribers=VISUALISER_MAX_STREAMS):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.nodes = {}
+        self.edges = {}
+        self.last_communication_id = 0
+        self._lock = Lock()
+        self._thread = None
+
+    def subscribe(self):
+        """Register a subscriber and return its queue, primed with a snapshot, or None if there are too many."""
+        queue = Queue(maxsize=self.queue_size)
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            queue.put(self._encode("snapshot", {
+                "nodes": self.nodes,
+                "edges": self.edges,
+                "communications": communications.active(),
+                "display_time": COMMUNICATION_DISPLAY_TIME,
+            }))
+            self.subscribers.add(queue)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self.subscribers.discard(queue)
+
+    def tick(self):
+        """Collect the world once and broadcast what changed since the last tick."""
+        nodes, edges = world_state(get_world_snapshot())
+        new_communications = communications.since(self.last_communication_id)
+
+        with self._lock:
+            delta = {
+                "moved": {
+                    node: state for node, state in nodes.items()
+                    if self.nodes.get(node) != state
+                },
+                "removed": [node for node in self.nodes if node not in nodes],
+                "edges_added": {
+                    edge: state for edge, state in edges.items() if edge not in self.edges
+                },
+                "edges_removed": [edge for edge in self.edges if edge not in edges],
+                "communications": new_communications,
+            }
+            self.nodes, self.edges = nodes, edges
+            if new_communications:
+                self.last_communication_id = new_communications[-1]["id"]
+
+            # Only send the parts that changed
+            delta = {key: value for key, value in delta.items() if value}
+            if not delta:
+                return
+            message = self._encode("delta", delta)
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(message)
+                except Full:
+                    # A client that can't keep up is dropped; it reconnects
+                    # and gets a fresh snapshot
+                    self.subscribers.discard(queue)
+                    logger.warning("Dropped a stream subscriber that fell behind")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self.subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error broadcasting stream update: {e}")
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _encode(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+broadcaster = StreamBroadcaster()
+gauge("visualiser_stream_subscribers", "Dashboards subscribed to /stream").set_function(
+    lambda: len(broadcaster.subscribers)
+)
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """Stream world state deltas to a dashboard as server-sent events."""
+    queue = broadcaster.subscribe()
+    if queue is None:
+        logger.warning("Too many open streams, rejecting dashboard")
+        return jsonify({"status": "Too many streams"}), 503, {"Retry-After": "30"}
+
+    def events():
+        try:
+            while True:
+                try:
+                    yield queue.get(timeout=15)
+                except Empty:
+                    # Comment line keeps idle connections open through proxies
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route('/transport-stats', methods=['GET'])
+def get_transport_stats():
+    """Return per-peer connection reuse statistics and backed-off devices."""
+    return jsonify({
+        "peers": transport.stats(),
+        "dead_nodes": dead_nodes.snapshot()
+    })
+
 @app.route('/')
 def visualize():
     """Serve the visualization interface."""
     return send_from_directory('templates', 'index.html')
 
+def create_app(worker_index=0):
+    """
+    Return the visualiser app.
+
+    Communication events are posted to, and kept by, one process, so the
+    visualiser must be served by a single worker process. Each open /stream
+    holds a request thread, so serve it with VISUALISER_MAX_STREAMS threads
+    on top of those answering other requests.
+    """
+    if worker_index:
+        raise RuntimeError("The visualiser must be served by a single worker process")
+    return app
+
 if __name__ == '__main__':
-    # Configure Flask to be less verbose
-    werkzeug_logger = logging.getLogger('werkzeug')
-    werkzeug_logger.setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description="Run the visualization server.")
+    parser.add_argument("--ip", type=str, default="0.0.0.0",
+                        help="IP address to bind the visualization server (default: 0.0.0.0).")
+    parser.add_argument("--port", type=int, default=33069,
+                        help="Port for the visualization server (default: 33069).")
+    add_server_arguments(parser)
+    parser.set_defaults(threads=None)
+    args = parser.parse_args()
+    # Open dashboards each hold a thread, so they get their own on top of the default
+    threads = args.threads or SERVER_THREADS + VISUALISER_MAX_STREAMS
 
     # Start the visualization server
-    logger.info("Starting visualization server on port 33069")
-    app.run(debug=False, host='0.0.0.0', port=33069)
+    logger.info(f"Starting visualization server on port {args.port}")
+    serve(create_app, args.ip, args.port, server=args.server, threads=threads)
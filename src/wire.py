@@ -0,0 +1,165 @@
+import base64
+import json
+import math
+import struct
+
+from envelope import BATCH_TYPE, BATCH_ENCODING
+
+# Content types a packet can be posted with
+JSON_CONTENT_TYPE = "application/json"
+BINARY_CONTENT_TYPE = "application/x-telemetry"
+
+# Headers the ship sets with a packet's final destination
+DESTINATION_IP_HEADER = "X-Destination-IP"
+DESTINATION_PORT_HEADER = "X-Destination-Port"
+
+# Headers relays pass on unchanged
+ROUTING_HEADERS = ("X-Group-ID", DESTINATION_IP_HEADER, DESTINATION_PORT_HEADER)
+
+# Frame header: magic, version, kind, codec, timestamp, reading count,
+# ship ID length, checksum length. Version 2 frames add the packet's
+# message number. The ship ID, checksum and raw payload token follow.
+MAGIC = b"TM"
+VERSION = 1
+SEQUENCE_VERSION = 2
+HEADER = struct.Struct("!2sBBBdHBB")
+SEQUENCE = struct.Struct("!Q")
+
+# Frame kinds
+PACKET = 0
+BATCH = 1
+
+# Codec names by their one-byte ID; new codecs must be appended
+CODEC_NAMES = ("fernet", "aesgcm", "chacha20")
+CODEC_IDS = {name: index for index, name in enumerate(CODEC_NAMES)}
+
+
+class WireError(Exception):
+    """A packet that can't be framed, or a frame that can't be read."""
+
+
+def is_binary(content_type):
+    """Return True if a request's content type is the binary framing."""
+    return bool(content_type) and content_type.split(";")[0].strip() == BINARY_CONTENT_TYPE
+
+
+def encode_packet(packet):
+    """
+    Frame a ship packet (or batch envelope) as compact binary.
+
+    The payload token is carried as raw bytes rather than base64, and the
+    fields every ship packet shares ("source", "destination", "encoding")
+    are implied by the frame kind.
+
+    Raises:
+        WireError: If the packet has fields the framing can't carry
+    """
+    kind = BATCH if packet.get("type") == BATCH_TYPE else PACKET
+    if kind == BATCH and packet.get("encoding") != BATCH_ENCODING:
+        raise WireError("Unsupported encoding")
+    try:
+        codec = CODEC_IDS[packet.get("codec", CODEC_NAMES[0])]
+        ship_id = str(packet.get("ship_id", "")).encode()
+        checksum = packet.get("checksum", "").encode()
+        token = base64.urlsafe_b64decode(packet["payload"])
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise WireError("Packet can't be framed") from e
+    timestamp = packet.get("timestamp")
+    count = packet.get("count", 0)
+    seq = packet.get("seq")
+    if len(ship_id) > 255 or len(checksum) > 255 or not 0 <= count <= 0xFFFF:
+        raise WireError("Packet can't be framed")
+    if seq is not None and not (isinstance(seq, int) and 0 <= seq < 2 ** 64):
+        raise WireError("Packet can't be framed")
+    header = HEADER.pack(
+        MAGIC, VERSION if seq is None else SEQUENCE_VERSION, kind, codec,
+        math.nan if timestamp is None else timestamp, count, len(ship_id), len(checksum)
+    )
+    sequence = b"" if seq is None else SEQUENCE.pack(seq)
+    return b"".join((header, sequence, ship_id, checksum, token))
+
+
+def decode_packet(frame):
+    """
+    Read a binary frame back into the packet dict a ship would send as JSON.
+
+    Raises:
+        WireError: If the frame is truncated or of an unknown version
+    """
+    try:
+        magic, version, kind, codec, timestamp, count, id_length, checksum_length = HEADER.unpack_from(frame)
+    except struct.error as e:
+        raise WireError("Truncated frame") from e
+    if magic != MAGIC or version not in (VERSION, SEQUENCE_VERSION) \
+            or kind not in (PACKET, BATCH) or codec >= len(CODEC_NAMES):
+        raise WireError("Unsupported frame")
+    offset = HEADER.size
+    seq = None
+    if version == SEQUENCE_VERSION:
+        try:
+            seq, = SEQUENCE.unpack_from(frame, offset)
+        except struct.error as e:
+            raise WireError("Truncated frame") from e
+        offset += SEQUENCE.size
+    token_offset = offset + id_length + checksum_length
+    if len(frame) <= token_offset:
+        raise WireError("Truncated frame")
+
+    packet = {
+        "source": "ship",
+        "ship_id": frame[offset:offset + id_length].decode(errors="replace"),
+        "destination": "ground_control",
+        "codec": CODEC_NAMES[codec],
+        "timestamp": None if math.isnan(timestamp) else timestamp,
+        "payload": base64.urlsafe_b64encode(frame[token_offset:]).decode(),
+    }
+    if seq is not None:
+        packet["seq"] = seq
+    if checksum_length:
+        packet["checksum"] = frame[offset + id_length:token_offset].decode(errors="replace")
+    if kind == BATCH:
+        packet.update({"type": BATCH_TYPE, "encoding": BATCH_ENCODING, "count": count})
+    return packet
+
+
+def unframe(content_type, body):
+    """
+    Parse a relayed body, JSON or binary, into a packet dict.
+
+    Raises:
+        WireError: If the body can't be read as a packet
+    """
+    if is_binary(content_type):
+        return decode_packet(body)
+    try:
+        packet = json.loads(body)
+    except ValueError as e:
+        raise WireError("Invalid JSON") from e
+    if not isinstance(packet, dict):
+        raise WireError("Invalid JSON")
+    return packet
+
+
+def relay_headers(headers):
+    """Return the headers a relay forwards as received: the content type and routing headers."""
+    forwarded = {name: headers[name] for name in ROUTING_HEADERS if name in headers}
+    forwarded["Content-Type"] = headers.get("Content-Type") or JSON_CONTENT_TYPE
+    return forwarded
+
+
+def destination_url(headers, allowed):
+    """
+    Return the URL of a packet's final destination from its routing headers.
+
+    Only destinations listed in allowed, as (ip, port) pairs, are used, so a
+    sender can't make a relay post to any host it names.
+
+    Returns:
+        str: The destination URL, or None if the headers name none or an
+        unlisted one
+    """
+    ip = headers.get(DESTINATION_IP_HEADER)
+    port = headers.get(DESTINATION_PORT_HEADER)
+    if not ip or not port or not port.isdigit() or (ip, int(port)) not in allowed:
+        return None
+    return f"http://{ip}:{port}/"
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import shared modules from src
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
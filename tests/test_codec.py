@@ -0,0 +1,56 @@
+import pytest
+from cryptography.fernet import Fernet
+
+from codec import CodecError, Keyring, create_codec, tamper
+
+KEY = Fernet.generate_key()
+
+
+@pytest.mark.parametrize("name", ["fernet", "aesgcm", "chacha20"])
+def test_round_trip(name):
+    codec = create_codec(name, KEY)
+    token = codec.encrypt(b'{"caught_fish": 3}')
+    assert codec.decrypt(token) == b'{"caught_fish": 3}'
+    assert codec.open(codec.seal(b"raw")) == b"raw"
+    assert codec.decrypt_many([token, b"!!"]) == [b'{"caught_fish": 3}', None]
+
+
+@pytest.mark.parametrize("name", ["fernet", "aesgcm", "chacha20"])
+def test_tampered_token_is_rejected(name):
+    codec = create_codec(name, KEY)
+    with pytest.raises(CodecError):
+        codec.decrypt(tamper(codec.encrypt(b"payload")))
+
+
+@pytest.mark.parametrize("name", ["fernet", "aesgcm", "chacha20"])
+def test_wrong_key_is_rejected(name):
+    token = create_codec(name, KEY).encrypt(b"payload")
+    with pytest.raises(CodecError):
+        create_codec(name, Fernet.generate_key()).decrypt(token)
+
+
+@pytest.mark.parametrize("token", [b"", b"not base64!", b"c2hvcnQ="])
+def test_malformed_tokens_are_rejected(token):
+    for name in ("fernet", "aesgcm", "chacha20"):
+        with pytest.raises(CodecError):
+            create_codec(name, KEY).decrypt(token)
+
+
+def test_fernet_codec_interoperates_with_plain_fernet():
+    codec = create_codec("fernet", KEY)
+    assert codec.decrypt(Fernet(KEY).encrypt(b"from Group 8")) == b"from Group 8"
+    assert Fernet(KEY).decrypt(codec.encrypt(b"to Group 8")) == b"to Group 8"
+
+
+def test_each_aead_codec_derives_its_own_key():
+    token = create_codec("aesgcm", KEY).encrypt(b"payload")
+    with pytest.raises(CodecError):
+        create_codec("chacha20", KEY).decrypt(token)
+
+
+def test_keyring_picks_the_packet_codec():
+    keyring = Keyring(KEY)
+    assert keyring.for_packet({}).name == "fernet"
+    assert keyring.for_packet({"codec": "chacha20"}) is keyring.codec("chacha20")
+    with pytest.raises(ValueError):
+        keyring.for_packet({"codec": "rot13"})
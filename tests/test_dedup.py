@@ -0,0 +1,66 @@
+from threading import Thread
+
+from dedup import DedupIndex
+from ingest import make_record
+from telemetry_store import TelemetryStore
+
+
+def test_ids_are_reserved_until_written_or_released():
+    index = DedupIndex()
+    record = make_record("01", 1000.0, 1.0, {}, seq=7)
+
+    # A replay racing its original is dropped while the original is being written
+    assert index.filter([record]) == [record]
+    assert index.filter([record]) == []
+
+    # A failed write releases the ID, so a resend is kept
+    index.release([record])
+    assert index.filter([record]) == [record]
+
+    index.add([record])
+    assert index.filter([record]) == []
+    assert index.duplicates == 2
+
+
+def test_concurrent_filters_keep_one_copy():
+    index = DedupIndex()
+    record = make_record("01", 1000.0, 1.0, {}, seq=3)
+    kept = []
+    threads = [Thread(target=lambda: kept.extend(index.filter([dict(record)]))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(kept) == 1
+
+
+def test_repeats_within_one_batch_and_unnumbered_records():
+    index = DedupIndex()
+    first = make_record("01", 1000.0, 1.0, {}, seq=1)
+    unnumbered = make_record("01", 1000.0, 1.0, {})
+    assert index.filter([first, dict(first), unnumbered, dict(unnumbered)]) == [first, unnumbered, unnumbered]
+
+
+def test_ids_expire_after_the_window():
+    now = [0.0]
+    index = DedupIndex(window=10, clock=lambda: now[0])
+    record = make_record("01", 1000.0, 1.0, {}, seq=1)
+    index.add([record])
+    now[0] = 11.0
+    assert index.filter([record]) == [record]
+    # Only the new reservation is held
+    assert len(index) == 1
+
+
+def test_store_keeps_one_copy_across_writers(tmp_path):
+    # Two ground control workers writing the same database
+    first = TelemetryStore(tmp_path / "telemetry.db")
+    second = TelemetryStore(tmp_path / "telemetry.db")
+    record = make_record("01", 1000.0, 1.0, {"caught_fish": 2}, seq=2 ** 63 - 1)
+    first.write([record, make_record("01", 1000.0, 1.0, {})])
+    second.write([record, make_record("02", 1000.0, 1.0, {}, seq=2 ** 63 - 1), make_record("01", 1000.0, 1.0, {})])
+
+    assert first.stats()["all"]["readings"] == 4
+    assert first.stats(ship_id="01")["all"]["fish_total"] == 2
+    first.close()
+    second.close()
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+import geo
+from geo import GridIndex, haversine, neighbour_pairs
+
+
+def brute_force(lats, lons, range_km):
+    return {
+        (i, j) for i in range(len(lats)) for j in range(i + 1, len(lats))
+        if haversine(lats[i], lons[i], lats[j], lons[j]) <= range_km
+    }
+
+
+def points(count, seed, lat_range=(-60, 60), lon_range=(-30, 30)):
+    rng = random.Random(seed)
+    return ([rng.uniform(*lat_range) for _ in range(count)],
+            [rng.uniform(*lon_range) for _ in range(count)])
+
+
+@pytest.mark.parametrize("seed, range_km", [(0, 500), (1, 2000), (2, 50)])
+def test_neighbour_pairs_match_brute_force(seed, range_km):
+    lats, lons = points(200, seed)
+    pairs = neighbour_pairs(lats, lons, range_km)
+
+    assert {(i, j) for i, j, _ in pairs} == brute_force(lats, lons, range_km)
+    assert len(pairs) == len({(i, j) for i, j, _ in pairs})
+    for i, j, distance in pairs:
+        assert i < j
+        assert distance == pytest.approx(haversine(lats[i], lons[i], lats[j], lons[j]))
+
+
+def test_neighbour_pairs_without_numpy(monkeypatch):
+    monkeypatch.setattr(geo, "np", None)
+    lats, lons = points(150, 3)
+    assert {(i, j) for i, j, _ in neighbour_pairs(lats, lons, 800)} == brute_force(lats, lons, 800)
+
+
+def test_neighbour_pairs_near_the_poles():
+    # Longitude degrees are short up here, so cells must be widened to match
+    lats, lons = points(100, 4, lat_range=(80, 89.5), lon_range=(-180, 180))
+    assert {(i, j) for i, j, _ in neighbour_pairs(lats, lons, 300)} == brute_force(lats, lons, 300)
+
+
+def test_query_matches_brute_force():
+    lats, lons = points(200, 5)
+    index = GridIndex(lats, lons, 700)
+    for lat, lon in zip(lats[:20], lons[:20]):
+        expected = {i for i in range(len(lats)) if haversine(lat, lon, lats[i], lons[i]) <= 700}
+        assert set(index.query(lat, lon)) == expected
+
+
+@pytest.mark.parametrize("range_km", [0, -5])
+def test_non_positive_range_links_nothing(range_km):
+    assert neighbour_pairs([0.0, 0.0], [0.0, 0.0], range_km) == []
+    with pytest.raises(ValueError):
+        GridIndex([0.0], [0.0], range_km)
+
+
+def test_no_points():
+    assert neighbour_pairs([], [], 100) == []
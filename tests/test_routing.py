@@ -0,0 +1,57 @@
+from routing import GROUND_CONTROL, RoutingTable
+
+
+def table(metric="distance"):
+    # One degree of longitude on the equator is about 111 km
+    return RoutingTable(range_km=150, metric=metric, ground_control_coords=(0.0, 0.0))
+
+
+def test_node_in_range_of_ground_control_uplinks_directly():
+    routes = table()
+    routes.update({"a": (0.0, 1.0)})
+
+    assert routes.next_hop("a") == GROUND_CONTROL
+    assert routes.route("a").hops == 1
+    assert routes.neighbours(GROUND_CONTROL) == ["a"]
+
+
+def test_next_hop_follows_the_shortest_path():
+    routes = table()
+    # b can only reach ground control through a or c; the path through a is shorter
+    routes.update({"a": (0.0, 1.0), "b": (0.0, 2.0), "c": (0.5, 1.0)})
+
+    assert routes.next_hop("b") == "a"
+    assert routes.route("b").hops == 2
+    assert routes.route("b").cost < 2 * 125
+
+
+def test_hop_metric_counts_links():
+    routes = table(metric="hops")
+    routes.update({"a": (0.0, 1.0), "b": (0.0, 2.0), "c": (0.0, 3.0)})
+
+    assert routes.route("c").cost == 3
+    assert routes.next_hop("c") == "b"
+
+
+def test_unreachable_node_has_no_route():
+    routes = table()
+    routes.update({"a": (0.0, 1.0), "island": (40.0, 40.0)})
+
+    assert routes.next_hop("island") is None
+    assert routes.route("island") is None
+    assert routes.next_hop("unknown") is None
+    assert "island" not in routes.snapshot()
+
+
+def test_routes_are_only_recomputed_when_links_change():
+    now = [0.0]
+    routes = RoutingTable(range_km=150, max_age=60, ground_control_coords=(0.0, 0.0), clock=lambda: now[0])
+    assert routes.update({"a": (0.0, 1.0)})
+    assert not routes.update({"a": (0.0, 1.01)})
+
+    # a moves out of range, so the link set changes
+    assert routes.update({"a": (0.0, 5.0)})
+    assert routes.next_hop("a") is None
+
+    now[0] = 61.0
+    assert routes.update({"a": (0.0, 5.0)})
@@ -0,0 +1,95 @@
+from store_forward import StoreAndForwardQueue
+
+
+def items(entries):
+    return [item for item, _, _ in entries]
+
+
+def test_higher_priorities_drain_first_then_arrival_order():
+    queue = StoreAndForwardQueue()
+    for name, priority in (("a", 0), ("b", 5), ("c", 0), ("d", 5), ("e", 1)):
+        queue.put({"id": name}, priority)
+
+    assert [item["id"] for item in items(queue.drain(3))] == ["b", "d", "e"]
+    assert [item["id"] for item in items(queue.drain())] == ["a", "c"]
+    assert len(queue) == 0
+
+
+def test_full_queue_evicts_the_oldest_lowest_priority_packet():
+    queue = StoreAndForwardQueue(max_size=3)
+    queue.put("low-old", 0)
+    queue.put("low-new", 0)
+    queue.put("high", 2)
+
+    assert queue.put("mid", 1)
+    assert items(queue.drain()) == ["high", "mid", "low-new"]
+    assert queue.evicted == 1
+
+
+def test_full_queue_refuses_a_lower_priority_packet():
+    queue = StoreAndForwardQueue(max_size=2)
+    queue.put("a", 3)
+    queue.put("b", 3)
+
+    assert not queue.put("c", 1)
+    assert items(queue.drain()) == ["a", "b"]
+    assert queue.evicted == 0
+
+
+def test_packets_expire_after_the_ttl():
+    now = [0.0]
+    queue = StoreAndForwardQueue(ttl=10, clock=lambda: now[0])
+    queue.put("old")
+    now[0] = 5.0
+    queue.put("new")
+
+    now[0] = 10.0
+    assert len(queue) == 1
+    assert queue.stats()["expired"] == 1
+    now[0] = 15.0
+    assert queue.drain() == []
+
+
+def test_requeue_keeps_priority_and_expiry():
+    now = [0.0]
+    queue = StoreAndForwardQueue(ttl=10, clock=lambda: now[0])
+    queue.put("a", 2)
+    drained = queue.drain()
+
+    now[0] = 8.0
+    queue.requeue(drained)
+    assert queue.drain() == [("a", 2, 10.0)]
+
+
+def test_packets_are_reloaded_from_sqlite(tmp_path):
+    path = tmp_path / "spool" / "queue.db"
+    now = [0.0]
+    queue = StoreAndForwardQueue(ttl=10, path=path, clock=lambda: now[0])
+    queue.put({"id": 1}, 0)
+    queue.put({"id": 2}, 4)
+    queue.put({"id": 3}, 1)
+    queue.drain(1)
+    queue.close()
+
+    reloaded = StoreAndForwardQueue(ttl=10, path=path, clock=lambda: now[0])
+    assert reloaded.drain() == [({"id": 3}, 1, 10.0), ({"id": 1}, 0, 10.0)]
+    reloaded.close()
+
+    # Drained packets were deleted from the file too
+    emptied = StoreAndForwardQueue(path=path, clock=lambda: now[0])
+    assert len(emptied) == 0
+    emptied.close()
+
+
+def test_expired_packets_are_dropped_on_reload(tmp_path):
+    path = tmp_path / "queue.db"
+    now = [0.0]
+    queue = StoreAndForwardQueue(ttl=10, path=path, clock=lambda: now[0])
+    queue.put("stale")
+    queue.close()
+
+    now[0] = 20.0
+    reloaded = StoreAndForwardQueue(ttl=10, path=path, clock=lambda: now[0])
+    assert reloaded.drain() == []
+    assert reloaded.expired == 1
+    reloaded.close()
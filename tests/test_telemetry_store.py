@@ -0,0 +1,59 @@
+import sqlite3
+
+from ingest import make_record
+from telemetry_store import TelemetryStore
+
+
+def test_reading_without_timestamp_is_stored_with_null_delay(tmp_path):
+    store = TelemetryStore(tmp_path / "telemetry.db")
+    store.write([
+        make_record("01", 1000.0, 2.0, {"caught_fish": 5}),
+        make_record("01", None, "Unknown", {"caught_fish": 3}),
+        make_record("02", float("nan"), "Unknown", {"caught_fish": 1}),
+    ])
+
+    stats = store.stats()
+    assert stats["all"]["readings"] == 3
+    assert stats["all"]["fish_total"] == 9
+    assert stats["all"]["delay_max"] == 2.0
+    assert stats["all"]["delay_p99"] == 2.0
+    assert stats["ships"]["02"]["delay_p50"] is None
+    assert [row["delay"] for row in store.readings(ship_id="01")] == [None, 2.0]
+    store.close()
+
+
+def test_stats_ignore_text_delays_already_stored(tmp_path):
+    path = tmp_path / "telemetry.db"
+    store = TelemetryStore(path)
+    store.write([make_record("01", 1000.0, 4.0, {})])
+    # Written before delays were checked on insert
+    with sqlite3.connect(str(path)) as connection:
+        connection.execute("INSERT INTO readings (ship_id, timestamp, delay) VALUES ('01', 1001.0, 'Unknown')")
+
+    stats = store.stats(ship_id="01")
+    assert stats["all"]["delay_max"] == 4.0
+    assert stats["all"]["delay_p50"] == 4.0
+    assert store.series(60)[0]["delay_max"] == 4.0
+    store.close()
+
+
+def test_percentiles_match_the_sorted_delays(tmp_path):
+    store = TelemetryStore(tmp_path / "telemetry.db")
+    delays = {"01": [float(d) for d in range(100, 0, -1)], "02": [3.0, 1.0, 2.0]}
+    store.write([
+        make_record(ship, 1000.0 + i, delay, {}, seq=i)
+        for ship, values in delays.items() for i, delay in enumerate(values)
+    ])
+
+    stats = store.stats()
+    every = sorted(delays["01"] + delays["02"])
+    assert (stats["all"]["delay_p50"], stats["all"]["delay_p99"]) == (every[51], every[101])
+    assert (stats["ships"]["01"]["delay_p50"], stats["ships"]["01"]["delay_p99"]) == (51.0, 100.0)
+    assert (stats["ships"]["02"]["delay_p50"], stats["ships"]["02"]["delay_p99"]) == (2.0, 3.0)
+    assert "delays" not in stats["all"]
+
+    # Only the readings in the range count
+    windowed = store.stats(ship_id="01", start=1090.0)
+    assert windowed["all"]["readings"] == 10
+    assert (windowed["all"]["delay_p50"], windowed["all"]["delay_p99"]) == (6.0, 10.0)
+    store.close()
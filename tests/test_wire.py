@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from cryptography.fernet import Fernet
+
+from codec import create_codec
+from envelope import pack_batch, unpack_batch
+from wire import BINARY_CONTENT_TYPE, JSON_CONTENT_TYPE, HEADER, WireError, decode_packet, encode_packet, unframe
+
+KEY = Fernet.generate_key()
+
+
+def packet(**fields):
+    data = {
+        "source": "ship",
+        "ship_id": "01",
+        "destination": "ground_control",
+        "codec": "aesgcm",
+        "timestamp": 1700000000.25,
+        "payload": create_codec("aesgcm", KEY).encrypt(b'{"caught_fish": 3}').decode(),
+    }
+    data.update(fields)
+    return data
+
+
+@pytest.mark.parametrize("fields", [{}, {"seq": 2 ** 64 - 1}, {"checksum": "abc123", "codec": "fernet"},
+                                    {"timestamp": None}])
+def test_binary_round_trip(fields):
+    sent = packet(**fields)
+    assert decode_packet(encode_packet(sent)) == sent
+    assert unframe(BINARY_CONTENT_TYPE, encode_packet(sent)) == sent
+
+
+def test_binary_batch_envelope_round_trip():
+    codec = create_codec("chacha20", KEY)
+    readings = [{"timestamp": 1.0, "payload": {"caught_fish": 1}, "checksum": "x"}] * 3
+    envelope = pack_batch(readings, codec, "02", 1700000000.0)
+
+    received = decode_packet(encode_packet(envelope))
+    assert received == envelope
+    assert unpack_batch(received, codec) == readings
+
+
+def test_json_round_trip():
+    sent = packet(seq=7)
+    assert unframe(JSON_CONTENT_TYPE, json.dumps(sent).encode()) == sent
+    assert unframe(None, json.dumps(sent)) == sent
+
+
+def test_truncated_frames_are_rejected():
+    frame = encode_packet(packet(seq=1))
+    for length in (0, 3, HEADER.size, HEADER.size + 8, HEADER.size + 8 + 2):
+        with pytest.raises(WireError):
+            decode_packet(frame[:length])
+
+
+@pytest.mark.parametrize("body", [b"garbage" * 10, b"TM\x09" + bytes(40), b"TM\x01\x07" + bytes(40)])
+def test_garbage_frames_are_rejected(body):
+    with pytest.raises(WireError):
+        unframe(BINARY_CONTENT_TYPE, body)
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", b""])
+def test_invalid_json_is_rejected(body):
+    with pytest.raises(WireError):
+        unframe(JSON_CONTENT_TYPE, body)
+
+
+@pytest.mark.parametrize("fields", [{"codec": "rot13"}, {"payload": None}, {"seq": -1}, {"ship_id": "x" * 256}])
+def test_packets_the_framing_cannot_carry_are_rejected(fields):
+    with pytest.raises(WireError):
+        encode_packet(packet(**fields))